@@ -14,6 +14,14 @@ def cascading_get_warehouses():
     """Get all available warehouses"""
     try:
         sap = SAPIntegration()
+
+        # Serve from the local mirror while it is fresh
+        warehouses = sap.mirror.list_all('warehouses')
+        if warehouses is not None:
+            return jsonify({
+                'success': True,
+                'warehouses': warehouses
+            })
         
         # Try to get warehouses from SAP B1
         if sap.ensure_logged_in():
@@ -59,6 +67,14 @@ def cascading_get_bin_locations():
             return jsonify({'success': False, 'error': 'Warehouse code required'}), 400
         
         sap = SAPIntegration()
+
+        # Serve from the local mirror while it is fresh
+        bins = sap.mirror.list_by_parent('bins', warehouse_code)
+        if bins is not None:
+            return jsonify({
+                'success': True,
+                'bins': bins
+            })
         
         # Try to get bin locations from SAP B1
         if sap.ensure_logged_in():
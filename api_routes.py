@@ -96,48 +96,27 @@ def register_api_routes(app):
             
             sap = SAPIntegration()
             
-            # Try to get item name from SAP B1
+            # Try to get item name from SAP B1 (cached item catalog)
             if sap.ensure_logged_in():
-                try:
-                    # Use the SAP endpoint provided by user: https://192.168.0.127:50000/b1s/v1/Items?$select=ItemCode,ItemName
-                    url = f"{sap.base_url}/b1s/v1/Items"
-                    params = {
-                        '$filter': f"ItemCode eq '{item_code}'",
-                        '$select': 'ItemCode,ItemName'
-                    }
-                    response = sap.session.get(url, params=params, timeout=10)
+                items = sap.item_catalog.get_many([item_code])
+                if item_code in items:
+                    item = items[item_code]
+                    if item:
+                        item_name = item.get('ItemName') or f'Item {item_code}'
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        items = data.get('value', [])
-                        
-                        if items and len(items) > 0:
-                            item = items[0]
-                            item_name = item.get('ItemName') or f'Item {item_code}'
-                            
-                            logging.info(f"Retrieved item name for {item_code}: {item_name}")
-                            return jsonify({
-                                'success': True,
-                                'item_code': item_code,
-                                'item_name': item_name
-                            })
-                        else:
-                            # Item not found in SAP
-                            return jsonify({
-                                'success': False,
-                                'error': f'Item code {item_code} not found in SAP B1'
-                            }), 404
-                            
-                except Exception as sap_error:
-                    logging.error(f"Error getting item from SAP: {str(sap_error)}")
-                    # Return fallback response
-                    return jsonify({
-                        'success': True,
-                        'item_code': item_code,
-                        'item_name': f'Item {item_code}',
-                        'fallback': True
-                    })
-            
+                        logging.info(f"Retrieved item name for {item_code}: {item_name}")
+                        return jsonify({
+                            'success': True,
+                            'item_code': item_code,
+                            'item_name': item_name
+                        })
+                    else:
+                        # Item not found in SAP
+                        return jsonify({
+                            'success': False,
+                            'error': f'Item code {item_code} not found in SAP B1'
+                        }), 404
+
             # Return fallback if SAP not available
             return jsonify({
                 'success': True,
@@ -8,9 +8,10 @@ from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from credential_loader import load_credentials_from_json, get_credential
+from sap_json import FastJSONProvider, JSON_BACKEND
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (replaced by logging_config.setup_logging below)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 # Load credentials from JSON file
 credentials = load_credentials_from_json()
@@ -25,6 +26,9 @@ login_manager = LoginManager()
 
 # Create Flask app
 app = Flask(__name__)
+# orjson-backed JSON responses when orjson is installed (stdlib otherwise)
+app.json = FastJSONProvider(app)
+logging.info(f"JSON backend: {JSON_BACKEND}")
 # Configure session secret key (required for Flask-Login)
 session_secret = get_credential(credentials,"SESSION_SECRET")
 if not session_secret:
@@ -173,6 +177,14 @@ if sap_server and sap_username and sap_company_db:
 else:
     logging.info("🔒 SAP B1 integration disabled - running in offline mode")
 
+# Warm up the shared SAP B1 session pool in the background so the first
+# scanner requests don't pay for the Service Layer logins
+if os.environ.get('SAP_B1_SERVER'):
+    import threading
+    from sap_integration import SAPIntegration
+    threading.Thread(target=lambda: SAPIntegration().warm_up_session_pool(),
+                     name='sap-session-warmup', daemon=True).start()
+
 # Import models
 import models
 import models_extensions
@@ -271,3 +283,10 @@ with app.app_context():
 # Import routes
 import routes
 
+# Periodic SAP master data / mirror syncs in background threads (see sap_scheduler).
+# Opt-in: every process importing app would otherwise poll and run the jobs; the
+# usual setup is one dedicated `python sap_scheduler.py` process instead
+if os.environ.get('SAP_SYNC_SCHEDULER', 'false').lower() == 'true':
+    from sap_scheduler import start_scheduler
+    start_scheduler(app)
+
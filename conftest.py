@@ -0,0 +1,243 @@
+"""
+Shared pytest fixtures
+A fake SAP B1 Service Layer on a local HTTP server and a throwaway SQLite database
+behind the app module, so the SAP client and the sync code run without SAP or MySQL
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import types
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+# app.py needs a reachable MySQL/PostgreSQL server on import; tests get a SQLite
+# app module with the same `app` and `db` names instead
+TEST_DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='wms_tests_'), 'wms.sqlite3')
+
+
+class _TestBase(DeclarativeBase):
+    pass
+
+
+if 'app' not in sys.modules:
+    _test_app = Flask('wms_tests')
+    _test_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{TEST_DATABASE_PATH}"
+    _test_app.secret_key = 'wms-tests'
+    _test_db = SQLAlchemy(model_class=_TestBase)
+    _test_db.init_app(_test_app)
+    _test_login_manager = LoginManager()
+    _test_login_manager.init_app(_test_app)
+    _app_module = types.ModuleType('app')
+    _app_module.app = _test_app
+    _app_module.db = _test_db
+    _app_module.login_manager = _test_login_manager
+    sys.modules['app'] = _app_module
+
+
+class FakeRequest:
+    """One request received by the fake Service Layer"""
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class FakeServiceLayer:
+    """Minimal SAP B1 Service Layer: Login/Logout, B1SESSION cookies and routed handlers
+
+    Handlers are registered with route(method, path_pattern, handler) and
+    return (status, body) or (status, body, headers); a dict or list body
+    is sent as JSON. Unrouted requests get an empty OData collection.
+    """
+
+    def __init__(self):
+        self.sessions = set()
+        self.logins = 0
+        self.logouts = 0
+        self.requests = []
+        self.routes = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def route(self, method, pattern, handler):
+        self.routes.append((method, re.compile(pattern), handler))
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def requests_to(self, pattern, method=None):
+        return [request for request in self.requests
+                if re.search(pattern, request.path) and (method is None or request.method == method)]
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _dispatch(self, request):
+        if request.path.endswith('/Login'):
+            session_id = str(uuid.uuid4())
+            with self.lock:
+                self.logins += 1
+                self.sessions.add(session_id)
+            return 200, {'SessionId': session_id}, {'Set-Cookie': f"B1SESSION={session_id}; Path=/"}
+        session_id = re.search(r'B1SESSION=([\w-]+)', request.headers.get('Cookie', ''))
+        with self.lock:
+            valid = session_id is not None and session_id.group(1) in self.sessions
+            if valid and request.path.endswith('/Logout'):
+                self.logouts += 1
+                self.sessions.discard(session_id.group(1))
+                return 204, None
+        if not valid:
+            return 401, {'error': {'code': 301, 'message': {'value': 'Invalid session.'}}}
+        if request.path.endswith('/$batch'):
+            return self._dispatch_batch(request)
+        for method, pattern, handler in self.routes:
+            if method == request.method and pattern.search(request.path):
+                return handler(request)
+        return 200, {'value': []}
+
+    def _dispatch_batch(self, request):
+        """Answer each GET part of a $batch request like a separate request"""
+        boundary = request.headers['Content-Type'].split('boundary=')[1]
+        parts = []
+        for part in request.body.decode().split(f"--{boundary}"):
+            if not part.strip() or part.strip() == '--':
+                continue
+            http_request = part.split('\r\n\r\n', 1)[1]
+            request_line, *header_lines = http_request.strip().split('\r\n')
+            method, target, _ = request_line.split(' ')
+            split = urllib.parse.urlsplit(target)
+            headers = dict(line.split(': ', 1) for line in header_lines)
+            headers['Cookie'] = request.headers.get('Cookie', '')
+            part_request = FakeRequest(method, urllib.parse.unquote(split.path),
+                                       dict(urllib.parse.parse_qsl(split.query, keep_blank_values=True)),
+                                       headers, b'')
+            self.requests.append(part_request)
+            status, body, *_ = self._dispatch(part_request)
+            parts.append(
+                f"--batchresponse_1\r\nContent-Type: application/http\r\n"
+                f"Content-Transfer-Encoding: binary\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json;odata=minimalmetadata;charset=utf-8\r\n\r\n"
+                f"{json.dumps(body) if body is not None else ''}\r\n")
+        return 202, ''.join(parts) + '--batchresponse_1--\r\n', {
+            'Content-Type': 'multipart/mixed;boundary=batchresponse_1'}
+
+    def _handler_class(self):
+        service_layer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                split = urllib.parse.urlsplit(self.path)
+                request = FakeRequest(self.command, urllib.parse.unquote(split.path),
+                                      dict(urllib.parse.parse_qsl(split.query, keep_blank_values=True)),
+                                      dict(self.headers), self.rfile.read(length) if length else b'')
+                service_layer.requests.append(request)
+                status, body, *headers = service_layer._dispatch(request)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode()
+                elif isinstance(body, str):
+                    body = body.encode()
+                body = body or b''
+                self.send_response(status)
+                for name, value in (headers[0] if headers else {}).items():
+                    self.send_header(name, value)
+                if 'Content-Type' not in (headers[0] if headers else {}):
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+
+def _reset_sap_state():
+    """Forget pools, caches and remembered SAP capabilities between tests"""
+    import sap_cache
+    import sap_integration
+
+    for pool in list(sap_integration._session_pools.values()):
+        pool.close()
+    sap_integration._session_pools.clear()
+    sap_integration._rejected_projections.clear()
+    sap_integration._registered_sql_queries.clear()
+    sap_cache._caches.clear()
+    sap_cache._backend = None
+
+
+@pytest.fixture
+def service_layer(monkeypatch):
+    """Fake Service Layer with the SAP_B1_* settings pointing at it"""
+    fake = FakeServiceLayer()
+    monkeypatch.setenv('SAP_B1_SERVER', fake.url)
+    monkeypatch.setenv('SAP_B1_USERNAME', 'manager')
+    monkeypatch.setenv('SAP_B1_PASSWORD', 'secret')
+    monkeypatch.setenv('SAP_B1_COMPANY_DB', 'TESTDB')
+    _reset_sap_state()
+    yield fake
+    _reset_sap_state()
+    fake.shutdown()
+
+
+@pytest.fixture
+def sap(service_layer):
+    """SAPIntegration talking to the fake Service Layer"""
+    from sap_integration import SAPIntegration
+    return SAPIntegration()
+
+
+@pytest.fixture
+def database():
+    """Empty SQLite schema inside an application context"""
+    from app import app, db
+    import models  # noqa: F401 - registers the tables
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(database):
+    """Test client of the web app, logged in as an admin user"""
+    from app import app
+    from models import User
+    import routes  # noqa: F401 - registers the routes
+
+    admin = User(username='admin', email='admin@example.com', password_hash='-', role='admin')
+    database.session.add(admin)
+    database.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+    return client
@@ -0,0 +1,139 @@
+"""
+Bulk writes for tables filled from SAP B1
+Upserts rows in chunks with INSERT ... ON CONFLICT DO UPDATE (PostgreSQL, SQLite) or
+INSERT ... ON DUPLICATE KEY UPDATE (MySQL), one executemany and one transaction per chunk,
+and inserts pick list lines with their bin allocations without a flush per line
+"""
+import logging
+import os
+import threading
+from collections import Counter
+
+import sqlalchemy as sa
+
+# Rows written per statement batch and transaction
+DB_BULK_CHUNK_SIZE = int(os.environ.get('DB_BULK_CHUNK_SIZE', '2000'))
+
+_ensured_tables = set()
+_ensured_tables_lock = threading.Lock()
+
+
+def _dialect_insert(dialect):
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Bulk upsert is not supported on {dialect}")
+    return insert
+
+
+def ensure_table(table_name, ddl):
+    """Create a table once per process
+
+    ddl maps a dialect name ('postgresql', 'mysql', 'sqlite') to its
+    CREATE TABLE IF NOT EXISTS statement.
+    """
+    from app import db
+
+    with _ensured_tables_lock:
+        if table_name in _ensured_tables:
+            return
+        dialect = db.engine.dialect.name
+        db.session.execute(db.text(ddl.get(dialect, ddl['sqlite'])))
+        db.session.commit()
+        _ensured_tables.add(table_name)
+
+
+def upsert_statement(table_name, columns, key_columns, update_columns, dialect):
+    """INSERT of the given columns that updates update_columns when key_columns already exist"""
+    table = sa.table(table_name, *[sa.column(name) for name in columns])
+    stmt = _dialect_insert(dialect)(table)
+    if dialect in ('mysql', 'mariadb'):
+        # MySQL resolves the conflict on any unique key of the table
+        return stmt.on_duplicate_key_update(
+            {name: stmt.inserted[name] for name in update_columns or key_columns[:1]})
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=key_columns)
+    return stmt.on_conflict_do_update(index_elements=key_columns,
+                                      set_={name: stmt.excluded[name] for name in update_columns})
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_upsert(table_name, rows, key_columns, update_columns=None, chunk_size=None):
+    """Insert or update rows (dicts with the same keys); returns the number of rows written
+
+    key_columns must match a primary key or unique constraint of the table.
+    Rows repeating a key within a chunk are collapsed to the last one, as
+    PostgreSQL rejects an upsert touching the same row twice. A failed
+    chunk is rolled back and the error raised; earlier chunks stay committed.
+    """
+    from app import db
+
+    chunk_size = chunk_size or DB_BULK_CHUNK_SIZE
+    dialect = db.engine.dialect.name
+    stmt = None
+    written = 0
+
+    for chunk in _chunks(rows, chunk_size):
+        by_key = {tuple(row[name] for name in key_columns): row for row in chunk}
+        if stmt is None:
+            stmt = upsert_statement(table_name, list(chunk[0]), key_columns, update_columns, dialect)
+        try:
+            db.session.execute(stmt, list(by_key.values()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        written += len(by_key)
+        logging.debug(f"Upserted {written} rows into {table_name}")
+
+    return written
+
+
+def bulk_insert_pick_list_lines(pick_list_id, rows):
+    """Insert pick list lines and their bin allocations; returns (lines, allocations) inserted
+
+    rows is a list of (PickListLine values, [PickListBinAllocation values]).
+    Lines and allocations are written with one executemany each; the line IDs
+    are read back by line_number in between, so no per-line flush or RETURNING
+    support is needed. That requires every line_number to be set and unique
+    within the pick list, otherwise ValueError is raised before any insert.
+    """
+    from app import db
+    from models import PickListLine, PickListBinAllocation
+
+    if not rows:
+        return 0, 0
+
+    line_numbers = [values.get('line_number') for values, _ in rows]
+    if None in line_numbers:
+        raise ValueError(f"Pick list {pick_list_id} has lines without a line number")
+    taken = {number for (number,) in db.session.query(PickListLine.line_number).filter(
+        PickListLine.pick_list_id == pick_list_id)}
+    counts = Counter(line_numbers)
+    duplicates = sorted(number for number, count in counts.items() if count > 1 or number in taken)
+    if duplicates:
+        raise ValueError(f"Pick list {pick_list_id} has duplicate line numbers: {duplicates}")
+
+    db.session.execute(db.insert(PickListLine),
+                       [dict(values, pick_list_id=pick_list_id) for values, _ in rows])
+    line_ids = dict(db.session.query(PickListLine.line_number, PickListLine.id).filter(
+        PickListLine.pick_list_id == pick_list_id))
+    allocations = [dict(allocation, pick_list_line_id=line_ids[values['line_number']])
+                   for values, line_allocations in rows for allocation in line_allocations]
+    if allocations:
+        db.session.execute(db.insert(PickListBinAllocation), allocations)
+    return len(rows), len(allocations)
@@ -0,0 +1,100 @@
+"""
+Item master catalog
+Single entry point for SAP B1 item lookups: bulk fetch, TTL cache and
+negative caching of item codes SAP does not know
+"""
+import logging
+
+from sap_cache import get_cache
+from sap_integration import ITEM_CATALOG_SELECT, chunked, odata_in_filter
+
+
+class ItemCatalog:
+    """Item master data for one SAPIntegration client
+
+    Usage:
+        catalog = ItemCatalog(sap)
+        items = catalog.get_many(['A001', 'A002'])
+
+    Items not in the cache are read from the local mirror (sap_mirror) when
+    it is fresh, then from SAP. Items are cached in the shared 'item' cache; codes SAP reports as
+    unknown are cached in 'item_missing' (shorter TTL) so a mistyped
+    barcode does not hit SAP on every scan.
+    """
+
+    def __init__(self, sap):
+        self.sap = sap
+        self._items = get_cache('item')
+        self._missing = get_cache('item_missing')
+
+    def get_many(self, item_codes):
+        """Look up several item codes with as few SAP requests as possible
+
+        Returns:
+            Dict of item_code -> Items record, or None when SAP has no such
+            item. Codes that could not be resolved (SAP offline or failing)
+            are left out, so callers can tell "unknown" from "unavailable".
+        """
+        item_codes = list(dict.fromkeys(code for code in item_codes if code))
+        results = {}
+        to_fetch = []
+        for item_code in item_codes:
+            cached_item = self._items.get(item_code)
+            if cached_item is not None:
+                results[item_code] = cached_item
+            elif self._missing.get(item_code):
+                results[item_code] = None
+            else:
+                to_fetch.append(item_code)
+
+        mirrored = self.sap.mirror.get_many('items', to_fetch) if to_fetch else None
+        for item_code, item in (mirrored or {}).items():
+            self._items.set(item_code, item)
+            results[item_code] = item
+        to_fetch = [item_code for item_code in to_fetch if item_code not in results]
+
+        if not to_fetch or not self.sap.ensure_logged_in():
+            return results
+
+        for code_chunk in chunked(to_fetch):
+            try:
+                found = self._fetch(code_chunk)
+            except Exception as e:
+                logging.error(f"Error fetching items {code_chunk} from SAP B1: {str(e)}")
+                break
+
+            for item_code in code_chunk:
+                item = found.get(item_code.upper())
+                if item is not None:
+                    self._items.set(item_code, item)
+                else:
+                    logging.info(f"⚠️ Item {item_code} not found in SAP B1")
+                    self._missing.set(item_code, True)
+                results[item_code] = item
+
+        logging.debug(f"📚 Item catalog: {len(item_codes) - len(to_fetch)} cached, {len(to_fetch)} fetched")
+        return results
+
+    def _fetch(self, item_codes):
+        """Fetch one chunk of items; returns dict of upper-cased ItemCode -> record
+
+        A projection rejected by this SAP version is remembered process-wide
+        by get_projected, so later lookups load whole records straight away.
+        """
+        rows = self.sap.iter_odata('Items', filter=odata_in_filter('ItemCode', item_codes),
+                                   profile='item_catalog')
+        return {(row.get('ItemCode') or '').upper(): row for row in rows}
+
+    def get(self, item_code):
+        """Items record for one code, or None if unknown or unavailable"""
+        return self.get_many([item_code]).get(item_code)
+
+    def get_name(self, item_code):
+        """ItemName for one code, or None if unknown or unavailable"""
+        item = self.get(item_code)
+        return item.get('ItemName') if item else None
+
+    def invalidate(self, item_code=None):
+        """Forget one item (or all items), including negative entries"""
+        self._items.invalidate(item_code)
+        self._missing.invalidate(item_code)
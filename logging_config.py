@@ -1,14 +1,88 @@
 """
 Logging Configuration for WMS Application
-Configures file-based logging with rotation
+Configures file-based logging with rotation. Handlers run on a background
+QueueListener thread so request threads never wait on disk I/O.
 """
+import atexit
+import itertools
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
-import logging
 import sys
 
+# Listener thread that writes queued records to the real handlers
+_queue_listener = None
+
+
+class LazyJSON:
+    """JSON dump of a payload that is only built when a handler formats the record
+
+    Usage:
+        payload_log.debug("JSON payload: %s", LazyJSON(transfer_data))
+    """
+
+    def __init__(self, payload, indent=2):
+        self.payload = payload
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.payload, indent=self.indent, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every N records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+def configure_sampling(sample_rates):
+    """Sample high-volume loggers, e.g. "sap.pick_list_lines=0.1,sap.payloads=0.5"
+
+    A rate of 1 logs everything, 0.1 one record in ten, 0 drops all records
+    below WARNING. Returns the logger name -> rate mapping applied.
+    """
+    applied = {}
+    for entry in (sample_rates or '').split(','):
+        if '=' not in entry:
+            continue
+        logger_name, rate = (part.strip() for part in entry.split('=', 1))
+        try:
+            rate = float(rate)
+        except ValueError:
+            logging.warning(f"⚠️ Ignoring invalid log sample rate '{entry}'")
+            continue
+        logger = logging.getLogger(logger_name)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        if rate < 1:
+            logger.addFilter(SamplingFilter(rate))
+        applied[logger_name] = rate
+    return applied
+
+
+def _stop_queue_listener():
+    """Flush queued records and stop the listener thread"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
 
 
 def setup_logging(app):
@@ -24,6 +98,10 @@ def setup_logging(app):
     LOG_FORMAT = os.environ.get('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     LOG_TO_CONSOLE = os.environ.get('LOG_TO_CONSOLE', 'True').lower() == 'true'
     LOG_TO_FILE = os.environ.get('LOG_TO_FILE', 'True').lower() == 'true'
+    # Write records from a background thread instead of the logging thread
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', 'True').lower() == 'true'
+    # Per-logger sampling of high-volume messages, e.g. "sap.pick_list_lines=0.1"
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
 
     # Create logs directory if it doesn't exist
     os.makedirs(LOG_PATH, exist_ok=True)
@@ -32,6 +110,8 @@ def setup_logging(app):
     log_level = getattr(logging, LOG_LEVEL, logging.INFO)
     
     # Clear any existing handlers
+    global _queue_listener
+    _stop_queue_listener()
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
     
@@ -75,6 +155,12 @@ def setup_logging(app):
         error_handler.setFormatter(formatter)
         handlers.append(error_handler)
     
+    # Route records through a queue; the listener thread does the formatting and disk writes
+    if LOG_ASYNC and handlers:
+        _queue_listener = QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+        _queue_listener.start()
+        handlers = [QueueHandler(_queue_listener.queue)]
+
     # Add all handlers
     for handler in handlers:
         logging.root.addHandler(handler)
@@ -84,11 +170,15 @@ def setup_logging(app):
         app.logger.setLevel(log_level)
         for handler in handlers:
             app.logger.addHandler(handler)
+
+    sample_rates = configure_sampling(LOG_SAMPLE_RATES)
     
     # Log startup message
-    logging.info(f"Logging initialized - Level: {LOG_LEVEL}, Path: {LOG_PATH}")
+    logging.info(f"Logging initialized - Level: {LOG_LEVEL}, Path: {LOG_PATH}, Async: {LOG_ASYNC}")
     if LOG_TO_FILE:
         logging.info(f"Log files: {LOG_PATH}/{LOG_FILE_PREFIX}.log and {LOG_PATH}/{LOG_FILE_PREFIX}_error.log")
+    if sample_rates:
+        logging.info(f"Log sampling: {sample_rates}")
     
     return logging.getLogger(__name__)
 
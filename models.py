@@ -357,6 +357,19 @@ class PickListBinAllocation(db.Model):
     pick_list_line = relationship('PickListLine', back_populates='bin_allocations')
 
 
+class PickListSyncState(db.Model):
+    """Fingerprint of the SAP B1 pick list content last synced into pick_list_lines"""
+    __tablename__ = 'pick_list_sync_state'
+
+    pick_list_id = db.Column(db.Integer, db.ForeignKey('pick_lists.id'), primary_key=True)
+    sap_fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of the synced lines and allocations
+    line_count = db.Column(db.Integer, default=0)
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PickListSyncState {self.pick_list_id} {self.sap_fingerprint[:8]}>'
+
+
 class InventoryCount(db.Model):
     __tablename__ = 'inventory_counts'
 
@@ -778,3 +791,77 @@ class SerialItemTransferItem(db.Model):
     def __repr__(self):
         return f'<SerialItemTransferItem {self.serial_number}>'
 
+
+
+class SAPMirrorRecord(db.Model):
+    """Local copy of one SAP B1 master data record (see sap_mirror)"""
+    __tablename__ = 'sap_mirror_records'
+    __table_args__ = (
+        db.UniqueConstraint('entity', 'record_key', name='uq_sap_mirror_entity_key'),
+        db.Index('ix_sap_mirror_entity_parent', 'entity', 'parent_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # warehouses, bins, items, batches
+    record_key = db.Column(db.String(100), nullable=False)  # WarehouseCode, AbsEntry, ItemCode, DocEntry
+    parent_key = db.Column(db.String(100), nullable=True)  # Warehouse of a bin, ItemCode of a batch
+    data = db.Column(db.Text, nullable=False)  # SAP record as JSON
+    sap_updated_at = db.Column(db.DateTime, nullable=True)  # SAP UpdateDate + UpdateTime
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SAPMirrorRecord {self.entity} {self.record_key}>'
+
+
+class SAPSyncState(db.Model):
+    """Sync watermark and health of one mirrored SAP B1 entity"""
+    __tablename__ = 'sap_sync_state'
+
+    entity = db.Column(db.String(50), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=True)  # Latest SAP UpdateDate/UpdateTime mirrored
+    record_count = db.Column(db.Integer, default=0)
+    last_synced_at = db.Column(db.DateTime, nullable=True)  # Last successful sync (full or delta)
+    last_full_sync_at = db.Column(db.DateTime, nullable=True)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<SAPSyncState {self.entity} {self.watermark}>'
+
+
+class SAPSyncJob(db.Model):
+    """One run of a background SAP sync job (see sap_scheduler)"""
+    __tablename__ = 'sap_sync_jobs'
+    __table_args__ = (
+        db.Index('ix_sap_sync_jobs_name_status', 'job_name', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(50), nullable=False)  # Key of sap_scheduler.SAP_SYNC_JOBS
+    trigger = db.Column(db.String(20), default='scheduled')  # scheduled, manual
+    status = db.Column(db.String(20), default='queued')  # queued, running, success, failed, skipped
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    node = db.Column(db.String(100), nullable=True)  # host:pid that ran the job
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON summary returned by the job
+    error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'trigger': self.trigger,
+            'status': self.status,
+            'node': self.node,
+            'queued_at': self.queued_at.isoformat() if self.queued_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_seconds': self.duration_seconds,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return f'<SAPSyncJob {self.job_name} {self.status}>'
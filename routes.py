@@ -248,48 +248,27 @@ def get_item_name():
         
         sap = SAPIntegration()
         
-        # Try to get item name from SAP B1
+        # Try to get item name from SAP B1 (cached item catalog)
         if sap.ensure_logged_in():
-            try:
-                # Use the SAP endpoint provided by user: https://192.168.0.127:50000/b1s/v1/Items?$select=ItemCode,ItemName
-                url = f"{sap.base_url}/b1s/v1/Items"
-                params = {
-                    '$filter': f"ItemCode eq '{item_code}'",
-                    '$select': 'ItemCode,ItemName'
-                }
-                response = sap.session.get(url, params=params, timeout=10)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    items = data.get('value', [])
+            items = sap.item_catalog.get_many([item_code])
+            if item_code in items:
+                item = items[item_code]
+                if item:
+                    item_name = item.get('ItemName') or f'Item {item_code}'
                     
-                    if items and len(items) > 0:
-                        item = items[0]
-                        item_name = item.get('ItemName') or f'Item {item_code}'
-                        
-                        logging.info(f"Retrieved item name for {item_code}: {item_name}")
-                        return jsonify({
-                            'success': True,
-                            'item_code': item_code,
-                            'item_name': item_name
-                        })
-                    else:
-                        # Item not found in SAP
-                        return jsonify({
-                            'success': False,
-                            'error': f'Item code {item_code} not found in SAP B1'
-                        }), 404
-                        
-            except Exception as sap_error:
-                logging.error(f"Error getting item from SAP: {str(sap_error)}")
-                # Return fallback response
-                return jsonify({
-                    'success': True,
-                    'item_code': item_code,
-                    'item_name': f'Item {item_code}',
-                    'fallback': True
-                })
-        
+                    logging.info(f"Retrieved item name for {item_code}: {item_name}")
+                    return jsonify({
+                        'success': True,
+                        'item_code': item_code,
+                        'item_name': item_name
+                    })
+                else:
+                    # Item not found in SAP
+                    return jsonify({
+                        'success': False,
+                        'error': f'Item code {item_code} not found in SAP B1'
+                    }), 404
+
         # Return fallback if SAP not available
         return jsonify({
             'success': True,
@@ -1862,7 +1841,9 @@ def pick_list_detail(pick_list_id):
                 
                 # Sync line items and bin allocations to local database
                 sync_result = sap.sync_pick_list_to_local_db(sap_pick_list, pick_list)
-                if sync_result.get('success'):
+                if sync_result.get('skipped'):
+                    logging.debug(f"Pick list {pick_list.absolute_entry} unchanged in SAP B1")
+                elif sync_result.get('success'):
                     # Refresh pick list lines after sync
                     pick_list_lines = PickListLine.query.filter_by(pick_list_id=pick_list.id).all()
                     logging.info(f"✅ Synced {sync_result.get('synced_lines', 0)} lines from SAP B1")
@@ -2074,7 +2055,8 @@ def import_sap_pick_list(absolute_entry):
     
     try:
         from sap_integration import SAPIntegration
-        from models import PickListLine, PickListBinAllocation
+        from db_bulk import bulk_insert_pick_list_lines
+        from models import PickListLine, PickListBinAllocation, PickListSyncState
         
         sap = SAPIntegration()
         
@@ -2096,10 +2078,13 @@ def import_sap_pick_list(absolute_entry):
         if existing_pick_list:
             pick_list = existing_pick_list
             # Clear existing lines and allocations
-            PickListBinAllocation.query.join(PickListLine).filter(
-                PickListLine.pick_list_id == pick_list.id
-            ).delete()
-            PickListLine.query.filter_by(pick_list_id=pick_list.id).delete()
+            line_ids = db.session.query(PickListLine.id).filter_by(pick_list_id=pick_list.id)
+            PickListBinAllocation.query.filter(
+                PickListBinAllocation.pick_list_line_id.in_(line_ids.scalar_subquery())
+            ).delete(synchronize_session=False)
+            PickListLine.query.filter_by(pick_list_id=pick_list.id).delete(synchronize_session=False)
+            # Lines no longer match the last detail view sync
+            PickListSyncState.query.filter_by(pick_list_id=pick_list.id).delete(synchronize_session=False)
         else:
             # Extract sales order info from first line if available
             first_line = sap_pick_list.get('PickListsLines', [{}])[0] if sap_pick_list.get('PickListsLines') else {}
@@ -2136,44 +2121,13 @@ def import_sap_pick_list(absolute_entry):
         
         db.session.flush()  # Get the pick_list.id
         
-        # Import pick list lines
-        lines_imported = 0
-        allocations_imported = 0
+        # Same line and allocation values as sync_pick_list_to_local_db, inserted in bulk
+        rows = list(sap._pick_list_sync_rows(sap_pick_list).values())
         
-        for sap_line in sap_pick_list.get('PickListsLines', []):
-            pick_list_line = PickListLine(
-                pick_list_id=pick_list.id,
-                absolute_entry=sap_line.get('AbsoluteEntry'),
-                line_number=sap_line.get('LineNumber'),
-                order_entry=sap_line.get('OrderEntry'),
-                order_row_id=sap_line.get('OrderRowID', 0),
-                picked_quantity=sap_line.get('PickedQuantity', 0.0),
-                pick_status=sap_line.get('PickStatus', 'ps_Open'),
-                released_quantity=sap_line.get('ReleasedQuantity', 0.0),
-                previously_released_quantity=sap_line.get('PreviouslyReleasedQuantity', 0.0),
-                base_object_type=sap_line.get('BaseObjectType')
-            )
-            
-            db.session.add(pick_list_line)
-            db.session.flush()  # Get the line id
-            lines_imported += 1
-            
-            # Import bin allocations for this line
-            for sap_allocation in sap_line.get('DocumentLinesBinAllocations', []):
-                bin_allocation = PickListBinAllocation(
-                    pick_list_line_id=pick_list_line.id,
-                    bin_abs_entry=sap_allocation.get('BinAbsEntry'),
-                    quantity=sap_allocation.get('Quantity', 0.0),
-                    allow_negative_quantity=sap_allocation.get('AllowNegativeQuantity', 'tNO'),
-                    serial_and_batch_numbers_base_line=sap_allocation.get('SerialAndBatchNumbersBaseLine', 0),
-                    base_line_number=sap_allocation.get('BaseLineNumber')
-                )
-                
-                db.session.add(bin_allocation)
-                allocations_imported += 1
+        lines_imported, allocations_imported = bulk_insert_pick_list_lines(pick_list.id, rows)
         
         # Update pick list totals
-        pick_list.total_items = lines_imported
+        pick_list.total_items = len(sap_pick_list.get('PickListsLines', []))
         pick_list.picked_items = len([line for line in sap_pick_list.get('PickListsLines', []) 
                                     if line.get('PickStatus') == 'ps_Closed'])
         
@@ -3665,27 +3619,83 @@ def get_bins_api():
 @app.route('/sync-sap-data', methods=['POST'])
 @login_required
 def sync_sap_data():
-    """Sync master data from SAP B1"""
+    """Queue master data sync jobs; they run in the background (see sap_scheduler)"""
     if current_user.role not in ['admin', 'manager']:
         flash('You do not have permission to sync SAP data', 'error')
         return redirect(url_for('dashboard'))
     
-    from sap_integration import SAPIntegration
-    sap_integration = SAPIntegration()
-    results = sap_integration.sync_all_master_data()
-    
-    success_count = sum(1 for result in results.values() if result)
-    total_count = len(results)
-    
-    if success_count == total_count:
-        flash(f'SAP master data synchronized successfully! ({success_count}/{total_count} completed)', 'success')
-    elif success_count > 0:
-        flash(f'SAP master data partially synchronized ({success_count}/{total_count} completed)', 'warning')
+    from sap_scheduler import SAP_SYNC_MANUAL_JOBS, get_scheduler
+    scheduler = get_scheduler(app)
+    # enqueue skips jobs already queued or running on any node
+    queued = [job_name for job_name in SAP_SYNC_MANUAL_JOBS
+              if scheduler.enqueue(job_name, trigger='manual', requested_by=current_user.id)]
+    in_progress = [job_name for job_name in SAP_SYNC_MANUAL_JOBS if job_name not in queued]
+    
+    if queued:
+        message = f'SAP master data sync queued ({len(queued)} jobs). Progress is shown under SAP sync jobs.'
+        if in_progress:
+            message += f' Already running: {", ".join(in_progress)}.'
+        flash(message, 'success')
     else:
-        flash('Failed to synchronize SAP master data. Check SAP connection.', 'error')
+        flash('SAP master data sync is already in progress.', 'info')
     
     return redirect(url_for('dashboard'))
 
+@app.route('/api/sap-sync-jobs', methods=['GET'])
+@login_required
+def sap_sync_jobs():
+    """Status and duration of the latest background SAP sync jobs"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'error': 'Permission denied'}), 403
+    
+    from sap_scheduler import get_scheduler
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'success': True, 'jobs': get_scheduler(app).recent_jobs(limit)})
+
+@app.route('/api/sap-cache', methods=['GET', 'DELETE'])
+@login_required
+def sap_cache_admin():
+    """Show SAP cache hit/miss counters, or invalidate cached SAP data"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'error': 'Permission denied'}), 403
+
+    from sap_cache import cache_stats, invalidate_cache
+    if request.method == 'DELETE':
+        entity = request.args.get('entity') or None
+        key = request.args.get('key') or None
+        if key is not None and entity is None:
+            return jsonify({'success': False, 'error': 'Entity is required to invalidate a key'}), 400
+        invalidate_cache(entity, key)
+        logging.info(f"🧹 SAP cache invalidated by {current_user.username}: {request.args.to_dict()}")
+
+    return jsonify({'success': True, 'cache': cache_stats()})
+
+@app.route('/api/sap-status', methods=['GET'])
+@login_required
+def sap_status():
+    """SAP B1 connectivity as seen by the circuit breaker (closed / open / half_open)
+
+    Admins and managers also get the breaker details, the freshness of the local master
+    data mirror and payload_bytes, the bytes received per SAP method while DEBUG logging is on.
+    """
+    from sap_integration import payload_stats
+    sap = SAPIntegration()
+    circuit = sap.get_circuit_state()
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({
+            'success': True,
+            'online': circuit['state'] == 'closed',
+            'circuit': {'state': circuit['state']}
+        })
+
+    return jsonify({
+        'success': True,
+        'online': circuit['state'] == 'closed',
+        'circuit': circuit,
+        'mirror': sap.mirror.status(),
+        'payload_bytes': payload_stats()
+    })
+
 # Duplicate route removed - using the one defined earlier
 
 # Default admin user is created in app.py during initialization
@@ -3700,8 +3710,8 @@ def preview_grpo_json(grpo_id):
         # Generate the same JSON that would be posted to SAP B1
         sap = SAPIntegration()
         
-        # Get PO data
-        po_data = sap.get_purchase_order(grpo_doc.po_number)
+        # Get PO data - a preview may reuse a recent unchanged snapshot
+        po_data = sap.get_purchase_order_snapshot(grpo_doc.po_number)
         if not po_data:
             return jsonify({'success': False, 'error': 'PO data not found'})
         
@@ -0,0 +1,276 @@
+"""
+Shared cache for SAP B1 master data
+Bounded, expiring caches shared by every SAPIntegration instance in the process,
+optionally backed by a SQLite file so that all gunicorn workers see the same entries
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# 'memory' (per process) or 'sqlite' (shared by all workers on the host)
+SAP_CACHE_BACKEND = os.environ.get('SAP_CACHE_BACKEND', 'memory').lower()
+# SQLite cache file used by the 'sqlite' backend
+SAP_CACHE_PATH = os.environ.get('SAP_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'wms_sap_cache.sqlite3'))
+# Maximum number of entries kept before the least recently used ones are evicted
+SAP_CACHE_MAX_ENTRIES = int(os.environ.get('SAP_CACHE_MAX_ENTRIES', '10000'))
+
+# Default time-to-live in seconds per cached entity, overridable with SAP_CACHE_TTL_<ENTITY>
+SAP_CACHE_TTLS = {
+    'item': 3600,
+    'item_missing': 300,
+    'batch': 120,
+    'bin_location': 86400,
+    'warehouse': 3600,
+    'bin': 3600,
+    'branch': 3600,
+    'transfer_request': 30,
+    'doc_entry': 3600,
+    'endpoint': 86400,
+    'purchase_order': 300,
+    'sql_query_unavailable': 120,
+}
+SAP_CACHE_DEFAULT_TTL = 300
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU store with per-entry expiry
+
+    Values are stored as JSON like in SQLiteCacheBackend, so every get returns
+    a fresh copy that callers may modify without changing the cached entry.
+    """
+
+    def __init__(self, max_entries=SAP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value) for a key, dropping it if expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+        return True, json.loads(value)
+
+    def set(self, key, value, ttl):
+        try:
+            value = json.dumps(value, default=str)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"⚠️ SAP cache write failed for {key}: {str(e)}")
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU store with per-entry expiry in a SQLite file shared between processes
+
+    Values are stored as JSON. Any SQLite error is logged and treated as a
+    cache miss so that a broken cache file never breaks SAP calls.
+    """
+
+    # Expired and surplus rows are purged every this many writes
+    PURGE_INTERVAL = 200
+
+    def __init__(self, path=SAP_CACHE_PATH, max_entries=SAP_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sap_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_sap_cache_accessed ON sap_cache (accessed_at)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                'SELECT value, expires_at FROM sap_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return False, None
+            now = time.time()
+            if row[1] <= now:
+                connection.execute('DELETE FROM sap_cache WHERE key = ?', (key,))
+                return False, None
+            connection.execute('UPDATE sap_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            return True, json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logging.warning(f"⚠️ SAP cache read failed for {key}: {str(e)}")
+            return False, None
+
+    def set(self, key, value, ttl):
+        try:
+            now = time.time()
+            connection = self._connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO sap_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, default=str), now + ttl, now))
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._purge(connection, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logging.warning(f"⚠️ SAP cache write failed for {key}: {str(e)}")
+
+    def _purge(self, connection, now):
+        """Drop expired rows, then the least recently used ones above max_entries"""
+        connection.execute('DELETE FROM sap_cache WHERE expires_at <= ?', (now,))
+        connection.execute(
+            'DELETE FROM sap_cache WHERE key IN ('
+            'SELECT key FROM sap_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,))
+
+    def delete(self, key):
+        try:
+            self._connection().execute('DELETE FROM sap_cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ SAP cache delete failed for {key}: {str(e)}")
+
+    def clear(self, prefix=''):
+        try:
+            self._connection().execute(
+                "DELETE FROM sap_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ SAP cache clear failed for {prefix}: {str(e)}")
+
+    def __len__(self):
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM sap_cache').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+class SAPCache:
+    """Cache of one SAP entity (items, batches, bin locations, ...)
+
+    Supports the dict operations the SAP client uses (``get``, ``in``,
+    ``[]``) plus per-entity TTL, invalidation and hit/miss counters.
+    Keys are converted to strings.
+    """
+
+    def __init__(self, namespace, backend, ttl=None):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else SAP_CACHE_DEFAULT_TTL
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        found, value = self.backend.get(self._key(key))
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value if found else default
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self._key(key), value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry of this entity when no key is given"""
+        if key is None:
+            self.backend.clear(f"{self.namespace}:")
+        else:
+            self.backend.delete(self._key(key))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+    def __contains__(self, key):
+        return self.backend.get(self._key(key))[0]
+
+    def __getitem__(self, key):
+        found, value = self.backend.get(self._key(key))
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.invalidate(key)
+
+
+_backend = None
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _create_backend():
+    if SAP_CACHE_BACKEND == 'sqlite':
+        logging.info(f"🗄️ SAP cache backend: SQLite file {SAP_CACHE_PATH}")
+        return SQLiteCacheBackend(SAP_CACHE_PATH, SAP_CACHE_MAX_ENTRIES)
+    return MemoryCacheBackend(SAP_CACHE_MAX_ENTRIES)
+
+
+def get_cache(namespace):
+    """Return the process-wide cache of an SAP entity, creating it on first use"""
+    global _backend
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            if _backend is None:
+                _backend = _create_backend()
+            ttl = int(os.environ.get(f"SAP_CACHE_TTL_{namespace.upper()}",
+                                     SAP_CACHE_TTLS.get(namespace, SAP_CACHE_DEFAULT_TTL)))
+            cache = SAPCache(namespace, _backend, ttl)
+            _caches[namespace] = cache
+        return cache
+
+
+def invalidate_cache(namespace=None, key=None):
+    """Invalidate one entry, one entity, or (no arguments) every SAP cache"""
+    if namespace is None:
+        for cache in list(_caches.values()):
+            cache.invalidate()
+    else:
+        get_cache(namespace).invalidate(key)
+
+
+def cache_stats():
+    """Hit/miss counters of this process per entity, plus the backend entry count"""
+    return {
+        'backend': SAP_CACHE_BACKEND,
+        'entries': len(_backend) if _backend is not None else 0,
+        'caches': {namespace: cache.stats() for namespace, cache in _caches.items()}
+    }
@@ -1,13 +1,808 @@
 import requests
+import hashlib
 import json
 import logging
 import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import urllib.parse
 import urllib3
 
+from db_bulk import bulk_insert_pick_list_lines, bulk_upsert, ensure_table
+from logging_config import LazyJSON
+from sap_cache import get_cache
+from sap_json import use_fast_json
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Number of logged-in Service Layer sessions shared by the whole process
+SAP_SESSION_POOL_SIZE = int(os.environ.get('SAP_B1_SESSION_POOL_SIZE', '4'))
+# Seconds a caller waits for a free pooled session before giving up
+SAP_SESSION_POOL_TIMEOUT = float(os.environ.get('SAP_B1_SESSION_POOL_TIMEOUT', '30'))
+# Seconds allowed for logging out a pooled session that is dropped after a failed request
+SAP_SESSION_DISCARD_LOGOUT_TIMEOUT = float(os.environ.get('SAP_B1_SESSION_DISCARD_LOGOUT_TIMEOUT', '3'))
+# Serial validation chunks sent concurrently, and the upper limit for callers. Each chunk
+# holds one pooled session while in flight, so at most pool size - 1 run at once and one
+# session stays free for other requests; raise SAP_B1_SESSION_POOL_SIZE along with this
+SAP_SERIAL_VALIDATION_WORKERS = max(1, int(os.environ.get('SAP_B1_SERIAL_VALIDATION_WORKERS', '8')))
+# Rows per page requested with Prefer: odata.maxpagesize (Service Layer default is 20)
+SAP_ODATA_PAGE_SIZE = int(os.environ.get('SAP_B1_ODATA_PAGE_SIZE', '500'))
+# Maximum number of GETs packed into a single $batch request
+SAP_BATCH_MAX_REQUESTS = int(os.environ.get('SAP_B1_BATCH_MAX_REQUESTS', '100'))
+# Characters left as they are in $batch request lines (OData keys, options and filters)
+BATCH_PATH_SAFE = "/?&=$(),'*:"
+# Maximum number of keys combined into one "field eq a or field eq b ..." filter
+SAP_FILTER_CHUNK_SIZE = int(os.environ.get('SAP_B1_FILTER_CHUNK_SIZE', '40'))
+# Seconds to wait for a TCP connection / for a response when a call sets no timeout
+SAP_CONNECT_TIMEOUT = float(os.environ.get('SAP_B1_CONNECT_TIMEOUT', '5'))
+SAP_REQUEST_TIMEOUT = float(os.environ.get('SAP_B1_REQUEST_TIMEOUT', '30'))
+# Consecutive failed or slow calls that open the circuit breaker
+SAP_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('SAP_B1_CIRCUIT_FAILURES', '5'))
+# Seconds the breaker stays open before letting a half-open probe through
+SAP_CIRCUIT_RECOVERY_TIMEOUT = float(os.environ.get('SAP_B1_CIRCUIT_RECOVERY', '30'))
+# Calls slower than this count as failures (latency spike)
+SAP_SLOW_CALL_SECONDS = float(os.environ.get('SAP_B1_SLOW_CALL_SECONDS', '15'))
+
+# Stored SQL query returning the item and batch quantities held in one bin.
+# OIBQ is per item per bin, OBBQ per batch per bin, so only the scanned
+# bin's rows are read instead of the stock of the whole warehouse.
+BIN_STOCK_QUERY_CODE = 'Bin_Stock'
+BIN_STOCK_QUERY_NAME = 'WMS bin stock by bin AbsEntry'
+BIN_STOCK_QUERY_SQL = (
+    'SELECT T0."ItemCode", T1."ItemName", T1."InvntryUom", T1."OnHand" AS "ItemOnHand", '
+    'T0."OnHandQty", T2."OnOrder", T2."AvgPrice", '
+    'T4."DistNumber", T3."OnHandQty" AS "BatchQty", T4."ExpDate", T4."InDate", T4."MnfDate", T4."Status" '
+    'FROM OIBQ T0 '
+    'INNER JOIN OITM T1 ON T1."ItemCode" = T0."ItemCode" '
+    'INNER JOIN OITW T2 ON T2."ItemCode" = T0."ItemCode" AND T2."WhsCode" = T0."WhsCode" '
+    'LEFT JOIN OBBQ T3 ON T3."BinAbs" = T0."BinAbs" AND T3."ItemCode" = T0."ItemCode" AND T3."OnHandQty" > 0 '
+    'LEFT JOIN OBTN T4 ON T4."AbsEntry" = T3."SnBMDAbs" '
+    'WHERE T0."BinAbs" = :binAbs AND T0."OnHandQty" > 0'
+)
+# Where transfer requests may live, tried in this order until one resolves;
+# the one that worked is remembered per installation
+TRANSFER_REQUEST_ENDPOINTS = [
+    ('InventoryTransferRequests', '{}'),
+    ('InventoryTransferRequests', "'{}'"),
+    ('StockTransfers', '{}'),
+    ('StockTransfers', "'{}'"),
+]
+TRANSFER_REQUEST_KEY_PREFIX = 'transfer_request'
+# High-volume loggers that can be sampled with LOG_SAMPLE_RATES (see logging_config)
+payload_log = logging.getLogger('sap.payloads')  # request bodies, DEBUG only
+pick_list_lines_log = logging.getLogger('sap.pick_list_lines')  # one record per pick list line
+
+# Items fields loaded into the item catalog (Service Layer property names)
+ITEM_CATALOG_SELECT = [
+    'ItemCode', 'ItemName', 'ForeignName', 'ItemsGroupCode', 'BarCode', 'ItemType',
+    'InventoryUOM', 'SalesUnit', 'PurchaseUnit', 'UoMGroupEntry', 'InventoryUoMEntry',
+    'DefaultWarehouse', 'ManageSerialNumbers', 'ManageBatchNumbers',
+    'QuantityOnStock', 'QuantityOrderedFromVendors', 'QuantityOrderedByCustomers',
+    'MinInventory', 'Valid', 'Frozen', 'User_Text'
+]
+
+# Named $select/$expand projections, one per use case, so reads only transfer the fields
+# their callers use. Nested collections (DocumentLines, PickListsLines) come back whole.
+SAP_PROJECTIONS = {
+    # PO header fields used by GRPO creation, validation and posting, plus its lines
+    'purchase_order': {
+        '$select': 'DocEntry,DocNum,DocDate,DocDueDate,DocumentStatus,CardCode,CardName,NumAtCard,'
+                   'DocTotal,DocCurrency,Comments,BPL_IDAssignedToInvoice,UpdateDate,UpdateTime,DocumentLines'
+    },
+    # Cheap revalidation of a PO snapshot before posting
+    'purchase_order_check': {'$select': 'DocEntry,UpdateDate,UpdateTime'},
+    # Pick list headers with their lines, for the pick list screens and sync
+    'pick_list': {
+        '$select': 'Absoluteentry,Name,OwnerCode,OwnerName,PickDate,Remarks,Status,ObjectType,'
+                   'UseBaseUnits,PickListsLines'
+    },
+    # Item master lookups (item_catalog)
+    'item_catalog': {'$select': ','.join(ITEM_CATALOG_SELECT)},
+    # Bin dropdowns
+    'bin_dropdown': {'$select': 'AbsEntry,BinCode,Warehouse,Description'},
+    # Stock check of one batch
+    'batch_stock': {'$select': 'DocEntry,ItemCode,Batch,Status,ExpirationDate,ManufacturingDate,SystemNumber'},
+    # Master data sync into the local database
+    'warehouse_sync': {'$select': 'WarehouseCode,WarehouseName,Street,Inactive,BusinessPlaceID'},
+    'bin_sync': {'$select': 'AbsEntry,BinCode,Warehouse,Description,Inactive'},
+    'business_partner_sync': {'$select': 'CardCode,CardName,CardType,Phone1,EmailAddress,Address,Valid'},
+    # Local master data mirror (sap_mirror) - UpdateDate/UpdateTime drive the delta syncs
+    'warehouse_mirror': {'$select': 'WarehouseCode,WarehouseName,Street,City,Inactive,BusinessPlaceID,'
+                                    'EnableBinLocations,UpdateDate,UpdateTime'},
+    'bin_mirror': {'$select': 'AbsEntry,BinCode,Warehouse,Description,Inactive,UpdateDate,UpdateTime'},
+    'item_mirror': {'$select': ','.join(ITEM_CATALOG_SELECT + ['UpdateDate', 'UpdateTime'])},
+    'batch_mirror': {'$select': 'DocEntry,ItemCode,ItemDescription,Batch,Status,BatchAttribute1,BatchAttribute2,'
+                                'AdmissionDate,ManufacturingDate,ExpirationDate,SystemNumber,'
+                                'UpdateDate,UpdateTime'},
+}
+# Local tables filled by sync_bins / sync_business_partners, created once per process
+BIN_LOCATIONS_DDL = {
+    'postgresql': """
+        CREATE TABLE IF NOT EXISTS bin_locations (
+            id SERIAL PRIMARY KEY,
+            bin_code VARCHAR(50) NOT NULL,
+            warehouse_code VARCHAR(10) NOT NULL,
+            bin_name VARCHAR(100),
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(bin_code, warehouse_code)
+        )
+    """,
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS bin_locations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            bin_code VARCHAR(50) NOT NULL,
+            warehouse_code VARCHAR(10) NOT NULL,
+            bin_name VARCHAR(100),
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW() ON UPDATE NOW(),
+            UNIQUE KEY unique_bin_warehouse (bin_code, warehouse_code)
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS bin_locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bin_code VARCHAR(50) NOT NULL,
+            warehouse_code VARCHAR(10) NOT NULL,
+            bin_name VARCHAR(100),
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(bin_code, warehouse_code)
+        )
+    """,
+}
+BUSINESS_PARTNERS_DDL = {
+    'postgresql': """
+        CREATE TABLE IF NOT EXISTS business_partners (
+            id SERIAL PRIMARY KEY,
+            card_code VARCHAR(50) UNIQUE NOT NULL,
+            card_name VARCHAR(200) NOT NULL,
+            card_type VARCHAR(20) NOT NULL,
+            phone VARCHAR(50),
+            email VARCHAR(100),
+            address TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """,
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS business_partners (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            card_code VARCHAR(50) UNIQUE NOT NULL,
+            card_name VARCHAR(200) NOT NULL,
+            card_type VARCHAR(20) NOT NULL,
+            phone VARCHAR(50),
+            email VARCHAR(100),
+            address TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW() ON UPDATE NOW()
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS business_partners (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            card_code VARCHAR(50) UNIQUE NOT NULL,
+            card_name VARCHAR(200) NOT NULL,
+            card_type VARCHAR(20) NOT NULL,
+            phone VARCHAR(50),
+            email VARCHAR(100),
+            address TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+# OBTN.Status values as exposed by BatchNumberDetails
+BATCH_STATUS_NAMES = {
+    '0': 'bdsStatus_Released',
+    '1': 'bdsStatus_NotAccessible',
+    '2': 'bdsStatus_Locked',
+}
+
+
+class SAPLoginError(Exception):
+    """Raised when the Service Layer rejects a login attempt"""
+    pass
+
+
+class SAPCircuitOpenError(Exception):
+    """Raised instead of calling SAP while the circuit breaker is open"""
+    pass
+
+
+class SAPRequestError(Exception):
+    """Raised when a Service Layer read returns a non-success status"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"HTTP {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class SAPBatchResponse:
+    """One demultiplexed part of a $batch response
+
+    Mirrors the parts of requests.Response the SAP helpers rely on
+    (status_code, text and json()) so parsing code can be shared.
+    """
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text) if self.text else {}
+
+
+def parse_batch_response(content_type, body):
+    """Split a multipart/mixed $batch response into SAPBatchResponse objects"""
+    boundary = None
+    for param in content_type.split(';'):
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'boundary':
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError(f"No boundary in $batch response content type: {content_type}")
+
+    responses = []
+    for part in body.split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == '--':
+            continue
+        # Part headers (Content-Type: application/http ...), then the embedded HTTP response
+        _, _, http_message = part.replace('\r\n', '\n').partition('\n\n')
+        status_line, _, rest = http_message.partition('\n')
+        if not status_line.startswith('HTTP/'):
+            continue
+        _, _, payload = rest.partition('\n\n')
+        responses.append(SAPBatchResponse(int(status_line.split()[1]), payload.strip()))
+    return responses
+
+
+class SAPCircuitBreaker:
+    """Circuit breaker guarding all calls to one Service Layer
+
+    closed    - calls go through; consecutive failures are counted
+    open      - calls fail fast with SAPCircuitOpenError for the recovery timeout
+    half_open - one probe call is let through; success closes, failure reopens
+
+    Connection errors, timeouts, gateway errors (502/503/504) and calls slower
+    than SAP_SLOW_CALL_SECONDS count as failures. Any other response proves
+    that SAP is reachable and counts as success.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=SAP_CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_timeout=SAP_CIRCUIT_RECOVERY_TIMEOUT, slow_call_seconds=SAP_SLOW_CALL_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.rejected_calls = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _refresh_state(self):
+        """Move from open to half-open once the recovery timeout has passed (lock held)"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+        return self.state
+
+    def is_open(self):
+        """True while calls would be rejected (open, or half-open with a probe running)"""
+        with self._lock:
+            state = self._refresh_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight)
+
+    def allow_request(self):
+        """Reserve permission for one call; False means fail fast"""
+        with self._lock:
+            state = self._refresh_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logging.info("🔌 SAP B1 circuit half-open - sending probe request")
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("✅ SAP B1 circuit closed - Service Layer is reachable again")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, reason):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = reason
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state == self.HALF_OPEN:
+                    logging.warning(f"⛔ SAP B1 circuit probe failed, staying open: {reason}")
+                elif self.state != self.OPEN:
+                    logging.warning(f"⛔ SAP B1 circuit opened after {self.consecutive_failures} "
+                                    f"failure(s): {reason}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """End a call that got no response from SAP without changing the breaker state"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_outcome(self, status_code, elapsed):
+        """Classify a completed call by its status code and duration"""
+        if status_code in (502, 503, 504):
+            self.record_failure(f"HTTP {status_code}")
+        elif elapsed > self.slow_call_seconds:
+            self.record_failure(f"slow response ({elapsed:.1f}s)")
+        else:
+            self.record_success()
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` under the breaker, failing fast while it is open"""
+        if not self.allow_request():
+            raise SAPCircuitOpenError("SAP B1 circuit breaker is open")
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.record_failure(f"{type(e).__name__}: {str(e)}")
+            raise
+        except Exception:
+            # Pool timeout, login or decode error - no SAP response to judge its health by
+            self.release_probe()
+            raise
+        status_code = getattr(result, 'status_code', None)
+        if status_code is None:
+            self.release_probe()
+        else:
+            self.record_outcome(status_code, time.monotonic() - started)
+        return result
+
+    def status(self):
+        """Breaker state for monitoring"""
+        with self._lock:
+            state = self._refresh_state()
+            return {
+                'state': state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'open_for_seconds': round(time.monotonic() - self.opened_at, 1)
+                if state != self.CLOSED and self.opened_at else 0,
+                'rejected_calls': self.rejected_calls,
+                'last_error': self.last_error
+            }
+
+
+def request_timeout(timeout=None):
+    """Timeout for requests: a default when none is set, and a short connect phase
+
+    A dead host then fails within SAP_CONNECT_TIMEOUT instead of the full read timeout.
+    """
+    if timeout is None:
+        return (SAP_CONNECT_TIMEOUT, SAP_REQUEST_TIMEOUT)
+    if isinstance(timeout, (int, float)):
+        return (min(SAP_CONNECT_TIMEOUT, timeout), timeout)
+    return timeout
+
+
+class SAPSessionPool:
+    """Fixed-size pool of logged-in SAP B1 Service Layer sessions
+
+    Each pooled requests.Session carries its own B1SESSION cookie and keeps
+    its TLS connection alive, so a request only pays for the Login round trip
+    the first time a session is created.  Sessions are checked out for the
+    duration of a single HTTP call and returned afterwards.
+    """
+
+    def __init__(self, base_url, username, password, company_db, size=SAP_SESSION_POOL_SIZE):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.company_db = company_db
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.closed = False
+        self.breaker = SAPCircuitBreaker()
+
+    def _login(self, session):
+        """Log a requests.Session in to SAP B1 and remember its SessionId"""
+        login_url = f"{self.base_url}/b1s/v1/Login"
+        login_data = {
+            "UserName": self.username,
+            "Password": self.password,
+            "CompanyDB": self.company_db
+        }
+        response = session.post(login_url, json=login_data, timeout=request_timeout(30))
+        if response.status_code != 200:
+            raise SAPLoginError(response.text)
+        session.sap_session_id = response.json().get('SessionId')
+        logging.info("Successfully logged in to SAP B1 (pooled session)")
+
+    def _new_session(self):
+        """Create a requests.Session and log it in to SAP B1"""
+        session = requests.Session()
+        session.verify = False  # For development, in production use proper SSL
+        session.sap_session_id = None
+        session.sap_relogin_lock = threading.Lock()
+        try:
+            self._login(session)
+        except Exception:
+            session.close()
+            raise
+        return session
+
+    def relogin(self, session, expired_session_id):
+        """Log an expired session in again
+
+        Single-flight: when several callers report the same expired SessionId
+        only the first one performs the Login, the others see the new id and
+        return straight away.
+        """
+        with session.sap_relogin_lock:
+            if session.sap_session_id != expired_session_id:
+                return True
+            logging.info("SAP B1 session expired - logging in again")
+            session.cookies.clear()
+            self._login(session)
+            return True
+
+    def acquire(self, timeout=SAP_SESSION_POOL_TIMEOUT):
+        """Check out a logged-in session, creating one if the pool is not full yet"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._new_session()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No SAP B1 session available after {timeout}s (pool size {self.size})")
+
+    def release(self, session):
+        """Return a session to the pool; sessions of a closed pool are logged out instead"""
+        if self.closed:
+            self.discard(session, logout_timeout=10)
+            return
+        self._idle.put(session)
+
+    def discard(self, session, logout_timeout=SAP_SESSION_DISCARD_LOGOUT_TIMEOUT):
+        """Drop a session that is no longer usable so a fresh one can be created
+
+        The session is logged out first (best effort) so it does not count against the
+        SAP B1 user's session limit until the Service Layer times it out.
+        """
+        with self._lock:
+            self._created -= 1
+        self._logout(session, logout_timeout)
+
+    def warm_up(self):
+        """Log in every session of the pool up front; returns the number of logged-in sessions"""
+        sessions = []
+        try:
+            while len(sessions) < self.size:
+                with self._lock:
+                    if self._created >= self.size:
+                        break
+                sessions.append(self.acquire(timeout=0))
+        except Exception as e:
+            logging.warning(f"SAP B1 session pool warm-up stopped: {str(e)}")
+        finally:
+            for session in sessions:
+                self.release(session)
+        logging.info(f"SAP B1 session pool warmed up with {self._created} session(s)")
+        return self._created
+
+    def _logout(self, session, timeout):
+        if session.sap_session_id:
+            try:
+                session.post(f"{self.base_url}/b1s/v1/Logout", timeout=timeout)
+            except Exception as e:
+                logging.warning(f"Error logging out pooled SAP B1 session: {str(e)}")
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Log out every idle session; sessions still checked out are logged out when released"""
+        self.closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(session, logout_timeout=10)
+
+
+_session_pools = {}
+_session_pools_lock = threading.Lock()
+
+
+def get_session_pool(base_url, username, password, company_db):
+    """Return the process-wide session pool for the given SAP B1 credentials"""
+    key = (base_url, username, company_db)
+    replaced = None
+    with _session_pools_lock:
+        pool = _session_pools.get(key)
+        if pool is None or pool.password != password:
+            replaced = pool
+            pool = SAPSessionPool(base_url, username, password, company_db)
+            _session_pools[key] = pool
+    if replaced is not None:
+        # Credentials changed - log out the old pool's sessions instead of leaking them
+        logging.info("SAP B1 credentials changed - closing the previous session pool")
+        replaced.close()
+    return pool
+
+
+def odata_literal(value):
+    """Format a Python value as an OData literal (strings quoted, quotes doubled)"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def odata_in_filter(field, values):
+    """Build an OData v3 membership filter - Service Layer v1 has no "in" operator"""
+    return '(' + ' or '.join(f"{field} eq {odata_literal(value)}" for value in values) + ')'
+
+
+def next_page_url(base_url, data):
+    """URL of the page after an OData response page, or None on the last page"""
+    next_link = data.get('odata.nextLink') or data.get('@odata.nextLink')
+    if not next_link:
+        return None
+    # Next links already carry the query string and are relative to /b1s/v1/
+    if next_link.startswith('http'):
+        return next_link
+    if next_link.startswith('/'):
+        return f"{base_url}{next_link}"
+    return f"{base_url}/b1s/v1/{next_link}"
+
+
+def chunked(values, size=SAP_FILTER_CHUNK_SIZE):
+    """Split a list into consecutive chunks of at most ``size`` elements"""
+    values = list(values)
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+# (base_url, company_db, query code) of stored SQL queries known to exist
+_registered_sql_queries = set()
+
+
+def group_bin_stock_rows(rows):
+    """Group Bin_Stock query rows (one per item batch) into per-item stock
+
+    Returns:
+        List of (item_info, warehouse_info, batch_details) tuples shaped like
+        the crossjoin Items / ItemWarehouseInfoCollection / BatchNumberDetails
+        rows, with InStock holding the quantity in the bin.
+    """
+    grouped = {}
+    for row in rows:
+        item_code = row.get('ItemCode')
+        if not item_code:
+            continue
+        if item_code not in grouped:
+            grouped[item_code] = (
+                {
+                    'ItemCode': item_code,
+                    'ItemName': row.get('ItemName', ''),
+                    'InventoryUoM': row.get('InvntryUom', ''),
+                    'QuantityOnStock': row.get('ItemOnHand', 0) or 0,
+                },
+                {
+                    'InStock': row.get('OnHandQty', 0) or 0,
+                    'Ordered': row.get('OnOrder', 0) or 0,
+                    'StandardAveragePrice': row.get('AvgPrice', 0) or 0,
+                },
+                [],
+            )
+        if row.get('DistNumber'):
+            grouped[item_code][2].append({
+                'ItemCode': item_code,
+                'Batch': row.get('DistNumber'),
+                'Quantity': float(row.get('BatchQty', 0) or 0),
+                'ExpirationDate': row.get('ExpDate'),
+                'AdmissionDate': row.get('InDate'),
+                'ManufacturingDate': row.get('MnfDate'),
+                'Status': BATCH_STATUS_NAMES.get(str(row.get('Status')), 'bdsStatus_Released'),
+            })
+    return list(grouped.values())
+
+
+def is_session_expired_response(response):
+    """Check whether a Service Layer response means the B1SESSION is no longer valid"""
+    if response.status_code == 401:
+        return True
+    if response.status_code in (400, 403):
+        text = (response.text or '').lower()
+        return 'invalid session' in text or 'session timeout' in text or 'session already timeout' in text
+    return False
+
+
+class _InFlightRequest:
+    """A GET being sent by one thread that other threads wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+# Coalescing key -> _InFlightRequest of identical GETs currently on the wire
+_inflight_requests = {}
+_inflight_requests_lock = threading.Lock()
+
+
+# Projection profiles SAP rejected (unknown field in this SAP version); read unprojected
+_rejected_projections = set()
+
+# SAP method name -> {'requests': n, 'bytes': n}, collected while DEBUG logging is enabled
+_payload_bytes = {}
+_payload_bytes_lock = threading.Lock()
+
+
+def _calling_sap_method(client_types):
+    """Name of the outermost SAP client method on the current call stack"""
+    name = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        if isinstance(frame.f_locals.get('self'), client_types):
+            name = frame.f_code.co_name
+        frame = frame.f_back
+    return name or 'unknown'
+
+
+def record_payload_bytes(size, client_types=None):
+    """Add the size of one SAP response body to the counter of the calling method"""
+    method_name = _calling_sap_method(client_types or (SAPIntegration,))
+    with _payload_bytes_lock:
+        stats = _payload_bytes.setdefault(method_name, {'requests': 0, 'bytes': 0})
+        stats['requests'] += 1
+        stats['bytes'] += size
+    logging.debug(f"📦 {method_name}: {size} bytes from SAP")
+
+
+def payload_stats():
+    """Bytes received from SAP per client method, largest first"""
+    with _payload_bytes_lock:
+        return dict(sorted(((name, dict(stats)) for name, stats in _payload_bytes.items()),
+                           key=lambda entry: entry[1]['bytes'], reverse=True))
+
+
+def normalize_request_url(url, params=None):
+    """Full request URL with query parameters merged and sorted, used as coalescing key"""
+    split = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(split.query, keep_blank_values=True)
+    if params:
+        query.extend((str(key), str(value)) for key, value in
+                     (params.items() if isinstance(params, dict) else params))
+    return urllib.parse.urlunsplit((split.scheme, split.netloc.lower(), split.path,
+                                    urllib.parse.urlencode(sorted(query)), ''))
+
+
+class PooledSAPSession:
+    """requests.Session look-alike that runs every call on a pooled session
+
+    Keeps ``sap.session.get(...)`` working at all existing call sites while
+    the underlying connection and B1SESSION cookie come from the shared pool.
+    Expired sessions are logged in again transparently and a failed GET is
+    replayed once on the refreshed session.
+
+    Identical GETs issued concurrently by several threads are coalesced: the
+    first caller sends the request and the others receive the same response.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def request(self, method, url, **kwargs):
+        if method.upper() != 'GET' or kwargs.get('stream'):
+            return self._send(method, url, **kwargs)
+
+        # The Prefer header changes the page size, so it is part of the key
+        prefer = (kwargs.get('headers') or {}).get('Prefer', '')
+        key = (id(self.pool), normalize_request_url(url, kwargs.get('params')), prefer)
+        with _inflight_requests_lock:
+            call = _inflight_requests.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightRequest()
+                _inflight_requests[key] = call
+
+        if not is_leader:
+            logging.debug(f"🔗 Sharing in-flight SAP request: {key[1]}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = self._send(method, url, **kwargs)
+            return call.response
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with _inflight_requests_lock:
+                del _inflight_requests[key]
+            call.done.set()
+
+    def _send(self, method, url, **kwargs):
+        kwargs['timeout'] = request_timeout(kwargs.get('timeout'))
+        response = self.pool.breaker.call(self._send_on_pooled_session, method, url, **kwargs)
+        if not kwargs.get('stream') and logging.getLogger().isEnabledFor(logging.DEBUG):
+            record_payload_bytes(len(response.content))
+        return use_fast_json(response)
+
+    def _send_on_pooled_session(self, method, url, **kwargs):
+        session = self.pool.acquire()
+        try:
+            session_id = session.sap_session_id
+            response = session.request(method, url, **kwargs)
+            if is_session_expired_response(response):
+                self.pool.relogin(session, session_id)
+                # Only GETs are replayed; writes are left to the caller
+                if method.upper() == 'GET':
+                    response = session.request(method, url, **kwargs)
+        except Exception:
+            self.pool.discard(session)
+            raise
+        self.pool.release(session)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
 
 class SAPIntegration:
 
@@ -18,17 +813,25 @@ class SAPIntegration:
         self.password = os.environ.get('SAP_B1_PASSWORD', '')
         self.company_db = os.environ.get('SAP_B1_COMPANY_DB', '')
         self.session_id = None
-        self.session = requests.Session()
-        self.session.verify = False  # For development, in production use proper SSL
+        self.session_pool = get_session_pool(self.base_url, self.username,
+                                             self.password, self.company_db)
+        self.session = PooledSAPSession(self.session_pool)
         self.is_offline = False
 
-        # Cache for frequently accessed data
-        self._warehouse_cache = {}
-        self._bin_cache = {}
-        self._bin_location_cache = {}  # Cache for BinLocations API
-        self._branch_cache = {}
-        self._item_cache = {}
-        self._batch_cache = {}
+        # Process-wide caches for frequently accessed data (see sap_cache)
+        self._warehouse_cache = get_cache('warehouse')
+        self._bin_cache = get_cache('bin')
+        self._bin_location_cache = get_cache('bin_location')  # Cache for BinLocations API
+        self._branch_cache = get_cache('branch')
+        self._batch_cache = get_cache('batch')
+        self._transfer_request_cache = get_cache('transfer_request')
+        self._doc_entry_cache = get_cache('doc_entry')
+        self._endpoint_cache = get_cache('endpoint')
+        self._purchase_order_cache = get_cache('purchase_order')
+        # Stored SQL queries SAP rejected recently; the caller falls back without retrying
+        self._sql_query_unavailable_cache = get_cache('sql_query_unavailable')
+        self._item_catalog = None
+        self._mirror = None
 
     def login(self):
         """Login to SAP B1 Service Layer"""
@@ -38,26 +841,19 @@ class SAPIntegration:
                 "SAP B1 configuration not complete. Running in offline mode.")
             return False
 
-        login_url = f"{self.base_url}/b1s/v1/Login"
-        login_data = {
-            "UserName": self.username,
-            "Password": self.password,
-            "CompanyDB": self.company_db
-        }
-
         try:
-            response = self.session.post(login_url,
-                                         json=login_data,
-                                         timeout=30)
-            if response.status_code == 200:
-                self.session_id = response.json().get('SessionId')
-                logging.info("Successfully logged in to SAP B1")
-                return True
-            else:
-                logging.warning(
-                    f"SAP B1 login failed: {response.text}. Running in offline mode."
-                )
-                return False
+            # Borrow a pooled session - only logs in when the pool has no idle session
+            session = self.session_pool.breaker.call(self.session_pool.acquire)
+            self.session_id = session.sap_session_id
+            self.session_pool.release(session)
+            return True
+        except SAPCircuitOpenError:
+            logging.warning("SAP B1 circuit breaker is open. Running in offline mode.")
+            return False
+        except SAPLoginError as e:
+            logging.warning(
+                f"SAP B1 login failed: {str(e)}. Running in offline mode.")
+            return False
         except Exception as e:
             logging.warning(
                 f"SAP B1 login error: {str(e)}. Running in offline mode.")
@@ -65,11 +861,226 @@ class SAPIntegration:
             return False
 
     def ensure_logged_in(self):
-        """Ensure we have a valid session"""
+        """Ensure we have a valid session
+
+        Returns False straight away while the circuit breaker is open, so
+        callers drop to their offline paths without waiting for timeouts.
+        """
+        if self.session_pool.breaker.is_open():
+            logging.debug("SAP B1 circuit breaker is open - using offline mode")
+            return False
         if not self.session_id:
             return self.login()
         return True
 
+    def projection(self, profile):
+        """$select/$expand query parameters of a named projection profile (see SAP_PROJECTIONS)"""
+        if profile is None or profile in _rejected_projections:
+            return {}
+        return dict(SAP_PROJECTIONS[profile])
+
+    def get_projected(self, url, profile, params=None, **kwargs):
+        """GET with a projection profile applied, reading full entities if SAP rejects the profile"""
+        projected_params = dict(params or {})
+        projected_params.update(self.projection(profile))
+        response = self.session.get(url, params=projected_params, **kwargs)
+        if response.status_code == 400 and profile not in _rejected_projections:
+            retry = self.session.get(url, params=params, **kwargs)
+            if retry.status_code == 200:
+                logging.warning(f"⚠️ Projection '{profile}' rejected by SAP, reading full entities: {response.text}")
+                _rejected_projections.add(profile)
+            return retry
+        return response
+
+    def iter_odata(self, entity, filter=None, select=None, page_size=None, expand=None, orderby=None,
+                   profile=None):
+        """Iterate over every row of an OData collection, following next links lazily
+
+        Args:
+            entity: Collection path below /b1s/v1/, e.g. 'BinLocations' or a $crossjoin(...)
+            filter: Optional $filter expression
+            select: Optional $select field list (string or list)
+            page_size: Rows per page sent as Prefer: odata.maxpagesize
+            expand: Optional $expand expression
+            orderby: Optional $orderby expression
+            profile: Optional projection profile name, applied when select/expand are not given
+
+        Yields:
+            One row dict at a time; only a single page is held in memory.
+
+        Raises:
+            SAPRequestError if any page request fails.
+        """
+        params = {}
+        if filter:
+            params['$filter'] = filter
+        if select:
+            params['$select'] = select if isinstance(select, str) else ','.join(select)
+        if expand:
+            params['$expand'] = expand
+        if orderby:
+            params['$orderby'] = orderby
+        if profile and not select and not expand:
+            params.update(self.projection(profile))
+        else:
+            profile = None
+
+        headers = {'Prefer': f"odata.maxpagesize={page_size or SAP_ODATA_PAGE_SIZE}"}
+        url = f"{self.base_url}/b1s/v1/{entity}"
+
+        while url:
+            if profile:
+                # Only the first page carries the projection; next links repeat it
+                unprojected = {key: value for key, value in params.items()
+                               if key not in SAP_PROJECTIONS[profile]}
+                response = self.get_projected(url, profile, unprojected, headers=headers, timeout=60)
+                profile = None
+            else:
+                response = self.session.get(url, params=params, headers=headers, timeout=60)
+            if response.status_code != 200:
+                raise SAPRequestError(response.status_code, response.text)
+
+            data = response.json()
+            for row in data.get('value', []):
+                yield row
+
+            url = next_page_url(self.base_url, data)
+            params = None
+
+    def ensure_sql_query(self, query_code, query_name, sql_text):
+        """Register a stored SQL query in SQLQueries unless it already exists
+
+        Returns:
+            True when the query exists or was created. False when it is not
+            available; after a 4xx that answer is kept for the
+            'sql_query_unavailable' cache TTL without asking SAP again.
+        """
+        if self.is_sql_query_unavailable(query_code):
+            return False
+        key = (self.base_url, self.company_db, query_code)
+        if key in _registered_sql_queries:
+            return True
+
+        response = self.session.get(f"{self.base_url}/b1s/v1/SQLQueries('{query_code}')", timeout=30)
+        if response.status_code == 404:
+            logging.info(f"📝 Registering SQL query {query_code}")
+            response = self.session.post(f"{self.base_url}/b1s/v1/SQLQueries", json={
+                'SqlCode': query_code,
+                'SqlName': query_name,
+                'SqlText': sql_text
+            }, timeout=30)
+        if response.status_code not in (200, 201):
+            logging.warning(f"⚠️ SQL query {query_code} not available: {response.status_code} - {response.text}")
+            if 400 <= response.status_code < 500:
+                self.mark_sql_query_unavailable(query_code)
+            return False
+
+        _registered_sql_queries.add(key)
+        return True
+
+    def is_sql_query_unavailable(self, query_code):
+        """Whether SAP rejected a stored SQL query within the 'sql_query_unavailable' TTL"""
+        return bool(self._sql_query_unavailable_cache.get(f"{self.base_url}|{self.company_db}|{query_code}"))
+
+    def mark_sql_query_unavailable(self, query_code):
+        """Skip a stored SQL query that SAP rejected (missing, not creatable or failing with 4xx) for a while"""
+        self._sql_query_unavailable_cache.set(f"{self.base_url}|{self.company_db}|{query_code}", True)
+
+    def iter_sql_query(self, query_code, param_list=None, page_size=None):
+        """Iterate over every row returned by a stored SQLQueries('...')/List call
+
+        Follow-up pages are requested by POSTing the same ParamList to the
+        next link.
+
+        Raises:
+            SAPRequestError if any page request fails.
+        """
+        payload = {'ParamList': param_list} if param_list else {}
+        headers = {'Prefer': f"odata.maxpagesize={page_size or SAP_ODATA_PAGE_SIZE}"}
+        url = f"{self.base_url}/b1s/v1/SQLQueries('{query_code}')/List"
+
+        while url:
+            response = self.session.post(url, json=payload, headers=headers, timeout=60)
+            if response.status_code != 200:
+                raise SAPRequestError(response.status_code, response.text)
+
+            data = response.json()
+            for row in data.get('value', []):
+                yield row
+
+            url = next_page_url(self.base_url, data)
+
+    def batch_get(self, paths, headers=None):
+        """Run several independent GETs through OData $batch
+
+        Args:
+            paths: Resource paths below /b1s/v1/, e.g. "Items('A001')"
+            headers: Optional headers sent with every GET (e.g. Prefer)
+
+        Returns:
+            List of SAPBatchResponse in the same order as ``paths``; requests
+            are packed SAP_BATCH_MAX_REQUESTS at a time into one HTTP call.
+        """
+        part_headers = ''.join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        responses = []
+        for start in range(0, len(paths), SAP_BATCH_MAX_REQUESTS):
+            chunk = paths[start:start + SAP_BATCH_MAX_REQUESTS]
+            boundary = f"batch_{uuid.uuid4()}"
+            body_parts = []
+            for path in chunk:
+                body_parts.append(
+                    f"--{boundary}\r\n"
+                    "Content-Type: application/http\r\n"
+                    "Content-Transfer-Encoding: binary\r\n\r\n"
+                    f"GET /b1s/v1/{urllib.parse.quote(path, safe=BATCH_PATH_SAFE)} HTTP/1.1\r\n"
+                    f"Accept: application/json\r\n{part_headers}\r\n")
+            body = ''.join(body_parts) + f"--{boundary}--\r\n"
+            batch_headers = {'Content-Type': f"multipart/mixed;boundary={boundary}"}
+            url = f"{self.base_url}/b1s/v1/$batch"
+
+            response = self.session.post(url, data=body.encode('utf-8'), headers=batch_headers, timeout=60)
+            if is_session_expired_response(response):
+                # The pool has logged in again; a batch of reads is safe to resend
+                response = self.session.post(url, data=body.encode('utf-8'), headers=batch_headers, timeout=60)
+            if response.status_code not in (200, 202):
+                raise SAPRequestError(response.status_code, response.text)
+
+            parts = parse_batch_response(response.headers.get('Content-Type', ''), response.text)
+            if len(parts) != len(chunk):
+                raise SAPRequestError(
+                    response.status_code,
+                    f"$batch returned {len(parts)} responses for {len(chunk)} requests")
+            responses.extend(parts)
+        return responses
+
+    def batch_get_collections(self, paths, page_size=None):
+        """Read several OData collection queries, the first pages of all in one $batch
+
+        Args:
+            paths: Collection queries below /b1s/v1/, e.g. "BatchNumberDetails?$filter=..."
+            page_size: Rows per page sent as Prefer: odata.maxpagesize
+
+        Returns:
+            List of row lists in the same order as ``paths``; further pages
+            are read with plain GETs.
+
+        Raises:
+            SAPRequestError if any query fails.
+        """
+        headers = {'Prefer': f"odata.maxpagesize={page_size or SAP_ODATA_PAGE_SIZE}"}
+        results = []
+        for response in self.batch_get(paths, headers=headers):
+            rows = []
+            while response is not None:
+                if response.status_code != 200:
+                    raise SAPRequestError(response.status_code, response.text)
+                data = response.json()
+                rows.extend(data.get('value', []))
+                next_url = next_page_url(self.base_url, data)
+                response = self.session.get(next_url, headers=headers, timeout=60) if next_url else None
+            results.append(rows)
+        return results
+
     def get_inventory_transfer_request(self, doc_num):
         """Get specific inventory transfer request from SAP B1"""
         if not self.ensure_logged_in():
@@ -82,62 +1093,51 @@ class SAPIntegration:
             }
 
         try:
-            # Try multiple endpoints to find the transfer request
-            endpoints_to_try = [
-                f"InventoryTransferRequests?$filter=DocNum eq {doc_num}",
-                f"InventoryTransferRequests?$filter=DocNum eq '{doc_num}'",
-                f"StockTransfers?$filter=DocNum eq {doc_num}",
-                f"StockTransfers?$filter=DocNum eq '{doc_num}'"
-            ]
-
-            for endpoint in endpoints_to_try:
-                url = f"{self.base_url}/b1s/v1/{endpoint}"
-                logging.info(f"🔍 Trying SAP B1 API: {url}")
-
-                response = self.session.get(url)
-                logging.info(f"📡 Response status: {response.status_code}")
-
+            # Repeated lookups of the same request within a few seconds
+            cached_transfer = self._transfer_request_cache.get(doc_num)
+            if cached_transfer is not None:
+                return cached_transfer
+
+            # Known DocNum -> DocEntry: read the document by key
+            doc_entry_key = f"{TRANSFER_REQUEST_KEY_PREFIX}:{doc_num}"
+            known_entry = self._doc_entry_cache.get(doc_entry_key)
+            if known_entry is not None:
+                entity, doc_entry = known_entry
+                response = self.session.get(f"{self.base_url}/b1s/v1/{entity}({doc_entry})")
                 if response.status_code == 200:
-                    data = response.json()
-                    transfers = data.get('value', [])
-                    logging.info(
-                        f"📦 Found {len(transfers)} transfer requests for DocNum {doc_num}"
-                    )
+                    return self._remember_transfer_request(doc_num, entity, response.json())
+                self._doc_entry_cache.invalidate(doc_entry_key)
+
+            # Try the endpoint that resolved last time on this installation first,
+            # then probe all the others in one $batch round trip
+            endpoint_key = f"{self.base_url}|{self.company_db}|{TRANSFER_REQUEST_KEY_PREFIX}"
+            learned_endpoint = self._endpoint_cache.get(endpoint_key)
+            paths = [f"{entity}?$filter=DocNum eq {doc_num_format.format(doc_num)}"
+                     for entity, doc_num_format in TRANSFER_REQUEST_ENDPOINTS]
+            rounds = [[index] for index in range(len(paths)) if index == learned_endpoint]
+            rounds.append([index for index in range(len(paths)) if index != learned_endpoint])
+
+            for indexes in rounds:
+                if len(indexes) == 1:
+                    logging.debug(f"🔍 Trying SAP B1 API: {paths[indexes[0]]}")
+                    responses = [self.session.get(f"{self.base_url}/b1s/v1/{paths[indexes[0]]}")]
+                else:
+                    logging.debug(f"🔍 Trying SAP B1 APIs in one $batch: {[paths[index] for index in indexes]}")
+                    responses = self.batch_get([paths[index] for index in indexes])
 
-                    if transfers:
-                        transfer_data = transfers[0]
-                        doc_status = transfer_data.get(
-                            'DocumentStatus',
-                            transfer_data.get('DocStatus', ''))
-                        logging.info(
-                            f"✅ Transfer request found: {transfer_data.get('DocNum')} - Status: {doc_status}"
-                        )
-
-                        # Normalize the response structure for consistent access
-                        if 'StockTransferLines' not in transfer_data and 'DocumentLines' in transfer_data:
-                            transfer_data[
-                                'StockTransferLines'] = transfer_data[
-                                    'DocumentLines']
-
-                        # Ensure consistent status field
-                        if 'DocumentStatus' in transfer_data and 'DocStatus' not in transfer_data:
-                            transfer_data['DocStatus'] = transfer_data[
-                                'DocumentStatus']
-
-                        # Log the full structure for debugging
-                        logging.info(
-                            f"📋 Transfer Data: DocNum={transfer_data.get('DocNum')}, FromWarehouse={transfer_data.get('FromWarehouse')}, ToWarehouse={transfer_data.get('ToWarehouse')}"
-                        )
-
-                        return transfer_data
-                    else:
-                        logging.info(f"No results from endpoint: {endpoint}")
+                for index, response in zip(indexes, responses):
+                    entity = TRANSFER_REQUEST_ENDPOINTS[index][0]
+                    if response.status_code != 200:
+                        logging.warning(f"API call failed for {paths[index]}: {response.status_code}")
                         continue
-                else:
-                    logging.warning(
-                        f"API call failed for {endpoint}: {response.status_code}"
-                    )
-                    continue
+                    transfers = response.json().get('value', [])
+                    logging.info(f"📦 Found {len(transfers)} transfer requests for DocNum {doc_num}")
+                    if not transfers:
+                        logging.info(f"No results from endpoint: {paths[index]}")
+                        continue
+                    if index != learned_endpoint:
+                        self._endpoint_cache.set(endpoint_key, index)
+                    return self._remember_transfer_request(doc_num, entity, transfers[0])
 
             # If no endpoint worked, return None
             logging.warning(
@@ -150,34 +1150,56 @@ class SAPIntegration:
                 f"❌ Error getting inventory transfer request: {str(e)}")
             return None
 
+    def _remember_transfer_request(self, doc_num, entity, transfer_data):
+        """Normalize a transfer request document and cache it with its DocEntry"""
+        doc_status = transfer_data.get(
+            'DocumentStatus',
+            transfer_data.get('DocStatus', ''))
+        logging.info(
+            f"✅ Transfer request found: {transfer_data.get('DocNum')} - Status: {doc_status}"
+        )
+
+        # Normalize the response structure for consistent access
+        if 'StockTransferLines' not in transfer_data and 'DocumentLines' in transfer_data:
+            transfer_data[
+                'StockTransferLines'] = transfer_data[
+                    'DocumentLines']
+
+        # Ensure consistent status field
+        if 'DocumentStatus' in transfer_data and 'DocStatus' not in transfer_data:
+            transfer_data['DocStatus'] = transfer_data[
+                'DocumentStatus']
+
+        # Log the full structure for debugging
+        logging.info(
+            f"📋 Transfer Data: DocNum={transfer_data.get('DocNum')}, FromWarehouse={transfer_data.get('FromWarehouse')}, ToWarehouse={transfer_data.get('ToWarehouse')}"
+        )
+
+        if transfer_data.get('DocEntry'):
+            self._doc_entry_cache.set(f"{TRANSFER_REQUEST_KEY_PREFIX}:{doc_num}",
+                                      [entity, transfer_data['DocEntry']])
+        self._transfer_request_cache.set(doc_num, transfer_data)
+        return transfer_data
+
     def get_bins(self, warehouse_code):
         """Get bins for a specific warehouse"""
+        mirrored_bins = self.mirror.list_by_parent('bins', warehouse_code)
+        if mirrored_bins is not None:
+            return [self._format_bin(bin_data) for bin_data in mirrored_bins]
+
         if not self.ensure_logged_in():
             return []
 
         try:
             url = f"{self.base_url}/b1s/v1/BinLocations?$filter=Warehouse eq '{warehouse_code}'"
-            response = self.session.get(url)
+            response = self.get_projected(url, 'bin_dropdown')
 
             if response.status_code == 200:
                 data = response.json()
                 bins = data.get('value', [])
 
                 # Transform the data to match our expected format
-                formatted_bins = []
-                for bin_data in bins:
-                    formatted_bins.append({
-                        'BinCode':
-                        bin_data.get('BinCode'),
-                        'Description':
-                        bin_data.get('Description', ''),
-                        'Warehouse':
-                        bin_data.get('Warehouse'),
-                        'Active':
-                        bin_data.get('Active', 'Y')
-                    })
-
-                return formatted_bins
+                return [self._format_bin(bin_data) for bin_data in bins]
             else:
                 logging.error(f"Failed to get bins: {response.status_code}")
                 return []
@@ -185,6 +1207,14 @@ class SAPIntegration:
             logging.error(f"Error getting bins: {str(e)}")
             return []
 
+    def _format_bin(self, bin_data):
+        return {
+            'BinCode': bin_data.get('BinCode'),
+            'Description': bin_data.get('Description', ''),
+            'Warehouse': bin_data.get('Warehouse'),
+            'Active': bin_data.get('Active', 'Y')
+        }
+
     def get_purchase_order(self, po_number):
         """Get purchase order details from SAP B1"""
         if not self.ensure_logged_in():
@@ -196,10 +1226,12 @@ class SAPIntegration:
         url = f"{self.base_url}/b1s/v1/PurchaseOrders?$filter=DocNum eq {po_number}"
 
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.get_projected(url, 'purchase_order', timeout=30)
             if response.status_code == 200:
                 data = response.json()
                 if data['value']:
+                    # Keep a snapshot for read-only views (see get_purchase_order_snapshot)
+                    self._purchase_order_cache.set(po_number, data['value'][0])
                     return data['value'][0]
             return None
         except Exception as e:
@@ -211,6 +1243,30 @@ class SAPIntegration:
 
             }
 
+    def get_purchase_order_snapshot(self, po_number):
+        """Recently read PO, if SAP reports its header unchanged since - for read-only views
+
+        Revalidation reads only UpdateDate/UpdateTime of the PO header, which
+        SAP does not always bump when another receipt reduces the lines'
+        RemainingOpenQuantity. Posting paths therefore call get_purchase_order.
+        Any change (or a missing snapshot) falls back to a full get_purchase_order.
+        """
+        snapshot = self._purchase_order_cache.get(po_number)
+        if snapshot and snapshot.get('DocEntry') and snapshot.get('UpdateDate'):
+            try:
+                url = f"{self.base_url}/b1s/v1/PurchaseOrders({snapshot['DocEntry']})"
+                response = self.get_projected(url, 'purchase_order_check', timeout=30)
+                if response.status_code == 200:
+                    header = response.json()
+                    if (header.get('UpdateDate') == snapshot.get('UpdateDate')
+                            and header.get('UpdateTime') == snapshot.get('UpdateTime')):
+                        logging.info(f"♻️ Reusing unchanged snapshot of PO {po_number}")
+                        return snapshot
+            except Exception as e:
+                logging.warning(f"⚠️ Could not revalidate PO {po_number} snapshot: {str(e)}")
+
+        return self.get_purchase_order(po_number)
+
     def get_purchase_order_items(self, po_number):
         """Get purchase order line items"""
         try:
@@ -223,21 +1279,25 @@ class SAPIntegration:
             )
         return []
 
-    def get_item_master(self, item_code):
-        """Get item master data from SAP B1"""
-        if not self.ensure_logged_in():
-            return None
+    @property
+    def item_catalog(self):
+        """Cached, bulk-capable item master lookups (see item_catalog.ItemCatalog)"""
+        if self._item_catalog is None:
+            from item_catalog import ItemCatalog
+            self._item_catalog = ItemCatalog(self)
+        return self._item_catalog
+
+    @property
+    def mirror(self):
+        """Local copy of SAP master data (see sap_mirror.SAPMirror)"""
+        if self._mirror is None:
+            from sap_mirror import SAPMirror
+            self._mirror = SAPMirror(self)
+        return self._mirror
 
-        url = f"{self.base_url}/b1s/v1/Items('{item_code}')"
-
-        try:
-            response = self.session.get(url)
-            if response.status_code == 200:
-                return response.json()
-            return None
-        except Exception as e:
-            logging.error(f"Error fetching item {item_code}: {str(e)}")
-            return None
+    def get_item_master(self, item_code):
+        """Get item master data from SAP B1 (or its local mirror)"""
+        return self.item_catalog.get(item_code)
 
     def get_warehouse_bins(self, warehouse_code):
         """Get bins for a warehouse"""
@@ -303,111 +1363,105 @@ class SAPIntegration:
                     business_place_id = warehouse_data[0].get('BusinessPlaceID', 0)
                     logging.info(f"✅ Warehouse {warehouse_code} BusinessPlaceID: {business_place_id}")
 
-            # Step 3: Get warehouse items using your exact crossjoin API pattern
-            crossjoin_url = (f"{self.base_url}/b1s/v1/$crossjoin(Items,Items/ItemWarehouseInfoCollection)?"
-                           f"$expand=Items($select=ItemCode,ItemName,QuantityOnStock),"
-                           f"Items/ItemWarehouseInfoCollection($select=InStock,Ordered,StandardAveragePrice)&"
-                           f"$filter=Items/ItemCode eq Items/ItemWarehouseInfoCollection/ItemCode and "
-                           f"Items/ItemWarehouseInfoCollection/WarehouseCode eq '{warehouse_code}'")
-
-            logging.debug(f"[DEBUG] Calling URL: {crossjoin_url}")
-            headers = {"Prefer": "odata.maxpagesize=300"}
-            crossjoin_response = self.session.get(crossjoin_url,headers=headers)
-            logging.debug(f"[DEBUG] Status code: {crossjoin_response.status_code}")
-            logging.debug(f"[DEBUG] Response text: {crossjoin_response.text[:300]}")
-
-            if crossjoin_response.status_code != 200:
-                logging.error(f"❌ Failed to get warehouse items: {crossjoin_response.status_code}")
-                return []
+            # Step 3: Get only the stock held in this bin
+            formatted_items = self._get_bin_stock_items(
+                bin_code, abs_entry, warehouse_code, business_place_id)
+            if formatted_items is None:
+                # Stored query unavailable - fall back to the warehouse-wide crossjoin
+                formatted_items = self._get_warehouse_stock_items(
+                    bin_code, abs_entry, warehouse_code, business_place_id)
 
-            # Step 4: Process crossjoin results and enhance with batch details
-            formatted_items = []
-            crossjoin_data = crossjoin_response.json().get('value', [])
-            
-            logging.info(f"📦 Found {len(crossjoin_data)} items in warehouse {warehouse_code}")
+            logging.info(f"🎯 Successfully enhanced {len(formatted_items)} items for bin {bin_code}")
+            return formatted_items
 
-            for item_data in crossjoin_data:
-                try:
-                    item_info = item_data.get('Items', {})
-                    warehouse_info = item_data.get('Items/ItemWarehouseInfoCollection', {})
-                    
-                    item_code = item_info.get('ItemCode', '')
-                    if not item_code:
-                        continue
+        except Exception as e:
+            logging.error(f"❌ Error in enhanced bin scanning: {str(e)}")
+            return []
 
-                    # Step 5: Get batch details for this item using your exact API pattern
-                    batch_details = self._get_item_batch_details(item_code)
-                    
-                    # Skip items with zero InStock quantity
-                    in_stock_qty = float(warehouse_info.get('InStock', 0))
-                    if in_stock_qty <= 0:
-                        logging.debug(f"⏭️ Skipping item {item_code} - InStock quantity is {in_stock_qty}")
-                        continue
-                    
-                    # Create enhanced item record with all details
-                    enhanced_item = {
-                        'ItemCode': item_code,
-                        'ItemName': item_info.get('ItemName', ''),
-                        'UoM': item_info.get('InventoryUoM', ''),
-                        'QuantityOnStock': float(item_info.get('QuantityOnStock', 0)),
-                        'OnHand': in_stock_qty,
-                        'OnStock': in_stock_qty,
-                        'InStock': in_stock_qty,
-                        'Ordered': float(warehouse_info.get('Ordered', 0)),
-                        'StandardAveragePrice': float(warehouse_info.get('StandardAveragePrice', 0)),
-                        'WarehouseCode': warehouse_code,
-                        'Warehouse': warehouse_code,
-                        'BinCode': bin_code,
-                        'BinAbsEntry': abs_entry,
-                        'BusinessPlaceID': business_place_id,
-                        'BatchDetails': batch_details
-                    }
+    def _get_bin_stock_items(self, bin_code, abs_entry, warehouse_code, business_place_id):
+        """Get the items and batches stocked in one bin via the Bin_Stock SQL query
 
-                    # Add batch summary for display
-                    if batch_details:
-                        enhanced_item['BatchCount'] = len(batch_details)
-                        enhanced_item['BatchNumbers'] = [b.get('Batch', '') for b in batch_details]
-                        enhanced_item['ExpiryDates'] = [b.get('ExpirationDate') for b in batch_details if b.get('ExpirationDate')]
-                        enhanced_item['AdmissionDates'] = [b.get('AdmissionDate') for b in batch_details if b.get('AdmissionDate')]
-                        # Use first batch info for main display
-                        if batch_details:
-                            first_batch = batch_details[0]
-                            enhanced_item['BatchNumber'] = first_batch.get('Batch', '')
-                            enhanced_item['Batch'] = first_batch.get('Batch', '')
-                            enhanced_item['Status'] = first_batch.get('Status', 'bdsStatus_Released')
-                            enhanced_item['AdmissionDate'] = first_batch.get('AdmissionDate', '')
-                            enhanced_item['ExpirationDate'] = first_batch.get('ExpirationDate', '')
-                            enhanced_item['ExpiryDate'] = first_batch.get('ExpirationDate', '')
-                    else:
-                        enhanced_item['BatchCount'] = 0
-                        enhanced_item['BatchNumbers'] = []
-                        enhanced_item['ExpiryDates'] = []
-                        enhanced_item['AdmissionDates'] = []
-                        enhanced_item['BatchNumber'] = ''
-                        enhanced_item['Batch'] = ''
-                        enhanced_item['Status'] = 'No Batch'
-                        enhanced_item['AdmissionDate'] = ''
-                        enhanced_item['ExpirationDate'] = ''
-                        enhanced_item['ExpiryDate'] = ''
-
-                    # Add legacy fields for compatibility
-                    enhanced_item['Quantity'] = enhanced_item['OnHand']
-                    enhanced_item['ItemDescription'] = enhanced_item['ItemName']
-
-                    formatted_items.append(enhanced_item)
-                    
-                    logging.debug(f"✅ Enhanced item: {item_code} - OnHand: {enhanced_item['OnHand']}, Batches: {enhanced_item['BatchCount']}")
+        Returns:
+            List of enhanced bin items, or None when the query cannot be used.
+        """
+        try:
+            if not self.ensure_sql_query(BIN_STOCK_QUERY_CODE, BIN_STOCK_QUERY_NAME, BIN_STOCK_QUERY_SQL):
+                return None
+            rows = self.iter_sql_query(BIN_STOCK_QUERY_CODE, f"binAbs={int(abs_entry)}")
+            stock = group_bin_stock_rows(rows)
+        except Exception as e:
+            logging.warning(f"⚠️ Bin stock query failed for bin {bin_code}: {str(e)}")
+            if isinstance(e, SAPRequestError) and 400 <= e.status_code < 500:
+                self.mark_sql_query_unavailable(BIN_STOCK_QUERY_CODE)
+            return None
+
+        logging.info(f"📦 Found {len(stock)} items in bin {bin_code}")
+        formatted_items = []
+        for item_info, warehouse_info, batch_details in stock:
+            enhanced_item = self._build_bin_item(
+                item_info, warehouse_info, batch_details, bin_code,
+                abs_entry, warehouse_code, business_place_id)
+            if enhanced_item is not None:
+                formatted_items.append(enhanced_item)
+        return formatted_items
+
+    def _get_warehouse_stock_items(self, bin_code, abs_entry, warehouse_code, business_place_id):
+        """Get every stocked item of the bin's warehouse via the Items crossjoin"""
+        # Get warehouse items using your exact crossjoin API pattern (all pages)
+        crossjoin_rows = self.iter_odata(
+            "$crossjoin(Items,Items/ItemWarehouseInfoCollection)",
+            expand=("Items($select=ItemCode,ItemName,QuantityOnStock),"
+                    "Items/ItemWarehouseInfoCollection($select=InStock,Ordered,StandardAveragePrice)"),
+            filter=("Items/ItemCode eq Items/ItemWarehouseInfoCollection/ItemCode and "
+                    f"Items/ItemWarehouseInfoCollection/WarehouseCode eq '{warehouse_code}'"),
+            page_size=300)
+
+        # Process crossjoin results and enhance with batch details
+        formatted_items = []
+        crossjoin_data = list(crossjoin_rows)
+        
+        logging.info(f"📦 Found {len(crossjoin_data)} items in warehouse {warehouse_code}")
 
-                except Exception as item_error:
-                    logging.error(f"❌ Error processing item: {str(item_error)}")
+        # Skip items with zero InStock quantity before any batch lookup
+        stocked_data = []
+        for item_data in crossjoin_data:
+            try:
+                warehouse_info = item_data.get('Items/ItemWarehouseInfoCollection') or {}
+                if float(warehouse_info.get('InStock') or 0) > 0:
+                    stocked_data.append(item_data)
+            except (TypeError, ValueError) as item_error:
+                logging.error(f"❌ Error processing item: {str(item_error)}")
+        crossjoin_data = stocked_data
+
+        # Get batch details for all stocked items with a few bulk queries
+        batch_details_by_item = self._get_items_batch_details(
+            [item_data.get('Items', {}).get('ItemCode') for item_data in crossjoin_data])
+
+        for item_data in crossjoin_data:
+            try:
+                item_info = item_data.get('Items', {})
+                warehouse_info = item_data.get('Items/ItemWarehouseInfoCollection', {})
+                
+                item_code = item_info.get('ItemCode', '')
+                if not item_code:
                     continue
 
-            logging.info(f"🎯 Successfully enhanced {len(formatted_items)} items for bin {bin_code}")
-            return formatted_items
+                batch_details = batch_details_by_item.get(item_code, [])
+                enhanced_item = self._build_bin_item(
+                    item_info, warehouse_info, batch_details, bin_code,
+                    abs_entry, warehouse_code, business_place_id)
+                if enhanced_item is None:
+                    continue
 
-        except Exception as e:
-            logging.error(f"❌ Error in enhanced bin scanning: {str(e)}")
-            return []
+                formatted_items.append(enhanced_item)
+                
+                logging.debug(f"✅ Enhanced item: {item_code} - OnHand: {enhanced_item['OnHand']}, Batches: {enhanced_item['BatchCount']}")
+
+            except Exception as item_error:
+                logging.error(f"❌ Error processing item: {str(item_error)}")
+                continue
+
+        return formatted_items
 
     def _get_item_batch_details(self, item_code):
         """Get batch details for a specific item using your exact BatchNumberDetails API pattern"""
@@ -428,6 +1482,100 @@ class SAPIntegration:
             logging.error(f"❌ Error getting batch details for {item_code}: {str(e)}")
             return []
 
+    def _build_bin_item(self, item_info, warehouse_info, batch_details, bin_code,
+                        abs_entry, warehouse_code, business_place_id):
+        """Build the enhanced bin scan record for one item stock row
+
+        Returns None for items without stock in the bin or warehouse.
+        """
+        item_code = item_info.get('ItemCode', '')
+
+        # Skip items with zero InStock quantity
+        in_stock_qty = float(warehouse_info.get('InStock') or 0)
+        if in_stock_qty <= 0:
+            logging.debug(f"⏭️ Skipping item {item_code} - InStock quantity is {in_stock_qty}")
+            return None
+
+        # Create enhanced item record with all details
+        enhanced_item = {
+            'ItemCode': item_code,
+            'ItemName': item_info.get('ItemName', ''),
+            'UoM': item_info.get('InventoryUoM', ''),
+            'QuantityOnStock': float(item_info.get('QuantityOnStock', 0)),
+            'OnHand': in_stock_qty,
+            'OnStock': in_stock_qty,
+            'InStock': in_stock_qty,
+            'Ordered': float(warehouse_info.get('Ordered', 0)),
+            'StandardAveragePrice': float(warehouse_info.get('StandardAveragePrice', 0)),
+            'WarehouseCode': warehouse_code,
+            'Warehouse': warehouse_code,
+            'BinCode': bin_code,
+            'BinAbsEntry': abs_entry,
+            'BusinessPlaceID': business_place_id,
+            'BatchDetails': batch_details
+        }
+
+        # Add batch summary for display
+        if batch_details:
+            enhanced_item['BatchCount'] = len(batch_details)
+            enhanced_item['BatchNumbers'] = [b.get('Batch', '') for b in batch_details]
+            enhanced_item['ExpiryDates'] = [b.get('ExpirationDate') for b in batch_details if b.get('ExpirationDate')]
+            enhanced_item['AdmissionDates'] = [b.get('AdmissionDate') for b in batch_details if b.get('AdmissionDate')]
+            # Use first batch info for main display
+            if batch_details:
+                first_batch = batch_details[0]
+                enhanced_item['BatchNumber'] = first_batch.get('Batch', '')
+                enhanced_item['Batch'] = first_batch.get('Batch', '')
+                enhanced_item['Status'] = first_batch.get('Status', 'bdsStatus_Released')
+                enhanced_item['AdmissionDate'] = first_batch.get('AdmissionDate', '')
+                enhanced_item['ExpirationDate'] = first_batch.get('ExpirationDate', '')
+                enhanced_item['ExpiryDate'] = first_batch.get('ExpirationDate', '')
+        else:
+            enhanced_item['BatchCount'] = 0
+            enhanced_item['BatchNumbers'] = []
+            enhanced_item['ExpiryDates'] = []
+            enhanced_item['AdmissionDates'] = []
+            enhanced_item['BatchNumber'] = ''
+            enhanced_item['Batch'] = ''
+            enhanced_item['Status'] = 'No Batch'
+            enhanced_item['AdmissionDate'] = ''
+            enhanced_item['ExpirationDate'] = ''
+            enhanced_item['ExpiryDate'] = ''
+
+        # Add legacy fields for compatibility
+        enhanced_item['Quantity'] = enhanced_item['OnHand']
+        enhanced_item['ItemDescription'] = enhanced_item['ItemName']
+        return enhanced_item
+
+    def _get_items_batch_details(self, item_codes):
+        """Get BatchNumberDetails for several items with chunked, paged bulk queries
+
+        One query covers SAP_FILTER_CHUNK_SIZE item codes and the queries of
+        all chunks are sent in one $batch, so a 300-item bin scan needs one
+        request (plus one per further page) instead of 300.
+
+        Returns:
+            Dict of item_code -> list of batch rows
+        """
+        item_codes = list(dict.fromkeys(code for code in item_codes if code))
+        if not item_codes:
+            return {}
+
+        batch_details = {code: [] for code in item_codes}
+        try:
+            # All chunk queries share one $batch round trip
+            paths = [f"BatchNumberDetails?$filter={odata_in_filter('ItemCode', code_chunk)}"
+                     for code_chunk in chunked(item_codes)]
+            for batches in self.batch_get_collections(paths):
+                for batch in batches:
+                    batch_details.setdefault(batch.get('ItemCode'), []).append(batch)
+            logging.debug(f"✅ Found batch details for {len(item_codes)} items")
+            return batch_details
+        except Exception as e:
+            logging.error(f"❌ Error getting batch details in bulk: {str(e)}")
+            # Fall back to one request per item
+            return {code: self._get_item_batch_details(code) for code in item_codes}
+
     def _get_mock_bin_items(self, bin_code):
         """Mock data for offline mode with enhanced structure matching your API responses"""
         # Only return items with InStock > 0 to match the filtering logic
@@ -585,12 +1733,12 @@ class SAPIntegration:
             }
             
             headers = {
-                'Content-Type': 'application/json',
-                'Cookie': f'B1SESSION={self.session_id}'
+                'Content-Type': 'application/json'
             }
             
             logging.info(f"🔍 Fetching batch details for item {item_code} from SAP B1")
-            response = requests.get(url, headers=headers, params=params, verify=False, timeout=30)
+            # Pooled session carries the B1SESSION cookie and re-logs in on expiry
+            response = self.session.get(url, headers=headers, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -612,20 +1760,27 @@ class SAPIntegration:
     def get_batch_numbers(self, item_code):
         """Get batch numbers for specific item from SAP B1 BatchNumberDetails"""
         # Check cache first
-        if item_code in self._batch_cache:
-            return self._batch_cache[item_code]
+        cached_batches = self._batch_cache.get(item_code)
+        if cached_batches is not None:
+            return cached_batches
+
+        mirrored_batches = self.mirror.list_by_parent('batches', item_code)
+        if mirrored_batches is not None:
+            batches = [batch for batch in mirrored_batches if batch.get('Status') == 'bdsStatus_Released']
+            self._batch_cache[item_code] = batches
+            return batches
 
         if not self.ensure_logged_in():
             logging.warning(
                 f"SAP B1 not available, returning mock batch data for {item_code}"
             )
             # Return mock batch data for offline mode
+            # Offline placeholders are never cached, so real batches show up once SAP is back
             mock_batches = [{
 
             }, {
 
             }]
-            self._batch_cache[item_code] = mock_batches
             return mock_batches
 
         try:
@@ -701,14 +1856,13 @@ class SAPIntegration:
             }
 
         try:
-            filter_clause = f"ItemCode eq '{item_code}'"
+            filter_clause = f"ItemCode eq {odata_literal(item_code)} and Batch eq {odata_literal(batch_number)}"
             # if warehouse_code:
             #     filter_clause += f" and Warehouse eq '{warehouse_code}'"
 
-            url = f"{self.base_url}/b1s/v1/BatchNumberDetails?$filter={filter_clause}"
+            url = f"{self.base_url}/b1s/v1/BatchNumberDetails"
 
-            response = self.session.get(url)
-            print(response)
+            response = self.get_projected(url, 'batch_stock', {'$filter': filter_clause})
             if response.status_code == 200:
                 data = response.json()
                 batches = data.get('value', [])
@@ -746,15 +1900,20 @@ class SAPIntegration:
         """Get warehouse and bin code from BinLocations API by AbsEntry"""
         try:
             # Check cache first
-            if bin_abs_entry in self._bin_location_cache:
-                return self._bin_location_cache[bin_abs_entry]
+            cached_location = self._bin_location_cache.get(bin_abs_entry)
+            if cached_location is not None:
+                return cached_location
+
+            mirrored = self.get_bin_locations_details([bin_abs_entry], live=False).get(int(bin_abs_entry))
+            if mirrored:
+                return mirrored
             
             if not self.ensure_logged_in():
                 logging.warning("⚠️ SAP B1 not available, returning mock bin location")
+                # Not cached, the real location is looked up once SAP is back
                 mock_data = {
 
                 }
-                self._bin_location_cache[bin_abs_entry] = mock_data
                 return mock_data
             
             # Use the exact API URL format from user's request
@@ -801,12 +1960,65 @@ class SAPIntegration:
                 'AbsEntry': bin_abs_entry
             }
     
+    def get_bin_locations_details(self, bin_abs_entries, live=True):
+        """Resolve several bin AbsEntries to Warehouse and BinCode with bulk BinLocations queries
+
+        Cached entries are skipped, then the local mirror is consulted; the rest
+        are fetched SAP_FILTER_CHUNK_SIZE at a time (unless live is False) and
+        stored in the bin location cache.
+
+        Returns:
+            Dict of AbsEntry -> {'Warehouse', 'BinCode', 'AbsEntry'} for the bins found
+        """
+        bin_abs_entries = list(dict.fromkeys(int(entry) for entry in bin_abs_entries if entry))
+        resolved = {}
+        for entry in bin_abs_entries:
+            cached_location = self._bin_location_cache.get(entry)
+            if cached_location is not None:
+                resolved[entry] = cached_location
+        missing = [entry for entry in bin_abs_entries if entry not in resolved]
+
+        mirrored = self.mirror.get_many('bins', missing) if missing else None
+        for abs_entry, bin_location in (mirrored or {}).items():
+            resolved[abs_entry] = {
+                'Warehouse': bin_location.get('Warehouse', ''),
+                'BinCode': bin_location.get('BinCode', ''),
+                'AbsEntry': abs_entry
+            }
+            self._bin_location_cache[abs_entry] = resolved[abs_entry]
+        missing = [entry for entry in missing if entry not in resolved]
+
+        if missing and live and self.ensure_logged_in():
+            try:
+                for entry_chunk in chunked(missing):
+                    for bin_location in self.iter_odata('BinLocations',
+                                                        filter=odata_in_filter('AbsEntry', entry_chunk),
+                                                        select='AbsEntry,BinCode,Warehouse'):
+                        abs_entry = bin_location.get('AbsEntry')
+                        resolved[abs_entry] = {
+                            'Warehouse': bin_location.get('Warehouse', ''),
+                            'BinCode': bin_location.get('BinCode', ''),
+                            'AbsEntry': abs_entry
+                        }
+                        self._bin_location_cache[abs_entry] = resolved[abs_entry]
+                logging.info(f"✅ Resolved {len(missing)} bin locations in bulk")
+            except Exception as e:
+                logging.error(f"❌ Error getting bin locations in bulk: {str(e)}")
+
+        return resolved
+
     def enhance_pick_list_with_bin_details(self, pick_list_data):
         """Enhance pick list data with bin location details (Warehouse and BinCode)"""
         try:
             if not pick_list_data or 'PickListsLines' not in pick_list_data:
                 return pick_list_data
-            
+
+            # Resolve every distinct bin of the pick list up front
+            self.get_bin_locations_details(
+                bin_allocation.get('BinAbsEntry')
+                for line in pick_list_data['PickListsLines']
+                for bin_allocation in line.get('DocumentLinesBinAllocations') or [])
+
             for line in pick_list_data['PickListsLines']:
                 if 'DocumentLinesBinAllocations' in line and line['DocumentLinesBinAllocations']:
                     for bin_allocation in line['DocumentLinesBinAllocations']:
@@ -846,11 +2058,21 @@ class SAPIntegration:
         base_entry = transfer_request_data.get(
             'DocEntry') if transfer_request_data else None
 
+        # Index request lines by ItemCode (first line of an item wins)
+        request_lines = {}
+        if transfer_request_data and 'StockTransferLines' in transfer_request_data:
+            for req_line in transfer_request_data['StockTransferLines']:
+                request_lines.setdefault(req_line.get('ItemCode'), req_line)
+
+        # Fetch item details for all lines with bulk item catalog queries
+        items_details = self.get_items_details(
+            [item.item_code for item in transfer_document.items])
+
         # Build stock transfer lines with enhanced structure
         stock_transfer_lines = []
         for index, item in enumerate(transfer_document.items):
             # Get item details for accurate UoM and pricing
-            item_details = self.get_item_details(item.item_code)
+            item_details = items_details.get(item.item_code)
 
             # Use actual item UoM if available
             actual_uom = item_details.get(
@@ -863,14 +2085,12 @@ class SAPIntegration:
             uom_entry = None
             base_line = index
 
-            if transfer_request_data and 'StockTransferLines' in transfer_request_data:
-                for req_line in transfer_request_data['StockTransferLines']:
-                    if req_line.get('ItemCode') == item.item_code:
-                        price = req_line.get('Price', 0)
-                        unit_price = req_line.get('UnitPrice', price)
-                        uom_entry = req_line.get('UoMEntry')
-                        base_line = req_line.get('LineNum', index)
-                        break
+            req_line = request_lines.get(item.item_code)
+            if req_line:
+                price = req_line.get('Price', 0)
+                unit_price = req_line.get('UnitPrice', price)
+                uom_entry = req_line.get('UoMEntry')
+                base_line = req_line.get('LineNum', index)
 
             line = {
                 "LineNum": index,
@@ -932,10 +2152,9 @@ class SAPIntegration:
             "ToWarehouse": transfer_document.to_warehouse,
             "StockTransferLines": stock_transfer_lines
         }
-        print(f"transfer_item (repr) --> {repr(transfer_data)}")
         # Log the JSON payload for debugging
-        logging.info(f"📤 Sending stock transfer to SAP B1:")
-        logging.info(f"JSON payload: {json.dumps(transfer_data, indent=2)}")
+        logging.info(f"📤 Sending stock transfer to SAP B1 ({len(stock_transfer_lines)} lines)")
+        payload_log.debug("JSON payload: %s", LazyJSON(transfer_data))
 
         try:
             response = self.session.post(url, json=transfer_data)
@@ -946,6 +2165,10 @@ class SAPIntegration:
                 logging.info(
                     f"✅ Stock transfer created successfully: {result.get('DocNum')}"
                 )
+                # Batch quantities of the moved items and the request's open quantities are stale now
+                for item in transfer_document.items:
+                    self._batch_cache.invalidate(item.item_code)
+                self._transfer_request_cache.invalidate(transfer_document.transfer_request_number)
                 return {
                     'success': True,
                     'document_number': result.get('DocNum')
@@ -1012,8 +2235,8 @@ class SAPIntegration:
         }
 
         # Log the JSON payload for debugging
-        logging.info(f"📤 Sending serial item stock transfer to SAP B1:")
-        logging.info(f"JSON payload: {json.dumps(transfer_data, indent=2)}")
+        logging.info(f"📤 Sending serial item stock transfer to SAP B1 ({len(stock_transfer_lines)} lines)")
+        payload_log.debug("JSON payload: %s", LazyJSON(transfer_data))
 
         try:
             response = self.session.post(url, json=transfer_data, timeout=30)
@@ -1046,38 +2269,46 @@ class SAPIntegration:
 
             }
 
-        try:
-            url = f"{self.base_url}/b1s/v1/Items('{item_code}')"
-            response = self.session.get(url)
+        item_data = self.item_catalog.get(item_code)
+        if item_data is None:
+            logging.error(f"Failed to get item details for {item_code}")
+            return None
+        return self._format_item_details(item_data)
 
-            if response.status_code == 200:
-                item_data = response.json()
+    def get_items_details(self, item_codes):
+        """Get item details for several items through the item catalog (bulk queries)
 
-                # Get UoM details
-                uom_group_entry = item_data.get('UoMGroupEntry')
-                inventory_uom = item_data.get('InventoryUoM', '')
+        Returns:
+            Dict of item_code -> item details (None for items that failed)
+        """
+        item_codes = list(dict.fromkeys(code for code in item_codes if code))
+        if not item_codes or not self.ensure_logged_in():
+            return {}
 
-                return {
-                    'ItemCode': item_data.get('ItemCode'),
-                    'ItemName': item_data.get('ItemName'),
-                    'UoMGroupEntry': uom_group_entry,
-                    'UoMCode': inventory_uom,
-                    'InventoryUoM': inventory_uom,
-                    'DefaultWarehouse': item_data.get('DefaultWarehouse'),
-                    'ItemType': item_data.get('ItemType'),
-                    'ManageSerialNumbers':
-                    item_data.get('ManageSerialNumbers'),
-                    'ManageBatchNumbers': item_data.get('ManageBatchNumbers')
-                }
-            else:
-                logging.error(
-                    f"Failed to get item details for {item_code}: {response.text}"
-                )
-                return None
-        except Exception as e:
-            logging.error(
-                f"Error getting item details for {item_code}: {str(e)}")
-            return None
+        items = self.item_catalog.get_many(item_codes)
+        return {
+            code: self._format_item_details(items[code]) if items.get(code) else None
+            for code in item_codes
+        }
+
+    def _format_item_details(self, item_data):
+        """Shape an Items entity into the item details dict used by the WMS"""
+        # Get UoM details
+        uom_group_entry = item_data.get('UoMGroupEntry')
+        inventory_uom = item_data.get('InventoryUOM') or item_data.get('InventoryUoM', '')
+
+        return {
+            'ItemCode': item_data.get('ItemCode'),
+            'ItemName': item_data.get('ItemName'),
+            'UoMGroupEntry': uom_group_entry,
+            'UoMCode': inventory_uom,
+            'InventoryUoM': inventory_uom,
+            'DefaultWarehouse': item_data.get('DefaultWarehouse'),
+            'ItemType': item_data.get('ItemType'),
+            'ManageSerialNumbers':
+            item_data.get('ManageSerialNumbers'),
+            'ManageBatchNumbers': item_data.get('ManageBatchNumbers')
+        }
 
     def create_inventory_counting(self, count_document):
         """Create Inventory Counting Document in SAP B1"""
@@ -1146,21 +2377,16 @@ class SAPIntegration:
             
             filter_clause = " and ".join(filters) if filters else ""
             
-            # Construct URL with OData parameters
-            url = f"{self.base_url}/b1s/v1/PickLists"
-            if filter_clause:
-                url += f"?$filter={filter_clause}"
-            
-            logging.info(f"🔍 Fetching pick lists from SAP B1 (avoiding ps_closed): {url}")
-            response = self.session.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
-                pick_lists = data.get('value', [])
+            logging.info(f"🔍 Fetching pick lists from SAP B1 (avoiding ps_closed): {filter_clause}")
+            try:
+                # Follow every page - the Service Layer only returns 20 rows per page by default
+                pick_lists = self.iter_odata('PickLists', filter=filter_clause or None, profile='pick_list')
+                total_pick_lists = 0
                 
                 # Additional filtering for ps_released line items
                 filtered_pick_lists = []
                 for pick_list in pick_lists:
+                    total_pick_lists += 1
                     # Check if pick list has ps_released line items
                     has_released_items = False
                     pick_list_lines = pick_list.get('PickListsLines', [])
@@ -1173,15 +2399,15 @@ class SAPIntegration:
                     if has_released_items or not pick_list_lines:  # Include empty pick lists too
                         filtered_pick_lists.append(pick_list)
                 
-                logging.info(f"✅ Found {len(filtered_pick_lists)} pick lists with ps_released items (filtered from {len(pick_lists)} total)")
+                logging.info(f"✅ Found {len(filtered_pick_lists)} pick lists with ps_released items (filtered from {total_pick_lists} total)")
                 return {
                     'success': True,
                     'pick_lists': filtered_pick_lists,
                     'total_count': len(filtered_pick_lists)
                 }
-            else:
-                logging.error(f"❌ Error fetching pick lists: {response.status_code} - {response.text}")
-                return {'success': False, 'error': f'HTTP {response.status_code}'}
+            except SAPRequestError as e:
+                logging.error(f"❌ Error fetching pick lists: {e.status_code} - {e.text}")
+                return {'success': False, 'error': f'HTTP {e.status_code}'}
                 
         except Exception as e:
             logging.error(f"Error getting pick lists from SAP B1: {str(e)}")
@@ -1209,7 +2435,7 @@ class SAPIntegration:
             url = f"{self.base_url}/b1s/v1/PickLists?$filter=Absoluteentry eq {absolute_entry}"
             logging.info(f"🔍 Fetching pick list {absolute_entry} from SAP B1: {url}")
             
-            response = self.session.get(url)
+            response = self.get_projected(url, 'pick_list')
             
             if response.status_code == 200:
                 data = response.json()
@@ -1286,80 +2512,153 @@ class SAPIntegration:
                 }]
         }
 
-    def sync_pick_list_to_local_db(self, sap_pick_list, local_pick_list):
-        """Sync SAP B1 pick list line items and bin allocations to local database"""
+    @staticmethod
+    def _pick_list_sync_rows(sap_pick_list):
+        """Local PickListLine / PickListBinAllocation values of an SAP pick list, by line number"""
+        rows = {}
+        # Sync PickListsLines from SAP B1 - Focus on ps_released, avoid ps_closed
+        for sap_line in sap_pick_list.get('PickListsLines', []):
+            pick_status = sap_line.get('PickStatus', 'ps_Open')
+
+            # Skip ps_closed items - only sync ps_released and other active statuses
+            if pick_status == 'ps_Closed':
+                pick_list_lines_log.info("⏭️ Skipping ps_Closed line item %s", sap_line.get('LineNumber', 0))
+                continue
+
+            # Prefer ps_released items
+            if pick_status == 'ps_Released':
+                pick_list_lines_log.info("✅ Syncing ps_Released line item %s", sap_line.get('LineNumber', 0))
+
+            line = {
+                'absolute_entry': sap_line.get('AbsoluteEntry'),
+                'line_number': sap_line.get('LineNumber', 0),
+                'order_entry': sap_line.get('OrderEntry'),
+                'order_row_id': sap_line.get('OrderRowID'),
+                'picked_quantity': float(sap_line.get('PickedQuantity', 0)),
+                'pick_status': pick_status,
+                'released_quantity': float(sap_line.get('ReleasedQuantity', 0)),
+                'previously_released_quantity': float(sap_line.get('PreviouslyReleasedQuantity', 0)),
+                'base_object_type': sap_line.get('BaseObjectType', 17),
+                'serial_numbers': json.dumps(sap_line.get('SerialNumbers', [])),
+                'batch_numbers': json.dumps(sap_line.get('BatchNumbers', []))
+            }
+            allocations = [{
+                'bin_abs_entry': bin_allocation.get('BinAbsEntry'),
+                'quantity': float(bin_allocation.get('Quantity', 0)),
+                'allow_negative_quantity': bin_allocation.get('AllowNegativeQuantity', 'tNO'),
+                'serial_and_batch_numbers_base_line': bin_allocation.get('SerialAndBatchNumbersBaseLine', 0),
+                'base_line_number': bin_allocation.get('BaseLineNumber')
+            } for bin_allocation in sap_line.get('DocumentLinesBinAllocations', [])]
+            rows[line['line_number']] = (line, allocations)
+        return rows
+
+    def sync_pick_list_to_local_db(self, sap_pick_list, local_pick_list, force=False):
+        """Sync SAP B1 pick list line items and bin allocations to local database
+
+        Lines are matched on (pick_list_id, line_number): changed lines and
+        allocations are updated in place, new ones inserted in one flush and
+        lines no longer in SAP deleted. When the SAP content is the same as at
+        the last sync nothing is written and 'skipped' is True.
+        """
         from app import db
-        from models import PickListLine, PickListBinAllocation
-        import json
-        
+        from models import PickListLine, PickListBinAllocation, PickListSyncState
+
         try:
-            # Clear existing lines and bin allocations - Fix for SQLAlchemy join delete issue
-            # First get the IDs of bin allocations to delete
-            pick_list_line_ids = [line.id for line in PickListLine.query.filter_by(pick_list_id=local_pick_list.id).all()]
-            
-            if pick_list_line_ids:
-                # Delete bin allocations first (foreign key dependency)
-                PickListBinAllocation.query.filter(PickListBinAllocation.pick_list_line_id.in_(pick_list_line_ids)).delete(synchronize_session=False)
-                
-                # Then delete pick list lines
-                PickListLine.query.filter_by(pick_list_id=local_pick_list.id).delete(synchronize_session=False)
-            
-            # Sync PickListsLines from SAP B1 - Focus on ps_released, avoid ps_closed
             sap_lines = sap_pick_list.get('PickListsLines', [])
-            for sap_line in sap_lines:
-                pick_status = sap_line.get('PickStatus', 'ps_Open')
-                
-                # Skip ps_closed items - only sync ps_released and other active statuses
-                if pick_status == 'ps_Closed':
-                    logging.info(f"⏭️ Skipping ps_Closed line item {sap_line.get('LineNumber', 0)}")
-                    continue
-                
-                # Prefer ps_released items
-                if pick_status == 'ps_Released':
-                    logging.info(f"✅ Syncing ps_Released line item {sap_line.get('LineNumber', 0)}")
-                
-                # Create PickListLine
-                pick_list_line = PickListLine(
-                    pick_list_id=local_pick_list.id,
-                    absolute_entry=sap_line.get('AbsoluteEntry'),
-                    line_number=sap_line.get('LineNumber', 0),
-                    order_entry=sap_line.get('OrderEntry'),
-                    order_row_id=sap_line.get('OrderRowID'),
-                    picked_quantity=float(sap_line.get('PickedQuantity', 0)),
-                    pick_status=pick_status,
-                    released_quantity=float(sap_line.get('ReleasedQuantity', 0)),
-                    previously_released_quantity=float(sap_line.get('PreviouslyReleasedQuantity', 0)),
-                    base_object_type=sap_line.get('BaseObjectType', 17),
-                    serial_numbers=json.dumps(sap_line.get('SerialNumbers', [])),
-                    batch_numbers=json.dumps(sap_line.get('BatchNumbers', []))
-                )
-                db.session.add(pick_list_line)
-                db.session.flush()  # Get the ID
-                
-                # Sync DocumentLinesBinAllocations
-                bin_allocations = sap_line.get('DocumentLinesBinAllocations', [])
-                for bin_allocation in bin_allocations:
-                    pick_list_bin_allocation = PickListBinAllocation(
-                        pick_list_line_id=pick_list_line.id,
-                        bin_abs_entry=bin_allocation.get('BinAbsEntry'),
-                        quantity=float(bin_allocation.get('Quantity', 0)),
-                        allow_negative_quantity=bin_allocation.get('AllowNegativeQuantity', 'tNO'),
-                        serial_and_batch_numbers_base_line=bin_allocation.get('SerialAndBatchNumbersBaseLine', 0),
-                        base_line_number=bin_allocation.get('BaseLineNumber')
-                    )
-                    db.session.add(pick_list_bin_allocation)
-            
+            rows = self._pick_list_sync_rows(sap_pick_list)
+
             # Update pick list totals
             total_lines = len(sap_lines)
             picked_lines = len([line for line in sap_lines if line.get('PickStatus') == 'ps_Closed'])
-            
+
+            fingerprint = hashlib.sha256(json.dumps(
+                [total_lines, picked_lines, sorted(rows.items())], sort_keys=True, default=str
+            ).encode('utf-8')).hexdigest()
+            state = PickListSyncState.query.get(local_pick_list.id) if local_pick_list.id else None
+            if state and state.sap_fingerprint == fingerprint and not force:
+                logging.debug(f"Pick list {local_pick_list.absolute_entry} unchanged in SAP B1 - sync skipped")
+                return {'success': True, 'synced_lines': total_lines, 'skipped': True}
+
+            existing_lines = {}
+            stale_line_ids = []
+            for line in PickListLine.query.filter_by(pick_list_id=local_pick_list.id).order_by(PickListLine.id):
+                if line.line_number in rows and line.line_number not in existing_lines:
+                    existing_lines[line.line_number] = line
+                else:
+                    stale_line_ids.append(line.id)
+
+            existing_allocations = {}
+            if existing_lines:
+                line_numbers = {line.id: number for number, line in existing_lines.items()}
+                for allocation in PickListBinAllocation.query.filter(
+                        PickListBinAllocation.pick_list_line_id.in_(list(line_numbers))).order_by(PickListBinAllocation.id):
+                    existing_allocations.setdefault(line_numbers[allocation.pick_list_line_id], []).append(allocation)
+
+            updated = 0
+            new_rows = []
+            stale_allocations = []
+            for line_number, (values, allocations) in rows.items():
+                line = existing_lines.get(line_number)
+                if line is None:
+                    new_rows.append((values, allocations))
+                    continue
+
+                changed = False
+                for name, value in values.items():
+                    if getattr(line, name) != value:
+                        setattr(line, name, value)
+                        changed = True
+
+                # Allocations are matched on bin and serial/batch base line, in SAP order
+                current = {}
+                for allocation in existing_allocations.get(line_number, []):
+                    current.setdefault((allocation.bin_abs_entry, allocation.serial_and_batch_numbers_base_line),
+                                       []).append(allocation)
+                for allocation_values in allocations:
+                    matches = current.get((allocation_values['bin_abs_entry'],
+                                           allocation_values['serial_and_batch_numbers_base_line']))
+                    if not matches:
+                        db.session.add(PickListBinAllocation(pick_list_line_id=line.id, **allocation_values))
+                        changed = True
+                        continue
+                    allocation = matches.pop(0)
+                    for name, value in allocation_values.items():
+                        if getattr(allocation, name) != value:
+                            setattr(allocation, name, value)
+                            changed = True
+                for leftovers in current.values():
+                    stale_allocations.extend(allocation.id for allocation in leftovers)
+                    changed = changed or bool(leftovers)
+                updated += changed
+
+            if stale_line_ids:
+                stale_allocations.extend(allocation_id for (allocation_id,) in db.session.query(
+                    PickListBinAllocation.id).filter(PickListBinAllocation.pick_list_line_id.in_(stale_line_ids)))
+            if stale_allocations:
+                PickListBinAllocation.query.filter(
+                    PickListBinAllocation.id.in_(stale_allocations)).delete(synchronize_session=False)
+            if stale_line_ids:
+                PickListLine.query.filter(PickListLine.id.in_(stale_line_ids)).delete(synchronize_session=False)
+
             local_pick_list.total_items = total_lines
             local_pick_list.picked_items = picked_lines
-            
+
+            # Flush first so a new pick list has its ID for the new lines and the sync state
+            db.session.flush()
+            added, _ = bulk_insert_pick_list_lines(local_pick_list.id, new_rows)
+            if state is None:
+                state = PickListSyncState(pick_list_id=local_pick_list.id)
+                db.session.add(state)
+            state.sap_fingerprint = fingerprint
+            state.line_count = len(rows)
+            state.synced_at = datetime.utcnow()
+
             db.session.commit()
-            logging.info(f"✅ Synced {total_lines} lines and bin allocations for pick list {local_pick_list.absolute_entry}")
-            return {'success': True, 'synced_lines': total_lines}
-            
+            logging.info(f"✅ Synced {total_lines} lines for pick list {local_pick_list.absolute_entry}: "
+                         f"{added} added, {updated} updated, {len(stale_line_ids)} removed")
+            return {'success': True, 'synced_lines': total_lines, 'added': added, 'updated': updated,
+                    'removed': len(stale_line_ids)}
+
         except Exception as e:
             db.session.rollback()
             logging.error(f"❌ Error syncing pick list to local DB: {str(e)}")
@@ -1381,82 +2680,26 @@ class SAPIntegration:
             return False
 
         try:
-            url = f"{self.base_url}/b1s/v1/Warehouses"
-            response = self.session.get(url)
-
-            if response.status_code == 200:
-                warehouses = response.json().get('value', [])
+            # Stream every page of Warehouses instead of only the first one
+            warehouses = self.iter_odata('Warehouses', profile='warehouse_sync')
+            now = datetime.utcnow()
 
-                from app import db
-
-                # Clear cache and update database
-                self._warehouse_cache = {}
+            # Clear cache and update database
+            self._warehouse_cache.invalidate()
 
+            def warehouse_rows():
+                # Rows are generated page by page, so bulk_upsert writes chunks as they arrive
                 for wh in warehouses:
-                    # Check if warehouse exists in branches table
-                    existing = db.session.execute(
-                        db.text("SELECT id FROM branches WHERE id = :id"), {
-                            "id": wh.get('WarehouseCode')
-                        }).fetchone()
-
-                    if not existing:
-                        # Insert new warehouse as branch - use compatible SQL
-                        import os
-                        # Removed circular import
-                        db_uri = os.environ.get('DATABASE_URL', '')
-
-                        if 'postgresql' in db_uri.lower(
-                        ) or 'mysql' in db_uri.lower():
-                            insert_sql = """
-                                INSERT INTO branches (id, name, address, is_active, created_at, updated_at)
-                                VALUES (:id, :name, :address, :is_active, NOW(), NOW())
-                            """
-                        else:
-                            insert_sql = """
-                                INSERT INTO branches (id, name, address, is_active, created_at, updated_at)
-                                VALUES (:id, :name, :address, :is_active, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                            """
-
-                        db.session.execute(
-                            db.text(insert_sql), {
-                                "id": wh.get('WarehouseCode'),
-                                "name": wh.get('WarehouseName', ''),
-                                "address": wh.get('Street', ''),
-                                "is_active": wh.get('Inactive') != 'Y'
-                            })
-                    else:
-                        # Update existing warehouse - use compatible SQL
-                        import os
-                        # Removed circular import
-                        db_uri = os.environ.get('DATABASE_URL', '')
-
-                        if 'postgresql' in db_uri.lower(
-                        ) or 'mysql' in db_uri.lower():
-                            update_sql = """
-                                UPDATE branches SET 
-                                    name = :name, 
-                                    address = :address, 
-                                    is_active = :is_active,
-                                    updated_at = NOW()
-                                WHERE id = :id
-                            """
-                        else:
-                            update_sql = """
-                                UPDATE branches SET 
-                                    name = :name, 
-                                    address = :address, 
-                                    is_active = :is_active,
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE id = :id
-                            """
-
-                        db.session.execute(
-                            db.text(update_sql), {
-                                "id": wh.get('WarehouseCode'),
-                                "name": wh.get('WarehouseName', ''),
-                                "address": wh.get('Street', ''),
-                                "is_active": wh.get('Inactive') != 'Y'
-                            })
+                    if not wh.get('WarehouseCode'):
+                        continue
+                    yield {
+                        "id": wh.get('WarehouseCode'),
+                        "name": wh.get('WarehouseName', ''),
+                        "address": wh.get('Street', ''),
+                        "is_active": wh.get('Inactive') != 'Y',
+                        "created_at": now,
+                        "updated_at": now
+                    }
 
                     # Cache warehouse data
                     self._warehouse_cache[wh.get('WarehouseCode')] = {
@@ -1465,11 +2708,15 @@ class SAPIntegration:
                         'Address': wh.get('Street'),
                         'Active': wh.get('Inactive') != 'Y'
                     }
+                    if wh.get('BusinessPlaceID') is not None:
+                        self._warehouse_cache.set(f"{wh.get('WarehouseCode')}:BusinessPlaceID",
+                                                  wh.get('BusinessPlaceID'))
 
-                db.session.commit()
-                logging.info(
-                    f"Synced {len(warehouses)} warehouses from SAP B1")
-                return True
+            warehouse_count = bulk_upsert('branches', warehouse_rows(), ['id'],
+                                          ['name', 'address', 'is_active', 'updated_at'])
+            logging.info(
+                f"Synced {warehouse_count} warehouses from SAP B1")
+            return True
 
         except Exception as e:
             logging.error(f"Error syncing warehouses: {str(e)}")
@@ -1482,108 +2729,30 @@ class SAPIntegration:
             return False
 
         try:
-            # Get bins for specific warehouse or all warehouses
-            if warehouse_code:
-                url = f"{self.base_url}/b1s/v1/BinLocations?$filter=Warehouse eq '{warehouse_code}'"
-            else:
-                url = f"{self.base_url}/b1s/v1/BinLocations"
+            # Get bins for specific warehouse or all warehouses, following every page
+            bin_filter = f"Warehouse eq '{warehouse_code}'" if warehouse_code else None
+            bins = self.iter_odata('BinLocations', filter=bin_filter, profile='bin_sync')
+            ensure_table('bin_locations', BIN_LOCATIONS_DDL)
+            now = datetime.utcnow()
 
-            response = self.session.get(url)
-
-            if response.status_code == 200:
-                bins = response.json().get('value', [])
-
-                # Create bins table if not exists - use compatible SQL
-                from app import db, app
-                import os
-
-                db_uri = os.environ.get('DATABASE_URL', '')
-
-                if 'postgresql' in db_uri.lower():
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS bin_locations (
-                            id SERIAL PRIMARY KEY,
-                            bin_code VARCHAR(50) NOT NULL,
-                            warehouse_code VARCHAR(10) NOT NULL,
-                            bin_name VARCHAR(100),
-                            is_active BOOLEAN DEFAULT TRUE,
-                            created_at TIMESTAMP DEFAULT NOW(),
-                            updated_at TIMESTAMP DEFAULT NOW(),
-                            UNIQUE(bin_code, warehouse_code)
-                        )
-                    """
-                elif 'mysql' in db_uri.lower():
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS bin_locations (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            bin_code VARCHAR(50) NOT NULL,
-                            warehouse_code VARCHAR(10) NOT NULL,
-                            bin_name VARCHAR(100),
-                            is_active BOOLEAN DEFAULT TRUE,
-                            created_at TIMESTAMP DEFAULT NOW(),
-                            updated_at TIMESTAMP DEFAULT NOW() ON UPDATE NOW(),
-                            UNIQUE KEY unique_bin_warehouse (bin_code, warehouse_code)
-                        )
-                    """
-                else:
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS bin_locations (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            bin_code VARCHAR(50) NOT NULL,
-                            warehouse_code VARCHAR(10) NOT NULL,
-                            bin_name VARCHAR(100),
-                            is_active BOOLEAN DEFAULT 1,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            UNIQUE(bin_code, warehouse_code)
-                        )
-                    """
-
-                db.session.execute(db.text(create_table_sql))
-
-                # Clear cache
-                self._bin_cache = {}
+            # Clear cache
+            self._bin_cache.invalidate()
 
+            def bin_rows():
                 for bin_data in bins:
                     bin_code = bin_data.get('BinCode')
                     wh_code = bin_data.get(
                         'Warehouse')  # Use 'Warehouse' not 'WarehouseCode'
 
                     if bin_code and wh_code:
-                        # Upsert bin location - use database-specific syntax
-                        if 'postgresql' in db_uri.lower():
-                            upsert_sql = """
-                                INSERT INTO bin_locations (bin_code, warehouse_code, bin_name, is_active, created_at, updated_at)
-                                VALUES (:bin_code, :warehouse_code, :bin_name, :is_active, NOW(), NOW())
-                                ON CONFLICT (bin_code, warehouse_code) 
-                                DO UPDATE SET 
-                                    bin_name = EXCLUDED.bin_name,
-                                    is_active = EXCLUDED.is_active,
-                                    updated_at = NOW()
-                            """
-                        elif 'mysql' in db_uri.lower():
-                            upsert_sql = """
-                                INSERT INTO bin_locations (bin_code, warehouse_code, bin_name, is_active, created_at, updated_at)
-                                VALUES (:bin_code, :warehouse_code, :bin_name, :is_active, NOW(), NOW())
-                                ON DUPLICATE KEY UPDATE 
-                                    bin_name = VALUES(bin_name),
-                                    is_active = VALUES(is_active),
-                                    updated_at = NOW()
-                            """
-                        else:
-                            # SQLite - use INSERT OR REPLACE
-                            upsert_sql = """
-                                INSERT OR REPLACE INTO bin_locations (bin_code, warehouse_code, bin_name, is_active, created_at, updated_at)
-                                VALUES (:bin_code, :warehouse_code, :bin_name, :is_active, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                            """
-
-                        db.session.execute(
-                            db.text(upsert_sql), {
-                                "bin_code": bin_code,
-                                "warehouse_code": wh_code,
-                                "bin_name": bin_data.get('Description', ''),
-                                "is_active": bin_data.get('Inactive') != 'Y'
-                            })
+                        yield {
+                            "bin_code": bin_code,
+                            "warehouse_code": wh_code,
+                            "bin_name": bin_data.get('Description', ''),
+                            "is_active": bin_data.get('Inactive') != 'Y',
+                            "created_at": now,
+                            "updated_at": now
+                        }
 
                         # Cache bin data
                         cache_key = f"{wh_code}:{bin_code}"
@@ -1594,9 +2763,10 @@ class SAPIntegration:
                             'Active': bin_data.get('Inactive') != 'Y'
                         }
 
-                db.session.commit()
-                logging.info(f"Synced {len(bins)} bin locations from SAP B1")
-                return True
+            bin_count = bulk_upsert('bin_locations', bin_rows(), ['bin_code', 'warehouse_code'],
+                                    ['bin_name', 'is_active', 'updated_at'])
+            logging.info(f"Synced {bin_count} bin locations from SAP B1")
+            return True
 
         except Exception as e:
             logging.error(f"Error syncing bins: {str(e)}")
@@ -1610,119 +2780,36 @@ class SAPIntegration:
             return False
 
         try:
-            # Get suppliers and customers
-            url = f"{self.base_url}/b1s/v1/BusinessPartners?$filter=CardType eq 'cSupplier' or CardType eq 'cCustomer'"
-            response = self.session.get(url)
-
-            if response.status_code == 200:
-                partners = response.json().get('value', [])
-
-                from app import db, app
-
-                # Create business_partners table if not exists - use database-specific syntax
-                db_uri = os.environ.get('DATABASE_URL', '')
-
-                if 'postgresql' in db_uri.lower():
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS business_partners (
-                            id SERIAL PRIMARY KEY,
-                            card_code VARCHAR(50) UNIQUE NOT NULL,
-                            card_name VARCHAR(200) NOT NULL,
-                            card_type VARCHAR(20) NOT NULL,
-                            phone VARCHAR(50),
-                            email VARCHAR(100),
-                            address TEXT,
-                            is_active BOOLEAN DEFAULT TRUE,
-                            created_at TIMESTAMP DEFAULT NOW(),
-                            updated_at TIMESTAMP DEFAULT NOW()
-                        )
-                    """
-                elif 'mysql' in db_uri.lower():
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS business_partners (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            card_code VARCHAR(50) UNIQUE NOT NULL,
-                            card_name VARCHAR(200) NOT NULL,
-                            card_type VARCHAR(20) NOT NULL,
-                            phone VARCHAR(50),
-                            email VARCHAR(100),
-                            address TEXT,
-                            is_active BOOLEAN DEFAULT TRUE,
-                            created_at TIMESTAMP DEFAULT NOW(),
-                            updated_at TIMESTAMP DEFAULT NOW() ON UPDATE NOW()
-                        )
-                    """
-                else:
-                    create_table_sql = """
-                        CREATE TABLE IF NOT EXISTS business_partners (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            card_code VARCHAR(50) UNIQUE NOT NULL,
-                            card_name VARCHAR(200) NOT NULL,
-                            card_type VARCHAR(20) NOT NULL,
-                            phone VARCHAR(50),
-                            email VARCHAR(100),
-                            address TEXT,
-                            is_active BOOLEAN DEFAULT 1,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    """
-
-                db.session.execute(db.text(create_table_sql))
-
+            # Get suppliers and customers, following every page
+            partners = self.iter_odata(
+                'BusinessPartners',
+                filter="CardType eq 'cSupplier' or CardType eq 'cCustomer'",
+                profile='business_partner_sync')
+            ensure_table('business_partners', BUSINESS_PARTNERS_DDL)
+            now = datetime.utcnow()
+
+            def partner_rows():
                 for partner in partners:
                     card_code = partner.get('CardCode')
                     if card_code:
-                        # Use database-specific upsert syntax
-                        if 'postgresql' in db_uri.lower():
-                            upsert_sql = """
-                                INSERT INTO business_partners (card_code, card_name, card_type, phone, email, address, is_active, created_at, updated_at)
-                                VALUES (:card_code, :card_name, :card_type, :phone, :email, :address, :is_active, NOW(), NOW())
-                                ON CONFLICT (card_code) 
-                                DO UPDATE SET 
-                                    card_name = EXCLUDED.card_name,
-                                    card_type = EXCLUDED.card_type,
-                                    phone = EXCLUDED.phone,
-                                    email = EXCLUDED.email,
-                                    address = EXCLUDED.address,
-                                    is_active = EXCLUDED.is_active,
-                                    updated_at = NOW()
-                            """
-                        elif 'mysql' in db_uri.lower():
-                            upsert_sql = """
-                                INSERT INTO business_partners (card_code, card_name, card_type, phone, email, address, is_active, created_at, updated_at)
-                                VALUES (:card_code, :card_name, :card_type, :phone, :email, :address, :is_active, NOW(), NOW())
-                                ON DUPLICATE KEY UPDATE 
-                                    card_name = VALUES(card_name),
-                                    card_type = VALUES(card_type),
-                                    phone = VALUES(phone),
-                                    email = VALUES(email),
-                                    address = VALUES(address),
-                                    is_active = VALUES(is_active),
-                                    updated_at = NOW()
-                            """
-                        else:
-                            # SQLite - use INSERT OR REPLACE
-                            upsert_sql = """
-                                INSERT OR REPLACE INTO business_partners (card_code, card_name, card_type, phone, email, address, is_active, created_at, updated_at)
-                                VALUES (:card_code, :card_name, :card_type, :phone, :email, :address, :is_active, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                            """
-
-                        db.session.execute(
-                            db.text(upsert_sql), {
-                                "card_code": card_code,
-                                "card_name": partner.get('CardName', ''),
-                                "card_type": partner.get('CardType', ''),
-                                "phone": partner.get('Phone1', ''),
-                                "email": partner.get('EmailAddress', ''),
-                                "address": partner.get('Address', ''),
-                                "is_active": partner.get('Valid') == 'Y'
-                            })
+                        yield {
+                            "card_code": card_code,
+                            "card_name": partner.get('CardName', ''),
+                            "card_type": partner.get('CardType', ''),
+                            "phone": partner.get('Phone1', ''),
+                            "email": partner.get('EmailAddress', ''),
+                            "address": partner.get('Address', ''),
+                            "is_active": partner.get('Valid') == 'Y',
+                            "created_at": now,
+                            "updated_at": now
+                        }
 
-                db.session.commit()
-                logging.info(
-                    f"Synced {len(partners)} business partners from SAP B1")
-                return True
+            partner_count = bulk_upsert(
+                'business_partners', partner_rows(), ['card_code'],
+                ['card_name', 'card_type', 'phone', 'email', 'address', 'is_active', 'updated_at'])
+            logging.info(
+                f"Synced {partner_count} business partners from SAP B1")
+            return True
 
         except Exception as e:
             logging.error(f"Error syncing business partners: {str(e)}")
@@ -1778,7 +2865,7 @@ class SAPIntegration:
             
             # Execute PATCH request to SAP B1
             logging.info(f"Sending PATCH request to {url}")
-            logging.info(f"Payload: {json.dumps(payload, indent=2)}")
+            payload_log.debug("Payload: %s", LazyJSON(payload))
             
             response = self.session.patch(url, json=payload, timeout=30)
             
@@ -1888,7 +2975,7 @@ class SAPIntegration:
             
             # Execute PATCH request to SAP B1
             logging.info(f"Sending PATCH request to {url} for line {target_line_number}")
-            logging.info(f"Payload: {json.dumps(payload, indent=2)}")
+            payload_log.debug("Payload: %s", LazyJSON(payload))
             
             response = self.session.patch(url, json=payload, timeout=30)
             
@@ -1923,6 +3010,11 @@ class SAPIntegration:
         if not self.ensure_logged_in():
             return 5  # Default fallback
 
+        cache_key = f"{warehouse_code}:BusinessPlaceID"
+        cached_place_id = self._warehouse_cache.get(cache_key)
+        if cached_place_id is not None:
+            return cached_place_id
+
         try:
             url = f"{self.base_url}/b1s/v1/Warehouses"
             params = {
@@ -1934,7 +3026,9 @@ class SAPIntegration:
             if response.status_code == 200:
                 data = response.json()
                 if data.get('value') and len(data['value']) > 0:
-                    return data['value'][0].get('BusinessPlaceID', 5)
+                    business_place_id = data['value'][0].get('BusinessPlaceID', 5)
+                    self._warehouse_cache.set(cache_key, business_place_id)
+                    return business_place_id
             return 5  # Default fallback
 
         except Exception as e:
@@ -2013,7 +3107,8 @@ class SAPIntegration:
                 'document_number': f'PDN-{random.randint(100000, 999999)}'
             }
 
-        # Get PO data first to ensure proper field mapping
+        # Get PO data first to ensure proper field mapping - always fresh, as open
+        # quantities may have changed without the header timestamp moving
         po_data = self.get_purchase_order(grpo_document.po_number)
         if not po_data:
             return {
@@ -2046,20 +3141,28 @@ class SAPIntegration:
         # Generate unique external reference number
         external_ref = self.generate_external_reference_number(grpo_document)
 
+        # Index PO lines by (ItemCode, LineNum), and by ItemCode for items without a PO line number
+        po_lines = {}
+        po_lines_by_item = {}
+        for po_line in po_data.get('DocumentLines', []):
+            po_lines[(po_line.get('ItemCode'), po_line.get('LineNum'))] = po_line
+            po_lines_by_item.setdefault(po_line.get('ItemCode'), po_line)
+
+        def find_po_line(item):
+            po_line = po_lines.get((item.item_code, getattr(item, 'po_line_number', None)))
+            return po_line or po_lines_by_item.get(item.item_code)
+
         # Get first warehouse code from PO DocumentLines to determine BusinessPlaceID
         first_warehouse_code = None
-        if grpo_document.items:
-            for item in grpo_document.items:
-                if item.qc_status == 'approved':
-                    # Find matching PO line to get proper warehouse code
-                    for po_line in po_data.get('DocumentLines', []):
-                        if po_line.get('ItemCode') == item.item_code:
-                            first_warehouse_code = po_line.get(
-                                'WarehouseCode') or po_line.get('WhsCode')
-                            if first_warehouse_code:
-                                break
-                    if first_warehouse_code:
-                        break
+        for item in grpo_document.items:
+            if item.qc_status == 'approved':
+                # Find matching PO line to get proper warehouse code
+                po_line = find_po_line(item)
+                if po_line:
+                    first_warehouse_code = po_line.get(
+                        'WarehouseCode') or po_line.get('WhsCode')
+                if first_warehouse_code:
+                    break
 
         # Get BusinessPlaceID for the warehouse
         business_place_id = self.get_warehouse_business_place_id(
@@ -2075,13 +3178,8 @@ class SAPIntegration:
                 continue
 
             # Find matching PO line for proper mapping
-            po_line_num = None
-            po_line_data = None
-            for po_line in po_data.get('DocumentLines', []):
-                if po_line.get('ItemCode') == item.item_code:
-                    po_line_num = po_line.get('LineNum')
-                    po_line_data = po_line
-                    break
+            po_line_data = find_po_line(item)
+            po_line_num = po_line_data.get('LineNum') if po_line_data else None
 
             if po_line_num is None:
                 logging.warning(
@@ -2165,14 +3263,9 @@ class SAPIntegration:
         # Submit to SAP B1
         url = f"{self.base_url}/b1s/v1/PurchaseDeliveryNotes"
 
-        # Log the payload for debugging - Enhanced JSON logging
-        import json
-        logging.info("=" * 80)
-        logging.info("PURCHASE DELIVERY NOTE - JSON PAYLOAD")
-        logging.info("=" * 80)
-        logging.info(json.dumps(pdn_data, indent=2, default=str))
-        logging.info("=" * 80)
-        print(pdn_data)
+        # Log the payload for debugging
+        logging.info(f"📤 Sending Purchase Delivery Note to SAP B1 ({len(document_lines)} lines)")
+        payload_log.debug("PURCHASE DELIVERY NOTE - JSON PAYLOAD: %s", LazyJSON(pdn_data))
         try:
             response = self.session.post(url, json=pdn_data)
             if response.status_code == 201:
@@ -2241,7 +3334,10 @@ class SAPIntegration:
             return {'success': False, 'error': str(e)}
 
     def sync_all_master_data(self):
-        """Sync all master data from SAP B1"""
+        """Sync all master data from SAP B1 in the calling thread
+
+        The web app runs these syncs as background jobs instead (see sap_scheduler).
+        """
         logging.info("Starting full SAP B1 master data synchronization...")
 
         results = {
@@ -2249,6 +3345,9 @@ class SAPIntegration:
             'bins': self.sync_bins(),
             'business_partners': self.sync_business_partners()
         }
+        # Refresh the local master data mirror (incremental after the first run)
+        for entity, result in self.mirror.sync_all().items():
+            results[f'mirror_{entity}'] = result['success']
 
         success_count = sum(1 for result in results.values() if result)
         logging.info(
@@ -2300,12 +3399,75 @@ class SAPIntegration:
             }
         }
 
+    def get_sales_orders_by_doc_entries(self, doc_entries):
+        """Get several Sales Orders with chunked DocEntry or-filter queries
+
+        Returns:
+            Dict of DocEntry -> Sales Order document for the orders found
+        """
+        doc_entries = list(dict.fromkeys(int(entry) for entry in doc_entries if entry))
+        if not doc_entries or not self.ensure_logged_in():
+            return {}
+
+        orders = {}
+        try:
+            for entry_chunk in chunked(doc_entries):
+                for order in self.iter_odata('Orders', filter=odata_in_filter('DocEntry', entry_chunk)):
+                    orders[order.get('DocEntry')] = order
+            logging.info(f"✅ Fetched {len(orders)} of {len(doc_entries)} Sales Orders in bulk")
+        except Exception as e:
+            logging.error(f"Error getting Sales Orders {doc_entries} from SAP B1: {str(e)}")
+        return orders
+
+    def _apply_sales_order_fields(self, sales_order, order_data):
+        """Copy SAP Sales Order header fields onto a SalesOrder row"""
+        sales_order.doc_entry = order_data.get('DocEntry')
+        sales_order.doc_num = order_data.get('DocNum')
+        sales_order.doc_type = order_data.get('DocType')
+
+        # Parse dates
+        doc_date = order_data.get('DocDate')
+        if doc_date:
+            if isinstance(doc_date, str):
+                sales_order.doc_date = datetime.fromisoformat(doc_date.replace('Z', '+00:00'))
+            else:
+                sales_order.doc_date = doc_date
+
+        doc_due_date = order_data.get('DocDueDate')
+        if doc_due_date:
+            if isinstance(doc_due_date, str):
+                sales_order.doc_due_date = datetime.fromisoformat(doc_due_date.replace('Z', '+00:00'))
+            else:
+                sales_order.doc_due_date = doc_due_date
+
+        sales_order.card_code = order_data.get('CardCode')
+        sales_order.card_name = order_data.get('CardName')
+        sales_order.address = order_data.get('Address')
+        sales_order.doc_total = order_data.get('DocTotal')
+        sales_order.doc_currency = order_data.get('DocCurrency')
+        sales_order.comments = order_data.get('Comments')
+        sales_order.document_status = order_data.get('DocumentStatus')
+        sales_order.last_sap_sync = datetime.utcnow()
+
+    def _apply_sales_order_line_fields(self, order_line, line_data):
+        """Copy SAP Sales Order line fields onto a SalesOrderLine row"""
+        order_line.line_num = line_data.get('LineNum')
+        order_line.item_code = line_data.get('ItemCode')
+        order_line.item_description = line_data.get('ItemDescription') or line_data.get('Dscription')
+        order_line.quantity = line_data.get('Quantity')
+        order_line.open_quantity = line_data.get('OpenQuantity')
+        order_line.delivered_quantity = line_data.get('DeliveredQuantity')
+        order_line.unit_price = line_data.get('UnitPrice')
+        order_line.line_total = line_data.get('LineTotal')
+        order_line.warehouse_code = line_data.get('WarehouseCode')
+        order_line.unit_of_measure = line_data.get('UoMCode')
+        order_line.line_status = line_data.get('LineStatus')
+
     def sync_sales_order_to_local_db(self, order_data):
         """Sync Sales Order data to local database"""
         try:
             from app import db
             from models import SalesOrder, SalesOrderLine
-            from datetime import datetime
             
             doc_entry = order_data.get('DocEntry')
             if not doc_entry:
@@ -2319,33 +3481,7 @@ class SAPIntegration:
                 db.session.add(sales_order)
             
             # Update Sales Order fields
-            sales_order.doc_entry = doc_entry
-            sales_order.doc_num = order_data.get('DocNum')
-            sales_order.doc_type = order_data.get('DocType')
-            
-            # Parse dates
-            doc_date = order_data.get('DocDate')
-            if doc_date:
-                if isinstance(doc_date, str):
-                    sales_order.doc_date = datetime.fromisoformat(doc_date.replace('Z', '+00:00'))
-                else:
-                    sales_order.doc_date = doc_date
-            
-            doc_due_date = order_data.get('DocDueDate')
-            if doc_due_date:
-                if isinstance(doc_due_date, str):
-                    sales_order.doc_due_date = datetime.fromisoformat(doc_due_date.replace('Z', '+00:00'))
-                else:
-                    sales_order.doc_due_date = doc_due_date
-            
-            sales_order.card_code = order_data.get('CardCode')
-            sales_order.card_name = order_data.get('CardName')
-            sales_order.address = order_data.get('Address')
-            sales_order.doc_total = order_data.get('DocTotal')
-            sales_order.doc_currency = order_data.get('DocCurrency')
-            sales_order.comments = order_data.get('Comments')
-            sales_order.document_status = order_data.get('DocumentStatus')
-            sales_order.last_sap_sync = datetime.utcnow()
+            self._apply_sales_order_fields(sales_order, order_data)
             
             db.session.flush()  # Get the ID
             
@@ -2370,17 +3506,7 @@ class SAPIntegration:
                     db.session.add(order_line)
                 
                 # Update line fields
-                order_line.line_num = line_num
-                order_line.item_code = line_data.get('ItemCode')
-                order_line.item_description = line_data.get('ItemDescription') or line_data.get('Dscription')
-                order_line.quantity = line_data.get('Quantity')
-                order_line.open_quantity = line_data.get('OpenQuantity')
-                order_line.delivered_quantity = line_data.get('DeliveredQuantity')
-                order_line.unit_price = line_data.get('UnitPrice')
-                order_line.line_total = line_data.get('LineTotal')
-                order_line.warehouse_code = line_data.get('WarehouseCode')
-                order_line.unit_of_measure = line_data.get('UoMCode')
-                order_line.line_status = line_data.get('LineStatus')
+                self._apply_sales_order_line_fields(order_line, line_data)
                 
                 lines_synced += 1
             
@@ -2398,13 +3524,104 @@ class SAPIntegration:
             logging.error(f"Error syncing Sales Order to local DB: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def sync_sales_orders_to_local_db(self, orders_data):
+        """Sync several Sales Orders to the local database in one transaction
+
+        Existing orders and lines are loaded with one IN query each instead of
+        one query per order and per line.
+        """
+        try:
+            from app import db
+            from models import SalesOrder, SalesOrderLine
+
+            orders_data = [order for order in orders_data if order.get('DocEntry')]
+            if not orders_data:
+                return {'success': True, 'orders_synced': 0, 'lines_synced': 0}
+
+            existing_orders = {
+                sales_order.doc_entry: sales_order
+                for sales_order in SalesOrder.query.filter(
+                    SalesOrder.doc_entry.in_([order['DocEntry'] for order in orders_data])).all()
+            }
+            existing_lines = {}
+            if existing_orders:
+                for order_line in SalesOrderLine.query.filter(SalesOrderLine.sales_order_id.in_(
+                        [sales_order.id for sales_order in existing_orders.values()])).all():
+                    existing_lines[(order_line.sales_order_id, order_line.line_num)] = order_line
+
+            synced_orders = []
+            for order_data in orders_data:
+                sales_order = existing_orders.get(order_data['DocEntry'])
+                if not sales_order:
+                    sales_order = SalesOrder()
+                    db.session.add(sales_order)
+                self._apply_sales_order_fields(sales_order, order_data)
+                synced_orders.append((sales_order, order_data))
+
+            db.session.flush()  # Get the IDs of new orders
+
+            lines_synced = 0
+            for sales_order, order_data in synced_orders:
+                for line_data in order_data.get('DocumentLines', []):
+                    line_num = line_data.get('LineNum')
+                    if line_num is None:
+                        continue
+
+                    order_line = existing_lines.get((sales_order.id, line_num))
+                    if not order_line:
+                        order_line = SalesOrderLine()
+                        order_line.sales_order_id = sales_order.id
+                        db.session.add(order_line)
+                    self._apply_sales_order_line_fields(order_line, line_data)
+                    lines_synced += 1
+
+            db.session.commit()
+
+            logging.info(f"✅ Synced {len(synced_orders)} Sales Orders with {lines_synced} lines")
+            return {
+                'success': True,
+                'orders_synced': len(synced_orders),
+                'lines_synced': lines_synced
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error syncing Sales Orders to local DB: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
     def enhance_picklist_with_sales_order_data(self, picklist_lines):
         """Enhance picklist lines with Sales Order item details"""
         enhanced_lines = []
         
         try:
-            from app import db
             from models import SalesOrder, SalesOrderLine
+
+            # Load every referenced Sales Order and its lines up front
+            order_entries = list(dict.fromkeys(
+                line.get('OrderEntry') for line in picklist_lines
+                if line.get('OrderEntry') and line.get('OrderRowID') is not None))
+
+            sales_orders = {}
+            if order_entries:
+                sales_orders = {
+                    sales_order.doc_entry: sales_order
+                    for sales_order in SalesOrder.query.filter(SalesOrder.doc_entry.in_(order_entries)).all()
+                }
+
+                missing_entries = [entry for entry in order_entries if entry not in sales_orders]
+                if missing_entries:
+                    # Fetch the missing orders from SAP B1 and sync them to local
+                    sap_orders = self.get_sales_orders_by_doc_entries(missing_entries)
+                    if sap_orders and self.sync_sales_orders_to_local_db(sap_orders.values()).get('success'):
+                        for sales_order in SalesOrder.query.filter(
+                                SalesOrder.doc_entry.in_(missing_entries)).all():
+                            sales_orders[sales_order.doc_entry] = sales_order
+
+            order_lines = {}
+            if sales_orders:
+                for order_line in SalesOrderLine.query.filter(SalesOrderLine.sales_order_id.in_(
+                        [sales_order.id for sales_order in sales_orders.values()])).all():
+                    order_lines[(order_line.sales_order_id, order_line.line_num)] = order_line
             
             for line in picklist_lines:
                 enhanced_line = line.copy()
@@ -2413,23 +3630,11 @@ class SAPIntegration:
                 order_row_id = line.get('OrderRowID')
                 
                 if order_entry and order_row_id is not None:
-                    # First try to get from local database
-                    sales_order = SalesOrder.query.filter_by(doc_entry=order_entry).first()
-                    
-                    if not sales_order:
-                        # Fetch from SAP B1 and sync to local
-                        sap_result = self.get_sales_order_by_doc_entry(order_entry)
-                        if sap_result.get('success'):
-                            sync_result = self.sync_sales_order_to_local_db(sap_result['sales_order'])
-                            if sync_result.get('success'):
-                                sales_order = SalesOrder.query.filter_by(doc_entry=order_entry).first()
+                    sales_order = sales_orders.get(order_entry)
                     
                     if sales_order:
                         # Get the specific line based on OrderRowID (which corresponds to LineNum)
-                        order_line = SalesOrderLine.query.filter_by(
-                            sales_order_id=sales_order.id,
-                            line_num=order_row_id
-                        ).first()
+                        order_line = order_lines.get((sales_order.id, order_row_id))
                         
                         if order_line:
                             # Enhance the picklist line with Sales Order data directly on the line object
@@ -2447,7 +3652,8 @@ class SAPIntegration:
                                 'LineTotal': order_line.line_total
                             })
                             
-                            logging.info(f"✅ Enhanced picklist line {line.get('LineNumber')} with Sales Order data: {order_line.item_code}")
+                            pick_list_lines_log.info("✅ Enhanced picklist line %s with Sales Order data: %s",
+                                                     line.get('LineNumber'), order_line.item_code)
                         else:
                             logging.warning(f"⚠️ Sales Order line not found: OrderEntry={order_entry}, OrderRowID={order_row_id}")
                     else:
@@ -2482,48 +3688,13 @@ class SAPIntegration:
             # SAP B1 API endpoint for SQL Queries
             api_url = f"{self.base_url}/b1s/v1/SQLQueries('Series_Validation')/List"
             
-            # Request body with ParamList - include warehouse code if provided
-            if warehouse_code:
-                payload = {
-                    "ParamList": f"series='{serial_number}'&itemCode='{item_code}'&whsCode='{warehouse_code}'"
-                }
-            else:
-                payload = {
-                    "ParamList": f"series='{serial_number}'&itemCode='{item_code}'"
-                }
+            payload = self._series_validation_payload(serial_number, item_code, warehouse_code)
             
             # Make API call with existing session
             response = self.session.post(api_url, json=payload, timeout=30)
             
             if response.status_code == 200:
-                data = response.json()
-                
-                if data.get('value') and len(data['value']) > 0:
-                    # Series found in the specified warehouse
-                    series_data = data['value'][0]
-                    return {
-                        'valid': True,
-                        'DistNumber': series_data.get('DistNumber'),
-                        'ItemCode': series_data.get('ItemCode'),
-                        'WhsCode': series_data.get('WhsCode'),
-                        'available_in_warehouse': True,
-                        'message': f'Series {serial_number} is available in warehouse {series_data.get("WhsCode")}'
-                    }
-                else:
-                    # Series not found in the specified warehouse
-                    if warehouse_code:
-                        return {
-                            'valid': True,  # Allow transfer to continue
-                            'available_in_warehouse': False,
-                            'warning': f'Series {serial_number} is not available in warehouse {warehouse_code}',
-                            'message': 'Transfer can continue - series will be moved from another location'
-                        }
-                    else:
-                        return {
-                            'valid': True,  # Series exists but no stock in warehouse
-                            'available_in_warehouse': False,
-                            'warning': f'Series {serial_number} exists but has no stock in any warehouse'
-                        }
+                return self._format_series_validation(response.json(), serial_number, warehouse_code)
             else:
                 return {
                     'valid': False,
@@ -2537,15 +3708,61 @@ class SAPIntegration:
                 'error': f'Validation error: {str(e)}'
             }
 
-    def validate_batch_series_with_warehouse(self, serial_numbers, item_code, warehouse_code, batch_size=100):
+    def _series_validation_payload(self, serial_number, item_code, warehouse_code=None):
+        """Request body with ParamList - include warehouse code if provided"""
+        if warehouse_code:
+            return {
+                "ParamList": f"series='{serial_number}'&itemCode='{item_code}'&whsCode='{warehouse_code}'"
+            }
+        return {
+            "ParamList": f"series='{serial_number}'&itemCode='{item_code}'"
+        }
+
+    def _format_series_validation(self, data, serial_number, warehouse_code=None):
+        """Shape a Series_Validation SQL query result into the validation dict"""
+        if data.get('value') and len(data['value']) > 0:
+            # Series found in the specified warehouse
+            series_data = data['value'][0]
+            return {
+                'valid': True,
+                'DistNumber': series_data.get('DistNumber'),
+                'ItemCode': series_data.get('ItemCode'),
+                'WhsCode': series_data.get('WhsCode'),
+                'available_in_warehouse': True,
+                'message': f'Series {serial_number} is available in warehouse {series_data.get("WhsCode")}'
+            }
+        else:
+            # Series not found in the specified warehouse
+            if warehouse_code:
+                return {
+                    'valid': True,  # Allow transfer to continue
+                    'available_in_warehouse': False,
+                    'warning': f'Series {serial_number} is not available in warehouse {warehouse_code}',
+                    'message': 'Transfer can continue - series will be moved from another location'
+                }
+            else:
+                return {
+                    'valid': True,  # Series exists but no stock in warehouse
+                    'available_in_warehouse': False,
+                    'warning': f'Series {serial_number} exists but has no stock in any warehouse'
+                }
+
+    def validate_batch_series_with_warehouse(self, serial_numbers, item_code, warehouse_code, batch_size=100,
+                                             max_workers=None, progress_callback=None):
         """Batch validate multiple series against SAP B1 API for improved performance
-        
+
+        Duplicate serials are validated once. Chunks are sent concurrently by a
+        bounded worker pool sharing the pooled SAP sessions.
+
         Args:
             serial_numbers: List of serial numbers to validate
             item_code: The item code to check against
             warehouse_code: Warehouse code to check series availability
             batch_size: Number of serials to process in each batch (default 100)
-            
+            max_workers: Chunks in flight at once (default and upper limit SAP_SERIAL_VALIDATION_WORKERS,
+                also capped at one less than the session pool size)
+            progress_callback: Optional callable(processed, total) called as chunks complete
+
         Returns:
             Dict with validation results for each serial number
         """
@@ -2555,23 +3772,36 @@ class SAPIntegration:
         
         if not serial_numbers:
             return {}
-            
+
+        unique_serials = list(dict.fromkeys(serial_numbers))
+        if len(unique_serials) < len(serial_numbers):
+            logging.info(f"🔁 Skipping {len(serial_numbers) - len(unique_serials)} duplicate serial numbers")
+
         results = {}
-        total_serials = len(serial_numbers)
-        
+        total_serials = len(unique_serials)
+        batches = [unique_serials[i:i + batch_size] for i in range(0, total_serials, batch_size)]
+        workers = max(1, min(max_workers or SAP_SERIAL_VALIDATION_WORKERS, SAP_SERIAL_VALIDATION_WORKERS,
+                             self.session_pool.size - 1, len(batches)))
+
         try:
-            # Process serials in batches to avoid API limits and improve performance
-            for i in range(0, total_serials, batch_size):
-                batch = serial_numbers[i:i+batch_size]
-                batch_results = self._validate_batch_chunk(batch, item_code, warehouse_code)
-                results.update(batch_results)
-                
-                # Log progress for large batches
-                if total_serials > 100:
-                    processed = min(i + batch_size, total_serials)
-                    logging.info(f"📊 Batch validation progress: {processed}/{total_serials} serial numbers processed")
+            # Process serials in batches to avoid API limits, several batches at a time
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sap-serials') as executor:
+                futures = [executor.submit(self._validate_batch_chunk, batch, item_code, warehouse_code)
+                           for batch in batches]
+                processed = 0
+                for future in as_completed(futures):
+                    batch_results = future.result()
+                    results.update(batch_results)
+                    processed += len(batch_results)
+
+                    # Report progress for large batches
+                    if progress_callback:
+                        progress_callback(processed, total_serials)
+                    if total_serials > batch_size:
+                        logging.info(f"📊 Batch validation progress: {processed}/{total_serials} serial numbers processed")
             
-            logging.info(f"✅ Completed batch validation for {total_serials} serial numbers")
+            logging.info(f"✅ Completed batch validation for {total_serials} serial numbers "
+                         f"({len(batches)} chunks, {workers} workers)")
             return results
             
         except Exception as e:
@@ -2738,13 +3968,8 @@ class SAPIntegration:
             }
             
             # Log the payload for debugging
-            logging.info("=" * 80)
-            logging.info("SERIAL NUMBER STOCK TRANSFER - JSON PAYLOAD")
-            logging.info("=" * 80)
-            import json
-            logging.info(json.dumps(transfer_data, indent=2, default=str))
-            logging.info("=" * 80)
-            print(f"transfer_item (repr) --> {repr(transfer_data)}")
+            logging.info(f"📤 Sending serial number stock transfer to SAP B1 ({len(stock_transfer_lines)} lines)")
+            payload_log.debug("SERIAL NUMBER STOCK TRANSFER - JSON PAYLOAD: %s", LazyJSON(transfer_data))
             # Submit to SAP B1
             response = self.session.post(url, json=transfer_data)
             
@@ -2878,14 +4103,9 @@ class SAPIntegration:
                 return "Unknown Item"
                 
             # Try to get item description from Items master data
-            url = f"{self.base_url}/b1s/v1/Items?$filter=ItemCode eq '{item_code}'&$select=ItemCode,ItemName"
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                items = data.get('value', [])
-                if items and len(items) > 0:
-                    return items[0].get('ItemName', f'Item {item_code}')
+            item_name = self.item_catalog.get_name(item_code)
+            if item_name:
+                return item_name
                     
         except Exception as e:
             logging.warning(f"⚠️ Could not fetch item description for {item_code}: {str(e)}")
@@ -2893,16 +4113,25 @@ class SAPIntegration:
         # Fallback to item code if description not found
         return f'Item {item_code}'
 
+    def get_circuit_state(self):
+        """Circuit breaker state of this Service Layer, for monitoring"""
+        return self.session_pool.breaker.status()
+
+    def warm_up_session_pool(self):
+        """Log in all pooled Service Layer sessions ahead of the first request"""
+        if not self.base_url or not self.username or not self.password or not self.company_db:
+            return 0
+        return self.session_pool.warm_up()
+
     def logout(self):
-        """Logout from SAP B1"""
+        """Logout from SAP B1 - forgets this instance's login
+
+        Sessions belong to the process-wide pool and are shared with other
+        requests, so they stay logged in; the next call logs in again.
+        """
         if self.session_id:
-            try:
-                logout_url = f"{self.base_url}/b1s/v1/Logout"
-                self.session.post(logout_url)
-                self.session_id = None
-                logging.info("Logged out from SAP B1")
-            except Exception as e:
-                logging.error(f"Error logging out from SAP B1: {str(e)}")
+            self.session_id = None
+            logging.info("Logged out from SAP B1")
 
 
 # Create global SAP integration instance for backward compatibility
@@ -0,0 +1,501 @@
+"""
+Asyncio SAP B1 Service Layer client
+Concurrent variant of the SAPIntegration lookup methods for fan-out workloads
+(pick list enrichment, bin scans, serial validation)
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+
+from sap_cache import get_cache
+from sap_integration import (SAPIntegration, SAPCircuitOpenError, SAPLoginError, SAPRequestError,
+                             SAP_CONNECT_TIMEOUT, SAP_ODATA_PAGE_SIZE, SAP_REQUEST_TIMEOUT,
+                             BIN_STOCK_QUERY_CODE, BIN_STOCK_QUERY_NAME, BIN_STOCK_QUERY_SQL,
+                             _registered_sql_queries, chunked,
+                             group_bin_stock_rows, is_session_expired_response, next_page_url,
+                             odata_in_filter, record_payload_bytes)
+from sap_json import use_fast_json
+
+# Upper bound of in-flight Service Layer requests per client; also capped by the
+# session pool size, as the Service Layer serialises the requests of one session
+SAP_ASYNC_MAX_CONCURRENCY = int(os.environ.get('SAP_B1_ASYNC_MAX_CONCURRENCY', '16'))
+
+# Event loop thread running the shared client, and the client itself
+_loop = None
+_loop_pid = None
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+class AsyncSAPIntegration:
+    """Async sibling of SAPIntegration for concurrent lookups
+
+    Usage:
+        async with AsyncSAPIntegration() as sap:
+            results = await asyncio.gather(*(sap.get_item_batches(code) for code in codes))
+
+    Requests run on the logged-in sessions of the SAPIntegration session pool,
+    so no extra SAP B1 licences are used: each request checks out a pooled
+    session, sends its B1SESSION cookie over the client's httpx connection
+    pool and hands the session back. Synchronous code should use
+    run_concurrent_lookups, which keeps one client open for the whole process.
+    Return values match the synchronous methods of the same name.
+    """
+
+    def __init__(self, max_concurrency=SAP_ASYNC_MAX_CONCURRENCY):
+        self.base_url = os.environ.get('SAP_B1_SERVER', '')
+        self.company_db = os.environ.get('SAP_B1_COMPANY_DB', '')
+        self.is_offline = False
+
+        # Response shaping, logins and offline fallbacks are shared with the sync client
+        self._sync = SAPIntegration()
+        self._pool = self._sync.session_pool
+        # One circuit breaker per Service Layer, shared with the sync client
+        self._breaker = self._pool.breaker
+        self.max_concurrency = max(1, min(max_concurrency, self._pool.size))
+
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Pool checkouts and re-logins block, so they run on threads of their own
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix='sap-async-session')
+        self._bin_location_cache = get_cache('bin_location')
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def open(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                verify=False,  # For development, in production use proper SSL
+                timeout=httpx.Timeout(SAP_REQUEST_TIMEOUT, connect=SAP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._executor.shutdown(wait=False)
+
+    async def _blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def ensure_logged_in(self):
+        """Make sure the session pool has a logged-in session (see SAPIntegration.ensure_logged_in)"""
+        if self._breaker.is_open():
+            return False
+        if self._sync.session_id:
+            return True
+        return await self._blocking(self._sync.ensure_logged_in)
+
+    async def _guarded(self, send):
+        """Await one Service Layer call under the circuit breaker shared with the sync client"""
+        if not self._breaker.allow_request():
+            raise SAPCircuitOpenError("SAP B1 circuit breaker is open")
+        started = time.monotonic()
+        try:
+            response = await send()
+        except (httpx.TransportError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Request or pooled session login could not reach SAP
+            self._breaker.record_failure(f"{type(e).__name__}: {str(e)}")
+            raise
+        except Exception:
+            # Pool timeout, login or other client error - no SAP response to judge its health by
+            self._breaker.release_probe()
+            raise
+        self._breaker.record_outcome(response.status_code, time.monotonic() - started)
+        return response
+
+    async def request(self, method, url, **kwargs):
+        """Send one request on a pooled session, bounded by the client semaphore"""
+        if not await self.ensure_logged_in():
+            raise SAPLoginError("SAP B1 not available")
+        async with self._semaphore:
+            response = await self._guarded(lambda: self._send(method, url, **kwargs))
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                record_payload_bytes(len(response.content), (AsyncSAPIntegration,))
+            return use_fast_json(response)
+
+    @staticmethod
+    def _session_headers(session, headers):
+        """Request headers carrying the cookies (B1SESSION, ROUTEID) of a pooled session"""
+        headers = dict(headers or {})
+        headers['Cookie'] = '; '.join(f"{cookie.name}={cookie.value}" for cookie in session.cookies)
+        return headers
+
+    async def _send(self, method, url, headers=None, **kwargs):
+        session = await self._blocking(self._pool.acquire)
+        try:
+            session_id = session.sap_session_id
+            response = await self._client.request(
+                method, url, headers=self._session_headers(session, headers), **kwargs)
+            if is_session_expired_response(response):
+                # Single-flight per session, shared with the sync client
+                await self._blocking(self._pool.relogin, session, session_id)
+                # Only GETs are replayed; writes are left to the caller
+                if method.upper() == 'GET':
+                    response = await self._client.request(
+                        method, url, headers=self._session_headers(session, headers), **kwargs)
+        except Exception:
+            await self._blocking(self._pool.discard, session)
+            raise
+        self._pool.release(session)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def iter_odata(self, entity, filter=None, select=None, page_size=None, expand=None):
+        """Async counterpart of SAPIntegration.iter_odata - yields rows across all pages"""
+        params = {}
+        if filter:
+            params['$filter'] = filter
+        if select:
+            params['$select'] = select if isinstance(select, str) else ','.join(select)
+        if expand:
+            params['$expand'] = expand
+
+        headers = {'Prefer': f"odata.maxpagesize={page_size or SAP_ODATA_PAGE_SIZE}"}
+        url = f"{self.base_url}/b1s/v1/{entity}"
+
+        while url:
+            response = await self.get(url, params=params, headers=headers, timeout=60)
+            if response.status_code != 200:
+                raise SAPRequestError(response.status_code, response.text)
+
+            data = response.json()
+            for row in data.get('value', []):
+                yield row
+
+            url = next_page_url(self.base_url, data)
+            params = None
+
+    async def ensure_sql_query(self, query_code, query_name, sql_text):
+        """Async counterpart of SAPIntegration.ensure_sql_query"""
+        if self._sync.is_sql_query_unavailable(query_code):
+            return False
+        key = (self.base_url, self.company_db, query_code)
+        if key in _registered_sql_queries:
+            return True
+
+        response = await self.get(f"{self.base_url}/b1s/v1/SQLQueries('{query_code}')", timeout=30)
+        if response.status_code == 404:
+            logging.info(f"📝 Registering SQL query {query_code}")
+            response = await self.post(f"{self.base_url}/b1s/v1/SQLQueries", json={
+                'SqlCode': query_code,
+                'SqlName': query_name,
+                'SqlText': sql_text
+            }, timeout=30)
+        if response.status_code not in (200, 201):
+            logging.warning(f"⚠️ SQL query {query_code} not available: {response.status_code} - {response.text}")
+            if 400 <= response.status_code < 500:
+                self._sync.mark_sql_query_unavailable(query_code)
+            return False
+
+        _registered_sql_queries.add(key)
+        return True
+
+    async def iter_sql_query(self, query_code, param_list=None, page_size=None):
+        """Async counterpart of SAPIntegration.iter_sql_query - yields rows across all pages"""
+        payload = {'ParamList': param_list} if param_list else {}
+        headers = {'Prefer': f"odata.maxpagesize={page_size or SAP_ODATA_PAGE_SIZE}"}
+        url = f"{self.base_url}/b1s/v1/SQLQueries('{query_code}')/List"
+
+        while url:
+            response = await self.post(url, json=payload, headers=headers, timeout=60)
+            if response.status_code != 200:
+                raise SAPRequestError(response.status_code, response.text)
+
+            data = response.json()
+            for row in data.get('value', []):
+                yield row
+
+            url = next_page_url(self.base_url, data)
+
+    async def get_item_batches(self, item_code):
+        """Get available batches for an item with stock information"""
+        if not await self.ensure_logged_in():
+            logging.warning("⚠️ No SAP B1 session - returning mock batch data")
+            return self._sync._get_mock_batch_data(item_code)
+
+        try:
+            response = await self.get(
+                f"{self.base_url}/b1s/v1/BatchNumberDetails",
+                params={
+                    '$filter': f"ItemCode eq '{item_code}'",
+                    '$select': 'Batch,ExpirationDate,ManufacturingDate'
+                })
+
+            if response.status_code == 200:
+                batches = response.json().get('value', [])
+                logging.info(f"✅ Found {len(batches)} batches for item {item_code}")
+                return batches
+            logging.error(f"❌ SAP B1 API error getting batches: {response.status_code}")
+            return self._sync._get_mock_batch_data(item_code)
+
+        except Exception as e:
+            logging.error(f"❌ Error getting batches from SAP B1: {str(e)}")
+            return self._sync._get_mock_batch_data(item_code)
+
+    async def get_bin_location_details(self, bin_abs_entry):
+        """Get warehouse and bin code from BinLocations API by AbsEntry"""
+        cached_location = self._bin_location_cache.get(bin_abs_entry)
+        if cached_location is not None:
+            return cached_location
+
+        if not await self.ensure_logged_in():
+            logging.warning("⚠️ SAP B1 not available, returning mock bin location")
+            return {}
+
+        try:
+            response = await self.get(
+                f"{self.base_url}/b1s/v1/BinLocations",
+                params={
+                    '$select': 'BinCode,Warehouse',
+                    '$filter': f"AbsEntry eq {bin_abs_entry}"
+                })
+
+            if response.status_code == 200:
+                bin_locations = response.json().get('value', [])
+                if bin_locations:
+                    result = {
+                        'Warehouse': bin_locations[0].get('Warehouse', ''),
+                        'BinCode': bin_locations[0].get('BinCode', ''),
+                        'AbsEntry': bin_abs_entry
+                    }
+                    self._bin_location_cache[bin_abs_entry] = result
+                    return result
+                logging.warning(f"⚠️ Bin location not found for AbsEntry {bin_abs_entry}")
+                return {
+                    'Warehouse': 'Unknown',
+                    'BinCode': f'Bin-{bin_abs_entry}',
+                    'AbsEntry': bin_abs_entry
+                }
+            logging.error(f"❌ SAP B1 API error getting bin location: {response.status_code}")
+
+        except Exception as e:
+            logging.error(f"❌ Error getting bin location details: {str(e)}")
+
+        return {
+            'Warehouse': 'Error',
+            'BinCode': f'Bin-{bin_abs_entry}',
+            'AbsEntry': bin_abs_entry
+        }
+
+    async def get_sales_order_by_doc_entry(self, doc_entry):
+        """Get Sales Order by DocEntry for picklist integration"""
+        if not await self.ensure_logged_in():
+            logging.warning("SAP B1 not available for Sales Order lookup")
+            return self._sync._get_mock_sales_order(doc_entry)
+
+        try:
+            response = await self.get(
+                f"{self.base_url}/b1s/v1/Orders",
+                params={'$filter': f"DocEntry eq {doc_entry}"})
+
+            if response.status_code == 200:
+                orders = response.json().get('value', [])
+                if orders:
+                    return {'success': True, 'sales_order': orders[0]}
+                logging.warning(f"⚠️ Sales Order DocEntry={doc_entry} not found")
+                return {'success': False, 'error': f'Sales Order {doc_entry} not found'}
+            logging.error(f"❌ Error fetching Sales Order: {response.status_code} - {response.text}")
+            return {'success': False, 'error': f'HTTP {response.status_code}'}
+
+        except Exception as e:
+            logging.error(f"Error getting Sales Order {doc_entry} from SAP B1: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    async def validate_series_with_warehouse(self, serial_number, item_code, warehouse_code=None):
+        """Validate series against SAP B1 API using SQL Queries for warehouse validation"""
+        if not await self.ensure_logged_in():
+            logging.warning("SAP B1 not available, cannot validate series")
+            return {'valid': False, 'error': 'SAP B1 not available'}
+
+        try:
+            response = await self.post(
+                f"{self.base_url}/b1s/v1/SQLQueries('Series_Validation')/List",
+                json=self._sync._series_validation_payload(serial_number, item_code, warehouse_code))
+
+            if response.status_code == 200:
+                return self._sync._format_series_validation(response.json(), serial_number, warehouse_code)
+            return {
+                'valid': False,
+                'error': f'SAP API error: {response.status_code} - {response.text}'
+            }
+
+        except Exception as e:
+            logging.error(f"Error validating series with SAP: {str(e)}")
+            return {'valid': False, 'error': f'Validation error: {str(e)}'}
+
+    async def get_bin_items(self, bin_code):
+        """Enhanced bin scanning - warehouse info, stock and batches are fetched concurrently"""
+        if not await self.ensure_logged_in():
+            logging.warning("SAP B1 not available, returning mock bin data")
+            return self._sync._get_mock_bin_items(bin_code)
+
+        try:
+            bin_response = await self.get(
+                f"{self.base_url}/b1s/v1/BinLocations",
+                params={'$filter': f"BinCode eq '{bin_code}'"})
+            if bin_response.status_code != 200:
+                logging.warning(f"❌ Bin {bin_code} not found: {bin_response.status_code}")
+                return []
+
+            bin_data = bin_response.json().get('value', [])
+            if not bin_data:
+                logging.warning(f"❌ Bin {bin_code} does not exist")
+                return []
+
+            warehouse_code = bin_data[0].get('Warehouse', '')
+            abs_entry = bin_data[0].get('AbsEntry', 0)
+
+            async def warehouse_business_place():
+                response = await self.get(
+                    f"{self.base_url}/b1s/v1/Warehouses",
+                    params={
+                        '$select': 'BusinessPlaceID,WarehouseCode,DefaultBin',
+                        '$filter': f"WarehouseCode eq '{warehouse_code}'"
+                    })
+                if response.status_code == 200:
+                    warehouse_data = response.json().get('value', [])
+                    if warehouse_data:
+                        return warehouse_data[0].get('BusinessPlaceID', 0)
+                return 0
+
+            async def bin_stock():
+                try:
+                    if not await self.ensure_sql_query(BIN_STOCK_QUERY_CODE, BIN_STOCK_QUERY_NAME,
+                                                       BIN_STOCK_QUERY_SQL):
+                        return None
+                    return group_bin_stock_rows([row async for row in self.iter_sql_query(
+                        BIN_STOCK_QUERY_CODE, f"binAbs={int(abs_entry)}")])
+                except Exception as e:
+                    logging.warning(f"⚠️ Bin stock query failed for bin {bin_code}: {str(e)}")
+                    if isinstance(e, SAPRequestError) and 400 <= e.status_code < 500:
+                        self._sync.mark_sql_query_unavailable(BIN_STOCK_QUERY_CODE)
+                    return None
+
+            # Warehouse info and bin stock only depend on the bin lookup
+            business_place_id, stock = await asyncio.gather(
+                warehouse_business_place(), bin_stock())
+            if stock is None:
+                # Stored query unavailable - fall back to the warehouse-wide crossjoin
+                stock = await self._get_warehouse_stock(warehouse_code)
+
+            formatted_items = []
+            for item_info, warehouse_info, batch_details in stock:
+                enhanced_item = self._sync._build_bin_item(
+                    item_info, warehouse_info, batch_details,
+                    bin_code, abs_entry, warehouse_code, business_place_id)
+                if enhanced_item is not None:
+                    formatted_items.append(enhanced_item)
+
+            logging.info(f"🎯 Successfully enhanced {len(formatted_items)} items for bin {bin_code}")
+            return formatted_items
+
+        except Exception as e:
+            logging.error(f"❌ Error in enhanced bin scanning: {str(e)}")
+            return []
+
+    async def _get_warehouse_stock(self, warehouse_code):
+        """Stocked items of a whole warehouse via the Items crossjoin, batches fetched concurrently
+
+        Returns:
+            List of (item_info, warehouse_info, batch_details) tuples
+        """
+        crossjoin_data = [row async for row in self.iter_odata(
+            "$crossjoin(Items,Items/ItemWarehouseInfoCollection)",
+            expand=("Items($select=ItemCode,ItemName,QuantityOnStock),"
+                    "Items/ItemWarehouseInfoCollection($select=InStock,Ordered,StandardAveragePrice)"),
+            filter=("Items/ItemCode eq Items/ItemWarehouseInfoCollection/ItemCode and "
+                    f"Items/ItemWarehouseInfoCollection/WarehouseCode eq '{warehouse_code}'"),
+            page_size=300)]
+
+        async def chunk_batches(code_chunk):
+            return [batch async for batch in self.iter_odata(
+                'BatchNumberDetails', filter=odata_in_filter('ItemCode', code_chunk))]
+
+        # Zero-stock items are dropped before any batch lookup
+        stocked_rows = [
+            row for row in crossjoin_data
+            if row.get('Items', {}).get('ItemCode')
+            and float((row.get('Items/ItemWarehouseInfoCollection') or {}).get('InStock') or 0) > 0
+        ]
+        item_codes = list(dict.fromkeys(row['Items']['ItemCode'] for row in stocked_rows))
+        batch_details_by_item = {}
+        for batches in await asyncio.gather(*(chunk_batches(chunk) for chunk in chunked(item_codes))):
+            for batch in batches:
+                batch_details_by_item.setdefault(batch.get('ItemCode'), []).append(batch)
+
+        return [
+            (row['Items'], row.get('Items/ItemWarehouseInfoCollection', {}),
+             batch_details_by_item.get(row['Items']['ItemCode'], []))
+            for row in stocked_rows
+        ]
+
+
+def _background_loop():
+    """Event loop of this process that the shared client lives on, started on first use"""
+    global _loop, _loop_pid, _shared_client
+    if _loop is None or _loop_pid != os.getpid():
+        # A forked worker does not inherit the loop thread
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+        _shared_client = None
+        threading.Thread(target=_loop.run_forever, name='sap-async-loop', daemon=True).start()
+    return _loop
+
+
+def shared_async_client():
+    """Process-wide AsyncSAPIntegration and the loop it runs on
+
+    The client, its httpx connection pool and its TLS connections stay open
+    between calls. It is replaced when the SAP credentials change, as its
+    session pool is then closed.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        loop = _background_loop()
+        client = _shared_client
+        if client is None or client._pool.closed:
+            _shared_client = AsyncSAPIntegration()
+            _shared_client.open()
+            if client is not None:
+                asyncio.run_coroutine_threadsafe(client.close(), loop)
+            client = _shared_client
+        return client, loop
+
+
+def run_concurrent_lookups(calls):
+    """Run several AsyncSAPIntegration lookups concurrently from synchronous code
+
+    The calls run on the shared client (see shared_async_client), so a bin scan
+    pays for neither a new event loop nor new connections or logins.
+
+    Args:
+        calls: List of (method_name, *args) tuples, e.g. [('get_item_batches', 'A001')]
+
+    Returns:
+        List of results in the same order as ``calls``
+    """
+    client, loop = shared_async_client()
+
+    async def _run():
+        return await asyncio.gather(*(getattr(client, name)(*args) for name, *args in calls))
+
+    return asyncio.run_coroutine_threadsafe(_run(), loop).result()
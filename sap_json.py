@@ -0,0 +1,130 @@
+"""
+Fast JSON encoding and decoding
+Uses orjson when it is installed and falls back to the standard library, both for
+SAP Service Layer responses and for the JSON returned by the Flask API routes
+
+Benchmark on the recorded OData payloads:
+    python sap_json.py [attached_assets/*.txt]
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional dependency - the standard library is used instead
+    orjson = None
+
+# Name of the active backend, for logs and the benchmark
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Encode to a JSON str"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+
+def response_json(response, **kwargs):
+    """Decode a requests/httpx response body, like response.json()
+
+    Bodies orjson cannot read (a non-UTF-8 charset) are handed to the response's own decoder.
+    """
+    if orjson is None or kwargs:
+        return response.__class__.json(response, **kwargs)
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        return response.__class__.json(response)
+
+
+def use_fast_json(response):
+    """Make response.json() of one response use the fast decoder"""
+    if orjson is not None:
+        response.json = lambda **kwargs: response_json(response, **kwargs)
+    return response
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when available
+
+    Output matches DefaultJSONProvider: sorted keys, dates as HTTP dates and
+    Decimal/UUID/dataclass handling via its default(). Compact and 2-space
+    indented output (what jsonify produces) use orjson; any other encoder
+    option goes through the stdlib.
+    """
+
+    ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                      | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        options = self.ORJSON_OPTIONS
+        encoder_args = dict(kwargs)
+        if encoder_args.get('separators') == (',', ':'):
+            del encoder_args['separators']
+        if encoder_args.get('indent') == 2:
+            del encoder_args['indent']
+            options |= orjson.OPT_INDENT_2
+        if encoder_args:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=options).decode('utf-8')
+        except TypeError:
+            # e.g. integers above 64 bit - let the stdlib encoder decide
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def benchmark(paths, rounds=200):
+    """Time decode and encode of each payload with the stdlib and orjson"""
+    import time
+
+    def timed(func, arg):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func(arg)
+        return (time.perf_counter() - started) / rounds * 1e6
+
+    totals = {'json_loads': 0.0, 'json_dumps': 0.0, 'orjson_loads': 0.0, 'orjson_dumps': 0.0}
+    payloads = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue  # truncated paste, not a full payload
+        payloads += 1
+        totals['json_loads'] += timed(json.loads, raw)
+        totals['json_dumps'] += timed(json.dumps, data)
+        if orjson is not None:
+            totals['orjson_loads'] += timed(orjson.loads, raw)
+            totals['orjson_dumps'] += timed(orjson.dumps, data)
+
+    print(f"{payloads} payloads, {rounds} rounds each, total microseconds per round:")
+    for name, micros in totals.items():
+        print(f"  {name:<13} {micros:10.1f}")
+    if orjson is not None and payloads:
+        print(f"  decode speed-up {totals['json_loads'] / totals['orjson_loads']:.1f}x, "
+              f"encode speed-up {totals['json_dumps'] / totals['orjson_dumps']:.1f}x")
+
+
+if __name__ == '__main__':
+    import glob
+    import sys
+
+    benchmark(sys.argv[1:] or sorted(glob.glob('attached_assets/Pasted--odata-metadata*.txt')))
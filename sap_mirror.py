@@ -0,0 +1,320 @@
+"""
+Local mirror of SAP B1 master data
+Warehouses, bins, items and batches copied into the WMS database and kept current
+with incremental syncs driven by the SAP UpdateDate/UpdateTime of each record
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sap_integration import SAPRequestError
+
+# Mirrored entities: Service Layer collection, record key, optional parent key and
+# projection profile (defined in sap_integration.SAP_PROJECTIONS)
+SAP_MIRROR_ENTITIES = {
+    'warehouses': {'entity': 'Warehouses', 'key': 'WarehouseCode', 'parent': None,
+                   'profile': 'warehouse_mirror'},
+    'bins': {'entity': 'BinLocations', 'key': 'AbsEntry', 'parent': 'Warehouse',
+             'profile': 'bin_mirror'},
+    'items': {'entity': 'Items', 'key': 'ItemCode', 'parent': None,
+              'profile': 'item_mirror'},
+    'batches': {'entity': 'BatchNumberDetails', 'key': 'DocEntry', 'parent': 'ItemCode',
+                'profile': 'batch_mirror'},
+}
+
+# Seconds after the last successful sync during which reads are served from the mirror,
+# overridable per entity with SAP_MIRROR_MAX_STALENESS_<ENTITY>
+SAP_MIRROR_MAX_STALENESS = int(os.environ.get('SAP_MIRROR_MAX_STALENESS', '900'))
+# Seconds between full reloads; only a full reload notices records deleted in SAP
+SAP_MIRROR_FULL_SYNC_INTERVAL = int(os.environ.get('SAP_MIRROR_FULL_SYNC_INTERVAL', '86400'))
+# Records written per transaction
+SAP_MIRROR_WRITE_CHUNK = int(os.environ.get('SAP_MIRROR_WRITE_CHUNK', '500'))
+# Seconds a process reuses the last_synced_at it read from sap_sync_state
+SAP_MIRROR_STATE_CACHE_SECONDS = float(os.environ.get('SAP_MIRROR_STATE_CACHE_SECONDS', '30'))
+
+# Entities whose SAP records carry no UpdateDate filter support; always fully reloaded
+_full_sync_only = set()
+
+# entity -> (monotonic time read, last_synced_at), so mirror reads skip the state query
+_last_synced_cache = {}
+_last_synced_cache_lock = threading.Lock()
+
+
+def max_staleness(entity):
+    return int(os.environ.get(f"SAP_MIRROR_MAX_STALENESS_{entity.upper()}", SAP_MIRROR_MAX_STALENESS))
+
+
+def sap_update_timestamp(record):
+    """UpdateDate + UpdateTime of a SAP record as a datetime, or None"""
+    update_date = record.get('UpdateDate')
+    if not update_date:
+        return None
+    try:
+        timestamp = datetime.strptime(str(update_date)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+    update_time = record.get('UpdateTime')
+    if isinstance(update_time, int):
+        # Some versions expose the OADM-style HHMM / HHMMSS integer
+        update_time = f"{update_time:06d}" if update_time > 9999 else f"{update_time:04d}00"
+        update_time = f"{update_time[:2]}:{update_time[2:4]}:{update_time[4:6]}"
+    if update_time:
+        try:
+            parsed = datetime.strptime(str(update_time)[-8:], '%H:%M:%S')
+            timestamp = timestamp.replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second)
+        except ValueError:
+            pass
+    return timestamp
+
+
+class SAPMirror:
+    """Read and refresh the local SAP master data mirror
+
+    Usage:
+        mirror = SAPMirror(sap)
+        mirror.sync('items')                   # delta since the last watermark
+        bins = mirror.list_by_parent('bins', 'WH01')
+
+    Reads return None when the entity has not been synced within its
+    staleness bound (or the mirror is unavailable), so callers fall back to
+    the live Service Layer.
+    """
+
+    def __init__(self, sap):
+        self.sap = sap
+
+    def sync(self, entity, full=None):
+        """Copy new and changed SAP records of one entity into the mirror
+
+        Args:
+            entity: Key of SAP_MIRROR_ENTITIES
+            full: Force (True) or skip (False) a full reload; by default a full
+                reload runs when there is no watermark yet or the last one is
+                older than SAP_MIRROR_FULL_SYNC_INTERVAL
+
+        Returns:
+            Dict with success, mode, records written and duration
+        """
+        from app import db
+        from models import SAPSyncState
+
+        config = SAP_MIRROR_ENTITIES[entity]
+        started = datetime.utcnow()
+        started_clock = time.monotonic()
+
+        state = SAPSyncState.query.get(entity)
+        if state is None:
+            state = SAPSyncState(entity=entity, record_count=0)
+            db.session.add(state)
+        state.last_attempt_at = started
+        db.session.commit()
+
+        if full is None:
+            full = (state.watermark is None or state.last_full_sync_at is None or entity in _full_sync_only
+                    or state.last_full_sync_at < started - timedelta(seconds=SAP_MIRROR_FULL_SYNC_INTERVAL))
+        mode = 'full' if full else 'delta'
+
+        if not self.sap.ensure_logged_in():
+            return self._sync_failed(state, entity, mode, 'SAP B1 not available')
+
+        try:
+            delta_filter = None
+            if not full:
+                # Day granularity: UpdateTime is not filterable on every entity, and
+                # re-reading the watermark day is harmless because writes are upserts
+                delta_filter = f"UpdateDate ge '{state.watermark.strftime('%Y-%m-%d')}'"
+            try:
+                written, watermark = self._copy(entity, config, delta_filter, started)
+            except SAPRequestError as e:
+                if full or e.status_code != 400:
+                    raise
+                logging.warning(f"⚠️ {config['entity']} cannot be filtered by UpdateDate, using full reloads: {e.text}")
+                _full_sync_only.add(entity)
+                mode = 'full'
+                written, watermark = self._copy(entity, config, None, started)
+
+            if mode == 'full':
+                self._delete_unseen(entity, started)
+                state.last_full_sync_at = started
+            if watermark and (state.watermark is None or watermark > state.watermark):
+                state.watermark = watermark
+            state.record_count = self._count(entity)
+            state.last_synced_at = started
+            state.last_error = None
+            db.session.commit()
+            with _last_synced_cache_lock:
+                _last_synced_cache[entity] = (time.monotonic(), started)
+
+            duration = round(time.monotonic() - started_clock, 2)
+            logging.info(f"🪞 Mirror {mode} sync of {entity}: {written} records in {duration}s")
+            return {'success': True, 'entity': entity, 'mode': mode, 'records': written, 'duration': duration}
+
+        except Exception as e:
+            db.session.rollback()
+            return self._sync_failed(SAPSyncState.query.get(entity), entity, mode, str(e))
+
+    def _sync_failed(self, state, entity, mode, error):
+        from app import db
+
+        logging.error(f"❌ Mirror {mode} sync of {entity} failed: {error}")
+        if state is not None:
+            state.last_error = error
+            db.session.commit()
+        return {'success': False, 'entity': entity, 'mode': mode, 'error': error}
+
+    def _copy(self, entity, config, delta_filter, synced_at):
+        """Stream SAP records into the mirror, one transaction per chunk; returns (written, watermark)"""
+        written = 0
+        watermark = None
+        batch = []
+        for record in self.sap.iter_odata(config['entity'], filter=delta_filter, profile=config['profile']):
+            batch.append(record)
+            if len(batch) >= SAP_MIRROR_WRITE_CHUNK:
+                chunk_watermark = self._write(entity, config, batch, synced_at)
+                watermark = max(filter(None, [watermark, chunk_watermark]), default=None)
+                written += len(batch)
+                batch = []
+        if batch:
+            chunk_watermark = self._write(entity, config, batch, synced_at)
+            watermark = max(filter(None, [watermark, chunk_watermark]), default=None)
+            written += len(batch)
+        return written, watermark
+
+    def _write(self, entity, config, records, synced_at):
+        """Upsert one chunk of SAP records; returns the newest UpdateDate/UpdateTime in it"""
+        from app import db
+        from models import SAPMirrorRecord
+
+        by_key = {str(record.get(config['key'])): record for record in records
+                  if record.get(config['key']) is not None}
+        existing = {row.record_key: row for row in SAPMirrorRecord.query.filter(
+            SAPMirrorRecord.entity == entity, SAPMirrorRecord.record_key.in_(list(by_key)))}
+
+        watermark = None
+        for record_key, record in by_key.items():
+            row = existing.get(record_key)
+            if row is None:
+                row = SAPMirrorRecord(entity=entity, record_key=record_key)
+                db.session.add(row)
+            parent = record.get(config['parent']) if config['parent'] else None
+            row.parent_key = str(parent) if parent is not None else None
+            row.data = json.dumps(record, default=str)
+            row.sap_updated_at = sap_update_timestamp(record)
+            row.synced_at = synced_at
+            if row.sap_updated_at and (watermark is None or row.sap_updated_at > watermark):
+                watermark = row.sap_updated_at
+        db.session.commit()
+        return watermark
+
+    def _delete_unseen(self, entity, synced_at):
+        """Drop records a full reload did not return (deleted in SAP)"""
+        from app import db
+        from models import SAPMirrorRecord
+
+        deleted = SAPMirrorRecord.query.filter(SAPMirrorRecord.entity == entity,
+                                               SAPMirrorRecord.synced_at < synced_at).delete(
+            synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            logging.info(f"🗑️ Removed {deleted} {entity} no longer in SAP from the mirror")
+
+    def _count(self, entity):
+        from models import SAPMirrorRecord
+        return SAPMirrorRecord.query.filter_by(entity=entity).count()
+
+    def sync_all(self, entities=None, full=None):
+        """Sync several entities one after another; returns entity -> sync result"""
+        return {entity: self.sync(entity, full=full) for entity in (entities or SAP_MIRROR_ENTITIES)}
+
+    def _last_synced_at(self, entity):
+        """last_synced_at of an entity, read from sap_sync_state at most every SAP_MIRROR_STATE_CACHE_SECONDS"""
+        with _last_synced_cache_lock:
+            cached = _last_synced_cache.get(entity)
+        if cached and time.monotonic() - cached[0] < SAP_MIRROR_STATE_CACHE_SECONDS:
+            return cached[1]
+
+        from models import SAPSyncState
+        state = SAPSyncState.query.get(entity)
+        last_synced_at = state.last_synced_at if state else None
+        with _last_synced_cache_lock:
+            _last_synced_cache[entity] = (time.monotonic(), last_synced_at)
+        return last_synced_at
+
+    def is_fresh(self, entity):
+        """Whether the entity was synced successfully within its staleness bound"""
+        try:
+            last_synced_at = self._last_synced_at(entity)
+        except Exception as e:
+            logging.debug(f"SAP mirror unavailable: {str(e)}")
+            self._rollback()
+            return False
+        return bool(last_synced_at and
+                    last_synced_at >= datetime.utcnow() - timedelta(seconds=max_staleness(entity)))
+
+    def _read(self, entity, **filters):
+        """Mirrored records matching the filters, or None if stale or unavailable"""
+        if not self.is_fresh(entity):
+            return None
+        try:
+            from models import SAPMirrorRecord
+            query = SAPMirrorRecord.query.filter_by(entity=entity)
+            if 'keys' in filters:
+                query = query.filter(SAPMirrorRecord.record_key.in_([str(key) for key in filters['keys']]))
+            if 'parent_key' in filters:
+                query = query.filter(SAPMirrorRecord.parent_key == str(filters['parent_key']))
+            return [json.loads(row.data) for row in query]
+        except Exception as e:
+            logging.warning(f"⚠️ SAP mirror read of {entity} failed: {str(e)}")
+            self._rollback()
+            return None
+
+    def _rollback(self):
+        """Leave the request's DB session usable after a failed mirror read"""
+        try:
+            from app import db
+            db.session.rollback()
+        except Exception:
+            pass
+
+    def get_many(self, entity, keys):
+        """Dict of key -> record for the keys found, or None if the mirror cannot answer"""
+        keys = [key for key in keys if key is not None]
+        key_field = SAP_MIRROR_ENTITIES[entity]['key']
+        records = self._read(entity, keys=keys) if keys else []
+        if records is None:
+            return None
+        by_key = {str(record.get(key_field)): record for record in records}
+        return {key: by_key[str(key)] for key in keys if str(key) in by_key}
+
+    def get(self, entity, key):
+        """One mirrored record, or None if missing, stale or unavailable"""
+        return (self.get_many(entity, [key]) or {}).get(key)
+
+    def list_by_parent(self, entity, parent_key):
+        """Records of one parent (bins of a warehouse, batches of an item), or None if stale"""
+        return self._read(entity, parent_key=parent_key)
+
+    def list_all(self, entity):
+        """Every mirrored record of an entity, or None if stale"""
+        return self._read(entity)
+
+    def status(self):
+        """Sync state per mirrored entity, for monitoring"""
+        from models import SAPSyncState
+
+        states = {state.entity: state for state in SAPSyncState.query.all()}
+        result = {}
+        for entity in SAP_MIRROR_ENTITIES:
+            state = states.get(entity)
+            result[entity] = {
+                'fresh': self.is_fresh(entity),
+                'records': state.record_count if state else 0,
+                'watermark': state.watermark.isoformat() if state and state.watermark else None,
+                'last_synced_at': state.last_synced_at.isoformat() if state and state.last_synced_at else None,
+                'last_error': state.last_error if state else None,
+            }
+        return result
@@ -0,0 +1,332 @@
+"""
+Background SAP B1 sync scheduler
+Runs the master data and mirror syncs periodically and on demand in a worker pool,
+records every run in sap_sync_jobs and uses a database advisory lock so that only
+one node (gunicorn worker or host) runs a given job at a time
+
+Periodic runs need one scheduler process:
+    python sap_scheduler.py
+(or SAP_SYNC_SCHEDULER=true to start it inside the web process). Manual runs
+queued from the web app execute in the requesting process.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Sync jobs: callable taking an SAPIntegration, and the default interval in seconds
+# (overridable with SAP_SYNC_INTERVAL_<JOB>; 0 disables the periodic run)
+SAP_SYNC_JOBS = {
+    'warehouses': {'run': lambda sap: sap.sync_warehouses(), 'interval': 3600},
+    'bins': {'run': lambda sap: sap.sync_bins(), 'interval': 3600},
+    'business_partners': {'run': lambda sap: sap.sync_business_partners(), 'interval': 3600},
+    'mirror_warehouses': {'run': lambda sap: sap.mirror.sync('warehouses'), 'interval': 600},
+    'mirror_bins': {'run': lambda sap: sap.mirror.sync('bins'), 'interval': 600},
+    'mirror_items': {'run': lambda sap: sap.mirror.sync('items'), 'interval': 300},
+    'mirror_batches': {'run': lambda sap: sap.mirror.sync('batches'), 'interval': 300},
+}
+# Jobs queued by the "Sync SAP data" button
+SAP_SYNC_MANUAL_JOBS = ['warehouses', 'bins', 'business_partners',
+                        'mirror_warehouses', 'mirror_bins', 'mirror_items', 'mirror_batches']
+
+# Jobs running at the same time in one process
+SAP_SYNC_WORKERS = int(os.environ.get('SAP_SYNC_WORKERS', '3'))
+# Seconds between checks for due jobs
+SAP_SYNC_TICK = float(os.environ.get('SAP_SYNC_TICK', '30'))
+# Seconds a 'queued' job record counts as live; also used for 'running' records on
+# databases without advisory locks (SQLite), where the lock cannot tell a live run
+# from one left behind by a stopped node
+SAP_SYNC_JOB_TIMEOUT = int(os.environ.get('SAP_SYNC_JOB_TIMEOUT', '600'))
+# Days of job records kept
+SAP_SYNC_JOB_RETENTION_DAYS = int(os.environ.get('SAP_SYNC_JOB_RETENTION_DAYS', '14'))
+
+NODE_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_interval(job_name):
+    return int(os.environ.get(f"SAP_SYNC_INTERVAL_{job_name.upper()}", SAP_SYNC_JOBS[job_name]['interval']))
+
+
+def has_advisory_locks():
+    """Whether the database offers advisory locks (PostgreSQL, MySQL)"""
+    from app import db
+    return db.engine.dialect.name in ('postgresql', 'mysql')
+
+
+@contextmanager
+def advisory_lock(name):
+    """Try to take a database-wide lock; yields True if this node holds it
+
+    PostgreSQL advisory locks and MySQL GET_LOCK are used on a dedicated
+    connection. Other databases (SQLite) are single-node, so the lock is
+    always granted.
+    """
+    from app import db
+
+    if not has_advisory_locks():
+        yield True
+        return
+
+    dialect = db.engine.dialect.name
+    connection = db.engine.connect()
+    acquired = False
+    try:
+        if dialect == 'postgresql':
+            key = zlib.crc32(name.encode('utf-8'))
+            acquired = bool(connection.execute(db.text('SELECT pg_try_advisory_lock(:key)'), {'key': key}).scalar())
+        else:
+            acquired = connection.execute(db.text('SELECT GET_LOCK(:name, 0)'), {'name': name}).scalar() == 1
+        yield acquired
+    finally:
+        try:
+            if acquired and dialect == 'postgresql':
+                connection.execute(db.text('SELECT pg_advisory_unlock(:key)'), {'key': key})
+            elif acquired:
+                connection.execute(db.text('SELECT RELEASE_LOCK(:name)'), {'name': name})
+        finally:
+            connection.close()
+
+
+def _succeeded(result):
+    """Sync functions return True/False or a dict with 'success'"""
+    if isinstance(result, dict):
+        return bool(result.get('success'))
+    return bool(result)
+
+
+class SAPSyncScheduler:
+    """Periodic and on-demand SAP sync jobs on a bounded thread pool
+
+    Usage:
+        scheduler = start_scheduler(app)
+        job_id = scheduler.enqueue('mirror_items', trigger='manual', requested_by=user.id)
+    """
+
+    def __init__(self, app, workers=SAP_SYNC_WORKERS, tick=SAP_SYNC_TICK):
+        self.app = app
+        self.tick = tick
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sap-sync')
+        self._active = set()  # job names queued or running in this process
+        self._active_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='sap-sync-scheduler', daemon=True)
+            self._thread.start()
+            logging.info(f"⏰ SAP sync scheduler started on {NODE_NAME} (tick {self.tick}s)")
+
+    def stop(self):
+        self._stop.set()
+        self.executor.shutdown(wait=False)
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_due_jobs()
+            except Exception as e:
+                logging.error(f"❌ SAP sync scheduler tick failed: {str(e)}")
+
+    def run_due_jobs(self):
+        """Queue every periodic job whose last run is older than its interval"""
+        with self.app.app_context():
+            for job_name in SAP_SYNC_JOBS:
+                if self._is_due(job_name):
+                    self.enqueue(job_name)
+            self._purge_old_jobs()
+
+    def is_in_progress(self, job_name):
+        """Whether a job is queued or running on any node
+
+        A 'running' record only counts while its node holds the job's advisory
+        lock; if the lock is free the node stopped mid-job (e.g. a recycled
+        gunicorn worker) and the record is marked failed. Queued records, and
+        running ones on databases without advisory locks, count for
+        SAP_SYNC_JOB_TIMEOUT seconds.
+        """
+        from app import db
+        from models import SAPSyncJob
+
+        cutoff = datetime.utcnow() - timedelta(seconds=SAP_SYNC_JOB_TIMEOUT)
+        records = SAPSyncJob.query.filter(SAPSyncJob.job_name == job_name,
+                                          SAPSyncJob.status.in_(['queued', 'running'])).all()
+        if any(job.status == 'queued' and job.queued_at >= cutoff for job in records):
+            return True
+        stale = {'queued': [job.id for job in records if job.status == 'queued']}
+
+        running = [job for job in records if job.status == 'running']
+        if has_advisory_locks():
+            with advisory_lock(f"wms_sap_sync:{job_name}") as acquired:
+                if not acquired:
+                    return True
+                # The lock is free, so no node is running the job any more
+                stale['running'] = [job.id for job in running]
+        else:
+            if any((job.started_at or job.queued_at) >= cutoff for job in running):
+                return True
+            stale['running'] = [job.id for job in running]
+
+        abandoned = 0
+        for status, job_ids in stale.items():
+            if job_ids:
+                # Conditional on the status, so a run that finished meanwhile keeps its outcome
+                abandoned += SAPSyncJob.query.filter(
+                    SAPSyncJob.id.in_(job_ids), SAPSyncJob.status == status
+                ).update({
+                    'status': 'failed',
+                    'error': 'Node stopped before the job finished',
+                    # Finished, as far as the schedule goes, when it was last seen alive
+                    'finished_at': db.func.coalesce(SAPSyncJob.started_at, SAPSyncJob.queued_at),
+                }, synchronize_session=False)
+        if abandoned:
+            db.session.commit()
+            logging.warning(f"⚠️ Marked {abandoned} abandoned SAP sync job record(s) of {job_name} as failed")
+        return False
+
+    def _is_due(self, job_name):
+        from models import SAPSyncJob
+
+        interval = job_interval(job_name)
+        if interval <= 0:
+            return False
+        with self._active_lock:
+            if job_name in self._active:
+                # Queued behind other jobs in this process - its record is not abandoned
+                return False
+        now = datetime.utcnow()
+        if self.is_in_progress(job_name):
+            return False
+        last_run = SAPSyncJob.query.filter(
+            SAPSyncJob.job_name == job_name, SAPSyncJob.status.in_(['success', 'failed'])
+        ).order_by(SAPSyncJob.finished_at.desc()).first()
+        return last_run is None or last_run.finished_at < now - timedelta(seconds=interval)
+
+    def enqueue(self, job_name, trigger='scheduled', requested_by=None):
+        """Record a queued job and hand it to the pool; returns the job id, or None if already queued or running"""
+        from app import db
+        from models import SAPSyncJob
+
+        if job_name not in SAP_SYNC_JOBS:
+            raise ValueError(f"Unknown SAP sync job: {job_name}")
+        with self._active_lock:
+            if job_name in self._active:
+                return None
+            self._active.add(job_name)
+
+        try:
+            if self.is_in_progress(job_name):
+                with self._active_lock:
+                    self._active.discard(job_name)
+                return None
+            job = SAPSyncJob(job_name=job_name, trigger=trigger, status='queued', requested_by=requested_by)
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+            self.executor.submit(self._run, job_id, job_name)
+        except Exception:
+            with self._active_lock:
+                self._active.discard(job_name)
+            raise
+        logging.info(f"📥 Queued SAP sync job {job_name} #{job_id} ({trigger})")
+        return job_id
+
+    def _run(self, job_id, job_name):
+        from app import db
+        from models import SAPSyncJob
+        from sap_integration import SAPIntegration
+
+        try:
+            with self.app.app_context():
+                job = SAPSyncJob.query.get(job_id)
+                with advisory_lock(f"wms_sap_sync:{job_name}") as acquired:
+                    if not acquired:
+                        job.status = 'skipped'
+                        job.error = 'Job is running on another node'
+                        job.finished_at = datetime.utcnow()
+                        db.session.commit()
+                        logging.info(f"⏭️ SAP sync job {job_name} #{job_id} skipped - running on another node")
+                        return
+
+                    job.status = 'running'
+                    job.node = NODE_NAME
+                    job.started_at = datetime.utcnow()
+                    db.session.commit()
+                    started = time.monotonic()
+
+                    try:
+                        result = SAP_SYNC_JOBS[job_name]['run'](SAPIntegration())
+                        job = SAPSyncJob.query.get(job_id)
+                        job.status = 'success' if _succeeded(result) else 'failed'
+                        job.result = json.dumps(result, default=str)
+                        if isinstance(result, dict) and result.get('error'):
+                            job.error = result['error']
+                    except Exception as e:
+                        db.session.rollback()
+                        job = SAPSyncJob.query.get(job_id)
+                        job.status = 'failed'
+                        job.error = str(e)
+                        logging.error(f"❌ SAP sync job {job_name} #{job_id} failed: {str(e)}")
+
+                    job.finished_at = datetime.utcnow()
+                    job.duration_seconds = round(time.monotonic() - started, 2)
+                    db.session.commit()
+                    logging.info(f"✅ SAP sync job {job_name} #{job_id} {job.status} in {job.duration_seconds}s")
+        except Exception as e:
+            logging.error(f"❌ SAP sync job {job_name} #{job_id} could not run: {str(e)}")
+        finally:
+            with self._active_lock:
+                self._active.discard(job_name)
+
+    def _purge_old_jobs(self):
+        from app import db
+        from models import SAPSyncJob
+
+        cutoff = datetime.utcnow() - timedelta(days=SAP_SYNC_JOB_RETENTION_DAYS)
+        SAPSyncJob.query.filter(SAPSyncJob.queued_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+    def recent_jobs(self, limit=50):
+        """Latest job records of all nodes, newest first"""
+        from models import SAPSyncJob
+        return [job.to_dict() for job in SAPSyncJob.query.order_by(SAPSyncJob.id.desc()).limit(limit)]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(app=None):
+    """Process-wide scheduler; created (not started) on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            if app is None:
+                from app import app
+            _scheduler = SAPSyncScheduler(app)
+        return _scheduler
+
+
+def start_scheduler(app):
+    """Start the periodic sync loop of this process"""
+    scheduler = get_scheduler(app)
+    scheduler.start()
+    return scheduler
+
+
+if __name__ == '__main__':
+    from app import app
+
+    scheduler = get_scheduler(app)
+    logging.info(f"⏰ SAP sync scheduler running in the foreground on {NODE_NAME} (tick {scheduler.tick}s)")
+    try:
+        scheduler.run_due_jobs()
+        scheduler._loop()
+    except KeyboardInterrupt:
+        scheduler.stop()
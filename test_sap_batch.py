@@ -0,0 +1,120 @@
+"""
+Tests for OData $batch reads (SAPIntegration.batch_get and its callers)
+"""
+import re
+
+import pytest
+
+from sap_integration import SAPRequestError, parse_batch_response
+
+# $batch response as returned by Service Layer 10.0 (one hit, one miss)
+SERVICE_LAYER_BATCH_RESPONSE = (
+    '--batchresponse_6d4a4b8a-0b3b-4f5e-9c1f-2f0e9d1a7c55\r\n'
+    'Content-Type: application/http\r\n'
+    'Content-Transfer-Encoding: binary\r\n'
+    '\r\n'
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Type: application/json;odata=minimalmetadata;charset=utf-8\r\n'
+    'DataServiceVersion: 3.0\r\n'
+    '\r\n'
+    '{\r\n'
+    '   "odata.metadata" : "https://sap:50000/b1s/v1/$metadata#Items/@Element",\r\n'
+    '   "ItemCode" : "A001",\r\n'
+    '   "ItemName" : "Widget"\r\n'
+    '}\r\n'
+    '--batchresponse_6d4a4b8a-0b3b-4f5e-9c1f-2f0e9d1a7c55\r\n'
+    'Content-Type: application/http\r\n'
+    'Content-Transfer-Encoding: binary\r\n'
+    '\r\n'
+    'HTTP/1.1 404 Not Found\r\n'
+    'Content-Type: application/json;odata=minimalmetadata;charset=utf-8\r\n'
+    '\r\n'
+    '{\r\n'
+    '   "error" : {\r\n'
+    '      "code" : -2028,\r\n'
+    '      "message" : {"lang" : "en-us", "value" : "No matching records found (ODBC -2028)"}\r\n'
+    '   }\r\n'
+    '}\r\n'
+    '--batchresponse_6d4a4b8a-0b3b-4f5e-9c1f-2f0e9d1a7c55--\r\n'
+)
+
+
+def test_parse_service_layer_batch_response():
+    parts = parse_batch_response(
+        'multipart/mixed;boundary=batchresponse_6d4a4b8a-0b3b-4f5e-9c1f-2f0e9d1a7c55',
+        SERVICE_LAYER_BATCH_RESPONSE)
+
+    assert [part.status_code for part in parts] == [200, 404]
+    assert parts[0].json()['ItemName'] == 'Widget'
+    assert parts[1].json()['error']['code'] == -2028
+
+
+def test_parse_rejects_a_response_without_boundary():
+    with pytest.raises(ValueError):
+        parse_batch_response('application/json', '{}')
+
+
+def test_batch_get_returns_parts_in_request_order(sap, service_layer):
+    service_layer.route('GET', r"/Items\('(\w+)'\)$",
+                        lambda request: (200, {'ItemCode': re.search(r"'(\w+)'", request.path).group(1)}))
+
+    responses = sap.batch_get([f"Items('A{index}')" for index in range(5)])
+
+    assert [response.json()['ItemCode'] for response in responses] == [f"A{index}" for index in range(5)]
+    assert len(service_layer.requests_to(r'/\$batch$', 'POST')) == 1
+
+
+def test_batch_get_splits_large_requests(sap, service_layer, monkeypatch):
+    monkeypatch.setattr('sap_integration.SAP_BATCH_MAX_REQUESTS', 2)
+
+    assert len(sap.batch_get([f"Items('A{index}')" for index in range(5)])) == 5
+    assert len(service_layer.requests_to(r'/\$batch$', 'POST')) == 3
+
+
+def test_item_batch_details_are_read_in_one_round_trip(sap, service_layer):
+    def batches(request):
+        codes = re.findall(r"ItemCode eq '(\w+)'", request.query['$filter'])
+        if 'page' in request.query:
+            return 200, {'value': [{'ItemCode': codes[0], 'Batch': 'second-page'}]}
+        body = {'value': [{'ItemCode': code, 'Batch': f"B-{code}"} for code in codes]}
+        if codes[0] == 'I0':
+            body['odata.nextLink'] = f"BatchNumberDetails?$filter={request.query['$filter']}&page=2"
+        return 200, body
+
+    service_layer.route('GET', r'/BatchNumberDetails$', batches)
+
+    details = sap._get_items_batch_details([f"I{index}" for index in range(100)])
+
+    assert details['I0'] == [{'ItemCode': 'I0', 'Batch': 'B-I0'}, {'ItemCode': 'I0', 'Batch': 'second-page'}]
+    assert details['I99'] == [{'ItemCode': 'I99', 'Batch': 'B-I99'}]
+    assert len(service_layer.requests_to(r'/\$batch$', 'POST')) == 1
+    # Three chunk queries in the $batch, then the next page of the first one
+    assert [request.headers.get('Prefer') for request in service_layer.requests_to(r'/BatchNumberDetails$')] == \
+        ['odata.maxpagesize=500'] * 4
+
+
+def test_failed_batch_part_raises(sap, service_layer):
+    service_layer.route('GET', r'/BatchNumberDetails$', lambda request: (400, {'error': 'bad filter'}))
+
+    with pytest.raises(SAPRequestError):
+        sap.batch_get_collections(["BatchNumberDetails?$filter=ItemCode eq 'A'"])
+
+
+def test_transfer_request_endpoints_are_probed_in_one_batch(sap, service_layer):
+    def stock_transfers(request):
+        doc_num = request.query['$filter'].split(' eq ')[1]
+        if doc_num.startswith("'"):
+            return 200, {'value': []}
+        return 200, {'value': [{'DocEntry': 10 + int(doc_num), 'DocNum': int(doc_num), 'DocumentStatus': 'bost_Open',
+                                'StockTransferLines': []}]}
+
+    service_layer.route('GET', r'/InventoryTransferRequests$', lambda request: (404, {'error': 'not found'}))
+    service_layer.route('GET', r'/StockTransfers$', stock_transfers)
+
+    assert sap.get_inventory_transfer_request(5)['DocEntry'] == 15
+    assert len(service_layer.requests_to(r'/\$batch$', 'POST')) == 1
+
+    # The endpoint that answered is tried on its own next time
+    service_layer.requests.clear()
+    assert sap.get_inventory_transfer_request(6)['DocEntry'] == 16
+    assert [request.path for request in service_layer.requests] == ['/b1s/v1/StockTransfers']
@@ -0,0 +1,47 @@
+"""
+Tests for the stock lookups behind bin scanning (SAPIntegration.get_bin_items helpers)
+"""
+
+
+def _crossjoin_row(item_code, in_stock):
+    return {'Items': {'ItemCode': item_code, 'ItemName': item_code, 'QuantityOnStock': in_stock},
+            'Items/ItemWarehouseInfoCollection': {'InStock': in_stock, 'Ordered': 0, 'StandardAveragePrice': 1}}
+
+
+def test_rows_without_in_stock_do_not_fail_the_scan(sap, service_layer):
+    service_layer.route('GET', r'/\$crossjoin', lambda request: (200, {'value': [
+        _crossjoin_row('A1', None), _crossjoin_row('A2', 'n/a'), _crossjoin_row('A3', 3)]}))
+
+    items = sap._get_warehouse_stock_items('WH01-B1', 5, 'WH01', None)
+
+    assert [item['ItemCode'] for item in items] == ['A3']
+    assert items[0]['InStock'] == 3.0
+
+
+def test_missing_bin_stock_query_is_not_retried_on_every_scan(sap, service_layer):
+    service_layer.route('GET', r'/SQLQueries\(', lambda request: (404, {'error': 'not found'}))
+    service_layer.route('POST', r'/SQLQueries$', lambda request: (403, {'error': 'not allowed'}))
+
+    assert sap._get_bin_stock_items('WH01-B1', 5, 'WH01', None) is None
+    assert sap._get_bin_stock_items('WH01-B2', 6, 'WH01', None) is None
+
+    assert len(service_layer.requests_to(r'/SQLQueries')) == 2
+
+
+def test_failing_bin_stock_query_is_not_retried_on_every_scan(sap, service_layer):
+    service_layer.route('GET', r'/SQLQueries\(', lambda request: (200, {'SqlCode': 'WMS_BIN_STOCK'}))
+    service_layer.route('POST', r'/List$', lambda request: (400, {'error': 'invalid column'}))
+
+    assert sap._get_bin_stock_items('WH01-B1', 5, 'WH01', None) is None
+    assert sap._get_bin_stock_items('WH01-B2', 6, 'WH01', None) is None
+
+    assert len(service_layer.requests_to(r'/List$')) == 1
+
+
+def test_server_errors_are_retried(sap, service_layer):
+    service_layer.route('GET', r'/SQLQueries\(', lambda request: (503, {'error': 'busy'}))
+
+    assert sap._get_bin_stock_items('WH01-B1', 5, 'WH01', None) is None
+    assert sap._get_bin_stock_items('WH01-B2', 6, 'WH01', None) is None
+
+    assert len(service_layer.requests_to(r'/SQLQueries')) == 2
@@ -0,0 +1,97 @@
+"""
+Tests for the shared SAP master data cache (sap_cache)
+"""
+import pytest
+
+import sap_cache
+from sap_cache import MemoryCacheBackend, SAPCache, SQLiteCacheBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for expiry checks"""
+    now = [1000.0]
+    monkeypatch.setattr(sap_cache.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), max_entries=3)
+    return MemoryCacheBackend(max_entries=3)
+
+
+def test_entries_expire_after_their_ttl(backend, clock):
+    cache = SAPCache('batch', backend, ttl=120)
+    cache['A1'] = [{'Batch': 'B1'}]
+
+    clock[0] += 119
+    assert cache.get('A1') == [{'Batch': 'B1'}]
+    clock[0] += 2
+    assert cache.get('A1') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_returned_values_are_copies(backend, clock):
+    cache = SAPCache('transfer_request', backend, ttl=60)
+    cache['1'] = {'DocNum': 1, 'StockTransferLines': [{'ItemCode': 'A1'}]}
+
+    cache.get('1')['StockTransferLines'].append({'ItemCode': 'A2'})
+    cache['1']['DocNum'] = 2
+
+    assert cache.get('1') == {'DocNum': 1, 'StockTransferLines': [{'ItemCode': 'A1'}]}
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = SAPCache('item', MemoryCacheBackend(max_entries=3), ttl=60)
+    for key in ('a', 'b', 'c'):
+        cache[key] = key
+    assert cache.get('a') == 'a'
+    cache['d'] = 'd'
+
+    assert 'b' not in cache
+    assert [key for key in 'acd' if key in cache] == ['a', 'c', 'd']
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    SAPCache('warehouse', SQLiteCacheBackend(path), ttl=60)['WH01'] = {'WarehouseName': 'Main'}
+
+    assert SAPCache('warehouse', SQLiteCacheBackend(path), ttl=60).get('WH01') == {'WarehouseName': 'Main'}
+
+
+def test_invalidate_only_touches_one_namespace(backend, clock):
+    batches = SAPCache('batch', backend, ttl=60)
+    bins = SAPCache('bin', backend, ttl=60)
+    batches['A1'] = 1
+    bins['A1'] = 2
+
+    batches.invalidate()
+    assert 'A1' not in batches
+    assert bins['A1'] == 2
+
+
+def test_ttl_can_be_overridden_per_entity(monkeypatch):
+    monkeypatch.setattr(sap_cache, '_caches', {})
+    monkeypatch.setattr(sap_cache, '_backend', None)
+    monkeypatch.setenv('SAP_CACHE_TTL_BIN_LOCATION', '42')
+
+    assert sap_cache.get_cache('bin_location').ttl == 42
+    assert sap_cache.get_cache('batch').ttl == sap_cache.SAP_CACHE_TTLS['batch']
+
+
+def test_offline_fallbacks_are_not_cached(monkeypatch):
+    from sap_integration import SAPIntegration
+
+    for name in ('SAP_B1_SERVER', 'SAP_B1_USERNAME', 'SAP_B1_PASSWORD', 'SAP_B1_COMPANY_DB'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(sap_cache, '_caches', {})
+    monkeypatch.setattr(sap_cache, '_backend', None)
+    sap = SAPIntegration()
+
+    assert sap.get_batch_numbers('A1')
+    assert sap.get_bin_location_details(7) == {}
+    assert 'A1' not in sap_cache.get_cache('batch')
+    assert 7 not in sap_cache.get_cache('bin_location')
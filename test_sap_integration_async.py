@@ -0,0 +1,62 @@
+"""
+Tests for the asyncio SAP client (sap_integration_async)
+"""
+import re
+
+import pytest
+
+import sap_integration_async
+from sap_integration_async import run_concurrent_lookups, shared_async_client
+
+
+@pytest.fixture
+def bin_locations(service_layer):
+    def handler(request):
+        abs_entry = int(re.search(r'AbsEntry eq (\d+)', request.query['$filter']).group(1))
+        return 200, {'value': [{'BinCode': f"BIN-{abs_entry}", 'Warehouse': 'WH01'}]}
+
+    service_layer.route('GET', r'/BinLocations$', handler)
+    return service_layer
+
+
+def test_lookups_share_one_client_and_the_sync_session_pool(bin_locations):
+    first = run_concurrent_lookups([('get_bin_location_details', entry) for entry in range(1, 9)])
+    client, loop = shared_async_client()
+    second = run_concurrent_lookups([('get_sales_order_by_doc_entry', 1)])
+
+    assert [location['BinCode'] for location in first] == [f"BIN-{entry}" for entry in range(1, 9)]
+    assert second == [{'success': False, 'error': 'Sales Order 1 not found'}]
+    assert shared_async_client() == (client, loop)
+    # Logins come from the sync pool only, never more than its size
+    assert 1 <= bin_locations.logins <= client._pool.size
+    assert client._pool._created == bin_locations.logins
+
+
+def test_expired_pooled_session_is_logged_in_again(bin_locations):
+    assert run_concurrent_lookups([('get_bin_location_details', 1)])[0]['BinCode'] == 'BIN-1'
+    logins = bin_locations.logins
+    sap_integration_async.get_cache('bin_location').invalidate()
+    bin_locations.expire_sessions()
+
+    assert run_concurrent_lookups([('get_bin_location_details', 1)])[0]['BinCode'] == 'BIN-1'
+    assert bin_locations.logins == logins + 1
+
+
+def test_client_is_replaced_when_its_session_pool_closes(bin_locations, monkeypatch):
+    run_concurrent_lookups([('get_bin_location_details', 1)])
+    client, loop = shared_async_client()
+
+    monkeypatch.setenv('SAP_B1_PASSWORD', 'changed')
+    sap_integration_async.SAPIntegration()  # credentials changed - the old pool is closed
+
+    new_client, new_loop = shared_async_client()
+    assert new_client is not client
+    assert new_loop is loop
+    assert new_client._pool is not client._pool
+
+
+def test_offline_lookups_use_the_sync_fallbacks(monkeypatch, service_layer):
+    monkeypatch.setenv('SAP_B1_SERVER', '')
+
+    assert run_concurrent_lookups([('get_bin_location_details', 3)]) == [{}]
+    assert service_layer.requests == []
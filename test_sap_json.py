@@ -0,0 +1,64 @@
+"""
+Tests for the fast JSON helpers (sap_json)
+"""
+import importlib
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+
+import pytest
+import requests
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import sap_json
+from sap_json import FastJSONProvider, use_fast_json
+
+
+def _response(body, encoding='utf-8'):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.encoding = encoding
+    return response
+
+
+@pytest.fixture
+def stdlib_json(monkeypatch):
+    """sap_json reloaded as on a machine without orjson"""
+    monkeypatch.setitem(sys.modules, 'orjson', None)  # makes `import orjson` raise ImportError
+    yield importlib.reload(sap_json)
+    monkeypatch.undo()
+    importlib.reload(sap_json)
+
+
+def test_responses_decode_like_requests():
+    body = json.dumps({'value': [{'ItemCode': 'A1', 'Quantity': 2.5, 'Name': 'Stück'}]}).encode()
+
+    assert use_fast_json(_response(body)).json() == _response(body).json()
+
+
+def test_non_utf8_bodies_fall_back_to_the_response_decoder():
+    body = '{"Name": "St\u00fcck"}'.encode('latin-1')
+
+    assert use_fast_json(_response(body, 'latin-1')).json() == {'Name': 'St\u00fcck'}
+
+
+def test_jsonify_output_matches_the_default_provider():
+    app = Flask(__name__)
+    payload = {'b': Decimal('1.50'), 'a': date(2025, 1, 31), 'c': [1, None, 'x'], 'd': 2 ** 70}
+
+    for options in ({'separators': (',', ':')}, {'indent': 2}):
+        assert FastJSONProvider(app).dumps(payload, **options) == DefaultJSONProvider(app).dumps(payload, **options)
+
+
+def test_stdlib_fallback_without_orjson(stdlib_json):
+    app = Flask(__name__)
+    body = json.dumps({'value': [{'ItemCode': 'A1', 'Quantity': 2.5}]}).encode()
+    payload = {'b': Decimal('1.50'), 'a': date(2025, 1, 31)}
+
+    assert stdlib_json.JSON_BACKEND == 'json'
+    assert stdlib_json.loads(body) == json.loads(body)
+    assert stdlib_json.use_fast_json(_response(body)).json() == _response(body).json()
+    assert stdlib_json.FastJSONProvider(app).dumps(payload) == DefaultJSONProvider(app).dumps(payload)
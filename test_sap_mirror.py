@@ -0,0 +1,78 @@
+"""
+Tests for the local SAP master data mirror (sap_mirror)
+"""
+import re
+from datetime import datetime
+
+import pytest
+
+import sap_mirror
+from sap_mirror import SAPMirror
+
+
+@pytest.fixture
+def items(service_layer, database, monkeypatch):
+    """Items collection of the fake Service Layer that honours UpdateDate ge filters"""
+    monkeypatch.setattr(sap_mirror, '_last_synced_cache', {})
+    monkeypatch.setattr(sap_mirror, '_full_sync_only', set())
+    records = [
+        {'ItemCode': 'A1', 'ItemName': 'Widget', 'UpdateDate': '2025-03-01T00:00:00Z', 'UpdateTime': '08:15:00'},
+        {'ItemCode': 'A2', 'ItemName': 'Gadget', 'UpdateDate': '2025-03-02T00:00:00Z', 'UpdateTime': '17:40:10'},
+    ]
+
+    def handler(request):
+        since = re.search(r"UpdateDate ge '([\d-]+)'", request.query.get('$filter', ''))
+        return 200, {'value': [record for record in records
+                               if since is None or record['UpdateDate'][:10] >= since.group(1)]}
+
+    service_layer.route('GET', r'/Items$', handler)
+    return records
+
+
+def _filters(service_layer):
+    return [request.query.get('$filter') for request in service_layer.requests_to(r'/Items$')]
+
+
+def test_full_sync_sets_the_watermark(sap, service_layer, items):
+    from models import SAPSyncState
+
+    result = SAPMirror(sap).sync('items')
+
+    assert (result['success'], result['mode'], result['records']) == (True, 'full', 2)
+    assert _filters(service_layer) == [None]
+    assert SAPSyncState.query.get('items').watermark == datetime(2025, 3, 2, 17, 40, 10)
+    assert SAPMirror(sap).get('items', 'A2')['ItemName'] == 'Gadget'
+
+
+def test_delta_sync_resumes_from_the_stored_watermark(sap, service_layer, items):
+    from models import SAPSyncState
+
+    SAPMirror(sap).sync('items')
+    items.append({'ItemCode': 'A3', 'ItemName': 'Sprocket', 'UpdateDate': '2025-03-05T00:00:00Z',
+                  'UpdateTime': '09:00:00'})
+
+    # A new mirror instance (e.g. after a restart) continues from the database state
+    result = SAPMirror(sap).sync('items')
+
+    assert (result['mode'], result['records']) == ('delta', 2)
+    assert _filters(service_layer)[-1] == "UpdateDate ge '2025-03-02'"
+    assert SAPSyncState.query.get('items').watermark == datetime(2025, 3, 5, 9, 0, 0)
+    assert SAPSyncState.query.get('items').record_count == 3
+
+
+def test_failed_sync_keeps_the_watermark(sap, service_layer, items):
+    from models import SAPSyncState
+
+    SAPMirror(sap).sync('items')
+    service_layer.routes.insert(0, ('GET', re.compile(r'/Items$'), lambda request: (500, {'error': 'down'})))
+
+    result = SAPMirror(sap).sync('items')
+
+    assert result['success'] is False
+    state = SAPSyncState.query.get('items')
+    assert state.watermark == datetime(2025, 3, 2, 17, 40, 10)
+    assert state.last_error
+
+    del service_layer.routes[0]
+    assert SAPMirror(sap).sync('items')['mode'] == 'delta'
+    assert _filters(service_layer)[-1] == "UpdateDate ge '2025-03-02'"
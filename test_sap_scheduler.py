@@ -0,0 +1,86 @@
+"""
+Tests for the background SAP sync scheduler (sap_scheduler)
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import sap_scheduler
+from sap_scheduler import SAPSyncScheduler
+
+
+@pytest.fixture
+def scheduler(database):
+    from app import app
+
+    scheduler = SAPSyncScheduler(app, workers=1)
+    yield scheduler
+    scheduler.stop()
+
+
+@contextmanager
+def _free_lock(name):
+    """advisory_lock stand-in for a lock no node holds"""
+    yield True
+
+
+@contextmanager
+def _held_lock(name):
+    """advisory_lock stand-in for a lock another node holds"""
+    yield False
+
+
+def _job(database, status, age, **fields):
+    from models import SAPSyncJob
+
+    started = datetime.utcnow() - timedelta(seconds=age)
+    job = SAPSyncJob(job_name='bins', status=status, queued_at=started,
+                     started_at=started if status == 'running' else None, **fields)
+    database.session.add(job)
+    database.session.commit()
+    return job
+
+
+def test_running_record_without_lock_holder_is_marked_failed(scheduler, database, monkeypatch):
+    monkeypatch.setattr(sap_scheduler, 'has_advisory_locks', lambda: True)
+    monkeypatch.setattr(sap_scheduler, 'advisory_lock', _free_lock)
+    job = _job(database, 'running', age=60)
+
+    assert scheduler.is_in_progress('bins') is False
+    database.session.refresh(job)
+    assert job.status == 'failed'
+    assert job.finished_at == job.started_at
+
+
+def test_running_record_with_lock_holder_is_in_progress(scheduler, database, monkeypatch):
+    monkeypatch.setattr(sap_scheduler, 'has_advisory_locks', lambda: True)
+    monkeypatch.setattr(sap_scheduler, 'advisory_lock', _held_lock)
+    job = _job(database, 'running', age=7200)
+
+    assert scheduler.is_in_progress('bins') is True
+    database.session.refresh(job)
+    assert job.status == 'running'
+
+
+def test_without_lock_backend_running_records_expire(scheduler, database):
+    live = _job(database, 'running', age=60)
+    assert scheduler.is_in_progress('bins') is True
+
+    live.started_at = live.queued_at = datetime.utcnow() - timedelta(seconds=sap_scheduler.SAP_SYNC_JOB_TIMEOUT + 1)
+    database.session.commit()
+    assert scheduler.is_in_progress('bins') is False
+    database.session.refresh(live)
+    assert live.status == 'failed'
+
+
+def test_stale_queued_record_does_not_block_new_runs(scheduler, database):
+    stale = _job(database, 'queued', age=sap_scheduler.SAP_SYNC_JOB_TIMEOUT + 1)
+
+    assert scheduler.is_in_progress('bins') is False
+    database.session.refresh(stale)
+    assert stale.status == 'failed'
+
+    _job(database, 'queued', age=5)
+    assert scheduler.is_in_progress('bins') is True
+
@@ -0,0 +1,49 @@
+"""
+Tests for concurrent serial validation (SAPIntegration.validate_batch_series_with_warehouse)
+"""
+import threading
+import time
+
+import pytest
+
+import sap_integration
+from sap_integration import SAPIntegration
+
+
+@pytest.fixture
+def chunks_in_flight(monkeypatch):
+    """Replace the per-chunk SAP query; returns the peak number of chunks validated at once"""
+    state = {'current': 0, 'peak': 0, 'chunks': []}
+    lock = threading.Lock()
+
+    def validate_chunk(self, serial_batch, item_code, warehouse_code):
+        with lock:
+            state['current'] += 1
+            state['peak'] = max(state['peak'], state['current'])
+            state['chunks'].append(serial_batch)
+        time.sleep(0.05)
+        with lock:
+            state['current'] -= 1
+        return {serial: {'valid': True} for serial in serial_batch}
+
+    monkeypatch.setattr(SAPIntegration, '_validate_batch_chunk', validate_chunk)
+    return state
+
+
+def test_chunks_run_concurrently_leaving_one_pooled_session(sap, chunks_in_flight):
+    serials = [f"S{index}" for index in range(20)] * 2
+
+    results = sap.validate_batch_series_with_warehouse(serials, 'A1', 'WH01', batch_size=2)
+
+    assert sorted(results) == sorted(set(serials))
+    assert len(chunks_in_flight['chunks']) == 10  # duplicates validated once
+    assert chunks_in_flight['peak'] == sap.session_pool.size - 1
+
+
+def test_workers_are_capped_by_the_configured_limit(sap, chunks_in_flight, monkeypatch):
+    monkeypatch.setattr(sap_integration, 'SAP_SERIAL_VALIDATION_WORKERS', 2)
+
+    sap.validate_batch_series_with_warehouse([f"S{index}" for index in range(20)], 'A1', 'WH01',
+                                             batch_size=2, max_workers=16)
+
+    assert chunks_in_flight['peak'] == 2
@@ -0,0 +1,150 @@
+"""
+Tests for the pooled SAP Service Layer sessions (PooledSAPSession)
+"""
+import threading
+import time
+
+import pytest
+
+import sap_integration
+from sap_integration import PooledSAPSession
+
+
+class _CountingEvent(threading.Event):
+    """Event that counts the threads waiting on it"""
+
+    waiters = 0
+    waiters_lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        with _CountingEvent.waiters_lock:
+            _CountingEvent.waiters += 1
+        return super().wait(timeout)
+
+
+class _CountingInFlightRequest(sap_integration._InFlightRequest):
+    def __init__(self):
+        super().__init__()
+        self.done = _CountingEvent()
+
+
+@pytest.fixture
+def followers(monkeypatch):
+    """Number of threads waiting for another thread's in-flight GET"""
+    monkeypatch.setattr(sap_integration, '_InFlightRequest', _CountingInFlightRequest)
+    monkeypatch.setattr(_CountingEvent, 'waiters', 0)
+    return lambda: _CountingEvent.waiters
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def _in_threads(count, target):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+@pytest.fixture
+def gated_items(service_layer):
+    """Items route that holds every response until the gate is opened"""
+    gate = threading.Event()
+
+    def items(request):
+        gate.wait(5)
+        return 200, {'value': [{'ItemCode': 'A1'}]}
+
+    service_layer.route('GET', r'/Items$', items)
+    return gate
+
+
+def test_concurrent_identical_gets_send_one_request(sap, service_layer, gated_items, followers):
+    url = f"{sap.base_url}/b1s/v1/Items"
+    assert sap.ensure_logged_in()
+
+    threads, results = _in_threads(5, lambda: sap.session.get(url, params={'$filter': "ItemCode eq 'A1'"}))
+    _wait_until(lambda: followers() == 4 and service_layer.requests_to(r'/Items$'))
+    gated_items.set()
+    for thread in threads:
+        thread.join()
+
+    assert [response.json() for response in results] == [{'value': [{'ItemCode': 'A1'}]}] * 5
+    assert len(service_layer.requests_to(r'/Items$')) == 1
+
+
+def test_gets_with_different_prefer_headers_are_not_merged(sap, service_layer, gated_items, followers):
+    url = f"{sap.base_url}/b1s/v1/Items"
+    assert sap.ensure_logged_in()
+
+    threads = [threading.Thread(target=sap.session.get, args=(url,),
+                                kwargs={'headers': {'Prefer': f"odata.maxpagesize={size}"}})
+               for size in (20, 500)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: len(service_layer.requests_to(r'/Items$')) == 2)
+    gated_items.set()
+    for thread in threads:
+        thread.join()
+
+    assert followers() == 0
+    assert sorted(request.headers['Prefer'] for request in service_layer.requests_to(r'/Items$')) == \
+        ['odata.maxpagesize=20', 'odata.maxpagesize=500']
+
+
+def test_failing_leader_propagates_to_followers_only(sap, service_layer, followers, monkeypatch):
+    url = f"{sap.base_url}/b1s/v1/Items"
+    gate = threading.Event()
+    real_send = PooledSAPSession._send
+
+    def failing_send(self, method, url, **kwargs):
+        gate.wait(5)
+        raise ConnectionError('connection reset')
+
+    monkeypatch.setattr(PooledSAPSession, '_send', failing_send)
+    threads, results = _in_threads(3, lambda: sap.session.get(url))
+    _wait_until(lambda: followers() == 2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(results[0], ConnectionError)
+    assert results[0] is results[1] is results[2]
+    assert sap_integration._inflight_requests == {}
+
+    monkeypatch.setattr(PooledSAPSession, '_send', real_send)
+    assert sap.session.get(url).json() == {'value': []}
+
+
+def test_discarded_session_is_logged_out(sap, service_layer):
+    url = f"{sap.base_url}/b1s/v1/Items"
+    assert sap.ensure_logged_in()
+    session = sap.session_pool.acquire()
+    send = session.request
+
+    def reset_items(method, url, **kwargs):
+        if url.endswith('/Items'):
+            raise ConnectionError('connection reset')
+        return send(method, url, **kwargs)
+
+    session.request = reset_items
+    sap.session_pool.release(session)
+    sessions = set(service_layer.sessions)
+
+    with pytest.raises(ConnectionError):
+        sap.session.get(url)
+
+    assert service_layer.logouts == 1
+    assert len(service_layer.sessions) == len(sessions) - 1
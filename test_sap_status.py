@@ -0,0 +1,80 @@
+"""
+Tests for the SAP monitoring endpoints (/api/sap-status, /api/sap-cache)
+"""
+import sap_cache
+
+
+def test_sap_status_reports_circuit_and_mirror(service_layer, client):
+    body = client.get('/api/sap-status').get_json()
+
+    assert body['success'] is True
+    assert body['online'] is True
+    assert body['circuit']['state'] == 'closed'
+    assert set(body['circuit']) >= {'consecutive_failures', 'failure_threshold', 'recovery_timeout',
+                                    'open_for_seconds', 'rejected_calls', 'last_error'}
+    assert set(body['mirror']) == {'warehouses', 'bins', 'items', 'batches'}
+    assert body['mirror']['items'] == {'fresh': False, 'records': 0, 'watermark': None,
+                                       'last_synced_at': None, 'last_error': None}
+    assert isinstance(body['payload_bytes'], dict)
+
+
+def test_sap_status_is_offline_while_the_circuit_is_open(service_layer, client, sap):
+    for _ in range(sap.session_pool.breaker.failure_threshold):
+        sap.session_pool.breaker.record_failure('ConnectionError: refused')
+
+    body = client.get('/api/sap-status').get_json()
+
+    assert body['online'] is False
+    assert body['circuit']['state'] == 'open'
+    assert body['circuit']['last_error'] == 'ConnectionError: refused'
+
+
+def test_sap_status_hides_details_from_ordinary_users(service_layer, client, database, sap):
+    from models import User
+
+    scanner = User(username='scanner', email='scanner@example.com', password_hash='-', role='user')
+    database.session.add(scanner)
+    database.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(scanner.id)
+    for _ in range(sap.session_pool.breaker.failure_threshold):
+        sap.session_pool.breaker.record_failure('ConnectionError: refused')
+
+    body = client.get('/api/sap-status').get_json()
+
+    assert body == {'success': True, 'online': False, 'circuit': {'state': 'open'}}
+
+
+def test_sap_cache_shows_and_invalidates_entries(service_layer, client):
+    sap_cache.get_cache('warehouse')['WH01'] = {'WarehouseName': 'Main'}
+    sap_cache.get_cache('warehouse').get('WH01')
+
+    body = client.get('/api/sap-cache').get_json()
+    assert body['success'] is True
+    assert body['cache']['entries'] == 1
+    assert body['cache']['caches']['warehouse']['hits'] == 1
+
+    body = client.delete('/api/sap-cache?entity=warehouse').get_json()
+    assert body['cache']['entries'] == 0
+    assert 'WH01' not in sap_cache.get_cache('warehouse')
+
+
+def test_sap_cache_invalidates_a_single_key(service_layer, client):
+    sap_cache.get_cache('warehouse')['WH01'] = {'WarehouseName': 'Main'}
+    sap_cache.get_cache('warehouse')['WH02'] = {'WarehouseName': 'Overflow'}
+
+    body = client.delete('/api/sap-cache?entity=warehouse&key=WH01').get_json()
+
+    assert body['cache']['entries'] == 1
+    assert 'WH01' not in sap_cache.get_cache('warehouse')
+    assert 'WH02' in sap_cache.get_cache('warehouse')
+
+
+def test_sap_cache_key_without_entity_is_rejected(service_layer, client):
+    sap_cache.get_cache('warehouse')['WH01'] = {'WarehouseName': 'Main'}
+
+    response = client.delete('/api/sap-cache?key=WH01')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert 'WH01' in sap_cache.get_cache('warehouse')
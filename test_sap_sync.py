@@ -0,0 +1,109 @@
+"""
+Tests for the syncs from SAP B1 into the local database
+"""
+import pytest
+
+import sap_integration
+
+
+def test_business_partners_are_upserted_page_by_page(sap, service_layer, database, monkeypatch):
+    def business_partners(request):
+        if 'page' in request.query:
+            return 200, {'value': [{'CardCode': f"C{index}", 'CardType': 'cCustomer', 'Valid': 'Y'}
+                                   for index in (3, 4)]}
+        return 200, {'value': [{'CardCode': f"C{index}", 'CardType': 'cCustomer', 'Valid': 'Y'}
+                               for index in (0, 1, 2)],
+                     'odata.nextLink': 'BusinessPartners?page=2'}
+
+    service_layer.route('GET', r'/BusinessPartners$', business_partners)
+    upserts = []
+    real_bulk_upsert = sap_integration.bulk_upsert
+
+    def spy(table_name, rows, *args, **kwargs):
+        upserts.append(rows)
+        return real_bulk_upsert(table_name, rows, *args, chunk_size=2, **kwargs)
+
+    monkeypatch.setattr(sap_integration, 'bulk_upsert', spy)
+
+    assert sap.sync_business_partners() is True
+    assert sap.sync_business_partners() is True  # second run updates the same rows
+
+    # Rows are handed over lazily, not collected into a list first
+    assert len(upserts) == 2
+    assert not any(isinstance(rows, list) for rows in upserts)
+    stored = database.session.execute(database.text(
+        'SELECT card_code FROM business_partners ORDER BY card_code')).scalars().all()
+    assert stored == [f"C{index}" for index in range(5)]
+
+
+def _sap_line(line_number, picked=0, bins=(1,)):
+    return {'AbsoluteEntry': 7, 'LineNumber': line_number, 'OrderEntry': 100, 'OrderRowID': line_number,
+            'PickedQuantity': picked, 'PickStatus': 'ps_Released', 'ReleasedQuantity': 5,
+            'PreviouslyReleasedQuantity': 0, 'BaseObjectType': 17,
+            'DocumentLinesBinAllocations': [{'BinAbsEntry': bin_abs_entry, 'Quantity': 5,
+                                             'SerialAndBatchNumbersBaseLine': 0, 'BaseLineNumber': line_number}
+                                            for bin_abs_entry in bins]}
+
+
+@pytest.fixture
+def pick_list(sap, database):
+    """Local pick list synced once from SAP lines 0-2"""
+    from models import PickList
+
+    pick_list = PickList(absolute_entry=7, name='PL-7', user_id=1)
+    database.session.add(pick_list)
+    database.session.commit()
+    result = sap.sync_pick_list_to_local_db({'PickListsLines': [_sap_line(number) for number in range(3)]},
+                                            pick_list)
+    assert result['added'] == 3
+    return pick_list
+
+
+def _local_lines(pick_list):
+    from models import PickListLine
+    return {line.line_number: line for line in PickListLine.query.filter_by(pick_list_id=pick_list.id)}
+
+
+def test_unchanged_pick_list_is_skipped(sap, pick_list):
+    lines = {number: line.id for number, line in _local_lines(pick_list).items()}
+
+    result = sap.sync_pick_list_to_local_db({'PickListsLines': [_sap_line(number) for number in range(3)]},
+                                            pick_list)
+
+    assert result['skipped'] is True
+    assert {number: line.id for number, line in _local_lines(pick_list).items()} == lines
+
+
+def test_changed_line_is_updated_in_place(sap, pick_list):
+    line_id = _local_lines(pick_list)[1].id
+
+    result = sap.sync_pick_list_to_local_db(
+        {'PickListsLines': [_sap_line(0), _sap_line(1, picked=3, bins=(1, 2)), _sap_line(2)]}, pick_list)
+
+    assert (result['added'], result['updated'], result['removed']) == (0, 1, 0)
+    line = _local_lines(pick_list)[1]
+    assert line.id == line_id
+    assert line.picked_quantity == 3.0
+    assert sorted(allocation.bin_abs_entry for allocation in line.bin_allocations) == [1, 2]
+
+
+def test_new_sap_line_is_inserted(sap, pick_list):
+    result = sap.sync_pick_list_to_local_db({'PickListsLines': [_sap_line(number) for number in range(4)]},
+                                            pick_list)
+
+    assert (result['added'], result['updated'], result['removed']) == (1, 0, 0)
+    line = _local_lines(pick_list)[3]
+    assert [allocation.bin_abs_entry for allocation in line.bin_allocations] == [1]
+    assert pick_list.total_items == 4
+
+
+def test_line_removed_in_sap_is_deleted(sap, pick_list):
+    from models import PickListBinAllocation
+
+    removed_id = _local_lines(pick_list)[2].id
+
+    result = sap.sync_pick_list_to_local_db({'PickListsLines': [_sap_line(0), _sap_line(1)]}, pick_list)
+
+    assert (result['added'], result['updated'], result['removed']) == (0, 0, 1)
+    assert sorted(_local_lines(pick_list)) == [0, 1]
+    assert PickListBinAllocation.query.filter_by(pick_list_line_id=removed_id).count() == 0